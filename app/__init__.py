@@ -4,14 +4,20 @@ Application Flask T'ELEFAN MES 4.0 — Factory et initialisation.
 Ce module constitue le point d'entree de l'application. Il expose :
 - ``db`` : instance SQLAlchemy partagee par tous les modules
 - ``create_app()`` : factory Flask qui configure la BDD, enregistre les
-  blueprints (routes, auth, export) et gere les erreurs 404.
-
-La connexion a MariaDB est tentee plusieurs fois au demarrage pour
-absorber le delai de demarrage du conteneur Docker (race condition).
+  blueprints (routes, auth, export, extract, scheduler, metrics, health,
+  oee_cube) et gere
+  les erreurs 404.
+
+La connexion a MariaDB est tentee plusieurs fois, avec un delai croissant
+(backoff exponentiel), pour absorber le delai de demarrage du conteneur
+Docker (race condition). Ces tentatives et le prechauffage des KPIs
+tournent en arriere-plan (voir ``health``) : le serveur HTTP demarre
+immediatement et ``/readyz`` indique quand le worker peut servir.
 """
 
 import logging
 import os
+import random
 import sys
 import time
 from dotenv import load_dotenv
@@ -27,17 +33,32 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # Constantes de configuration
 # ---------------------------------------------------------------------------
-DB_CONNECT_RETRIES = 5          # Nombre de tentatives de connexion BDD
-DB_CONNECT_DELAY_SEC = 3        # Delai entre chaque tentative (secondes)
+DB_CONNECT_RETRIES = 6          # Nombre de tentatives de connexion BDD
+DB_CONNECT_BASE_DELAY_SEC = 0.25  # Delai avant la 2e tentative (double ensuite)
+DB_CONNECT_MAX_DELAY_SEC = 5    # Plafond du delai entre deux tentatives
+
+# Tables comptees dans le resume de demarrage
+DATA_SUMMARY_TABLES = [
+    ('tblmachinereport', 'Etats machine'),
+    ('tblfinstep', 'Etapes de production'),
+    ('tblfinorder', 'Ordres de fabrication'),
+    ('tblfinorderpos', 'Pieces produites'),
+    ('tblpartsreport', 'Rapports detection'),
+]
 
 
 def create_app() -> Flask:
     """Cree et configure l'application Flask.
 
     1. Charge la configuration depuis les variables d'environnement.
-    2. Initialise SQLAlchemy et tente la connexion a la BDD.
-    3. Enregistre les blueprints : ``routes``, ``auth``, ``export``.
-    4. Enregistre le handler d'erreur 404.
+    2. Initialise SQLAlchemy.
+    3. Enregistre les blueprints : ``routes``, ``auth``, ``export``, ``extract``,
+       ``scheduler``, ``metrics``, ``health``, ``oee_cube`` (et installe
+       l'instrumentation SQL).
+    4. Lance en arriere-plan la connexion BDD et le prechauffage des KPIs.
+    5. Demarre le planificateur de rapports si ``REPORT_SCHEDULER_ENABLED``
+       et le suivi en direct si ``LIVE_TAILER_ENABLED``.
+    6. Enregistre le handler d'erreur 404.
 
     Returns:
         L'instance Flask configuree et prete a tourner.
@@ -68,16 +89,40 @@ def create_app() -> Flask:
 
     db.init_app(app)
 
-    # Tentatives de connexion BDD (absorbe le delai Docker)
-    _wait_for_database(app)
-
     # Enregistrement des blueprints
     with app.app_context():
-        from . import auth, export, routes
+        from . import (
+            agv_correlation, auth, export, extract, health, live, machine_timeline, metrics, oee_cube,
+            production_index, reference, robotino, routes, scheduler,
+        )
+
+        metrics.init_app(app)
+        reference.init_app(app)
 
         app.register_blueprint(routes.bp)
         app.register_blueprint(auth.bp)
         app.register_blueprint(export.bp)
+        app.register_blueprint(extract.bp)
+        app.register_blueprint(scheduler.bp)
+        app.register_blueprint(metrics.bp)
+        app.register_blueprint(health.bp)
+        app.register_blueprint(oee_cube.bp)
+        app.register_blueprint(robotino.bp)
+        app.register_blueprint(agv_correlation.bp)
+        app.register_blueprint(live.bp)
+        app.register_blueprint(machine_timeline.bp)
+        app.register_blueprint(production_index.bp)
+
+    # Connexion BDD (absorbe le delai Docker) et prechauffage, sans bloquer
+    health.start_warmup(app)
+
+    # Generation planifiee des rapports (desactivee par defaut)
+    if os.getenv('REPORT_SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        scheduler.start_scheduler(app)
+
+    # Suivi en direct des tables MES (desactive par defaut)
+    if os.getenv('LIVE_TAILER_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        live.start_tailer(app)
 
     # Handler 404 personnalise
     @app.errorhandler(404)
@@ -87,20 +132,39 @@ def create_app() -> Flask:
     return app
 
 
-def _wait_for_database(app: Flask) -> None:
+def _retry_delay(attempt: int) -> float:
+    """Delai avant la tentative ``attempt + 1`` (backoff exponentiel + jitter).
+
+    Le delai double a chaque echec a partir de ``DB_CONNECT_BASE_DELAY_SEC``,
+    plafonne a ``DB_CONNECT_MAX_DELAY_SEC`` ; un alea de +/- 20 % evite que
+    plusieurs workers ne retentent exactement en meme temps.
+    """
+    delay = min(DB_CONNECT_MAX_DELAY_SEC, DB_CONNECT_BASE_DELAY_SEC * (2 ** attempt))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _wait_for_database(app: Flask) -> bool:
     """Tente de se connecter a la BDD avec retries.
 
     En environnement Docker, MariaDB peut ne pas etre pret au demarrage
     de l'application Flask. Cette fonction boucle jusqu'a obtenir une
-    connexion ou epuiser les tentatives.
+    connexion ou epuiser les tentatives, avec un delai croissant
+    (voir ``_retry_delay``) : une BDD deja prete ne coute qu'un aller-retour.
+    Appelee par le thread de prechauffage (``health.start_warmup``).
 
     Args:
         app: L'instance Flask (necessaire pour le contexte applicatif).
+
+    Returns:
+        ``True`` si la connexion a abouti.
     """
+    from . import health
+
     db_uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
     if db_uri and db_uri.startswith('sqlite'):
         logger.info("Base SQLite locale detectee, pas de retry necessaire.")
-        return
+        health.mark_database(True)
+        return True
 
     from sqlalchemy import text
 
@@ -110,40 +174,59 @@ def _wait_for_database(app: Flask) -> None:
                 with db.engine.connect() as conn:
                     conn.execute(text("SELECT 1"))
                 logger.info("Connexion BDD reussie.")
+                health.mark_database(True)
                 _log_data_summary(app)
-                return
+                return True
             except Exception as exc:
                 if attempt < DB_CONNECT_RETRIES - 1:
+                    delay = _retry_delay(attempt)
                     logger.warning(
-                        "BDD non prete (tentative %d/%d) : %s",
-                        attempt + 1, DB_CONNECT_RETRIES, exc,
+                        "BDD non prete (tentative %d/%d, nouvel essai dans %.1f s) : %s",
+                        attempt + 1, DB_CONNECT_RETRIES, delay, exc,
                     )
-                    time.sleep(DB_CONNECT_DELAY_SEC)
+                    time.sleep(delay)
                 else:
                     logger.error(
                         "BDD inaccessible apres %d tentatives : %s",
                         DB_CONNECT_RETRIES, exc,
                     )
+    health.mark_database(False)
+    return False
 
 
 def _log_data_summary(app: Flask) -> None:
-    """Affiche un resume des donnees presentes dans la BDD au demarrage."""
-    from sqlalchemy import text
+    """Affiche un resume des donnees presentes dans la BDD au demarrage.
 
-    tables = [
-        ('tblmachinereport', 'Etats machine'),
-        ('tblfinstep', 'Etapes de production'),
-        ('tblfinorder', 'Ordres de fabrication'),
-        ('tblfinorderpos', 'Pieces produites'),
-        ('tblpartsreport', 'Rapports detection'),
-    ]
+    Sur MariaDB / MySQL, les volumes sont lus dans
+    ``information_schema.TABLES`` (estimation InnoDB, sans parcours de
+    table) ; sur les autres moteurs, un ``COUNT(*)`` exact est utilise.
+    """
+    from sqlalchemy import bindparam, text
+
+    tables = [table for table, _ in DATA_SUMMARY_TABLES]
     with app.app_context():
         try:
             with db.engine.connect() as conn:
-                for table, label in tables:
-                    row = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
-                    logger.info("  %s (%s) : %d lignes", table, label, row)
-                    if row == 0:
-                        logger.warning("  ATTENTION : %s est vide !", table)
+                if conn.dialect.name in ('mysql', 'mariadb'):
+                    approx = True
+                    rows = conn.execute(
+                        text(
+                            "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+                            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+                        ).bindparams(bindparam('tables', expanding=True)),
+                        {'tables': tables},
+                    ).all()
+                    counts = {name.lower(): int(n or 0) for name, n in rows}
+                else:
+                    approx = False
+                    counts = {
+                        table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                        for table in tables
+                    }
+            for table, label in DATA_SUMMARY_TABLES:
+                row = counts.get(table, 0)
+                logger.info("  %s (%s) : %s%d lignes", table, label, '~' if approx else '', row)
+                if row == 0:
+                    logger.warning("  ATTENTION : %s est vide !", table)
         except Exception as exc:
             logger.warning("Impossible de verifier les donnees : %s", exc)
@@ -0,0 +1,264 @@
+"""
+Correlation AGV (Robotino) x evenements MES, par station.
+
+Pour expliquer les temps d'arret des stations, chaque evenement MES est
+aligne sur l'echantillon de telemetrie Robotino le plus proche :
+
+- transitions ``Busy`` de ``tblmachinereport`` (``busy_start`` /
+  ``idle_start``) ;
+- operations buffer de ``tblfinstep`` (OpNo 210-215, ``buffer_start`` /
+  ``buffer_end``).
+
+L'alignement est une jointure temporelle "as-of" (``pandas.merge_asof``,
+direction ``nearest``) sur les timestamps tries, avec une tolerance
+``AGV_JOIN_TOLERANCE_SEC`` : une seule fusion vectorisee, sans boucle
+evenement x echantillon. Un evenement sans echantillon dans la tolerance
+reste non apparie.
+
+La vue par station donne, pour chaque machine : le nombre d'evenements
+apparies, les passages a l'arret pendant que l'AGV roulait ou etait
+immobile, les operations buffer, la tension batterie moyenne et les
+evenements survenus batterie faible.
+
+    GET /api/agv/correlation?station=2&tolerance=3
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import Blueprint, jsonify, request
+
+from . import db, robotino, services
+from .auth import login_required
+from .models import MachineReport, Step
+
+bp = Blueprint('agv_correlation', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+AGV_JOIN_TOLERANCE_SEC = float(os.getenv('AGV_JOIN_TOLERANCE_SEC', '5'))
+# Au-dessus de cette vitesse, l'AGV est considere en mouvement
+AGV_MOVING_SPEED_MPS: float = robotino.DWELL_SPEED_MPS
+# Lignes d'evenements renvoyees au maximum pour une station
+MAX_EVENT_ROWS: int = 1_000
+
+AGV_COLUMNS: dict[str, str] = {
+    'odometry_x': 'x',
+    'odometry_y': 'y',
+    'odometry_vx': 'vx',
+    'odometry_vy': 'vy',
+    'power_voltage': 'voltage',
+    'power_batteryLow': 'battery_low',
+}
+BUFFER_OPS: tuple[int, int] = (210, 215)
+
+_US_PER_SEC = 1_000_000
+
+
+# ============================================================================
+# Series a aligner
+# ============================================================================
+
+def _mes_events(start: Optional[datetime], end: Optional[datetime]) -> 'pd.DataFrame':
+    """Evenements MES tries par timestamp : ``ts`` (us), ``station``, ``event``, ``op``."""
+    import numpy as np
+    import pandas as pd
+
+    with services.time_window(start, end):
+        states = services._load_frame(services._in_window(db.session.query(
+            MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.Busy,
+        ).filter(
+            MachineReport.ResourceID.in_(services.REAL_MACHINE_IDS),
+        ), MachineReport.TimeStamp).order_by(
+            MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.ID,
+        ), services.MACHINE_TIME_COLUMNS)
+        steps = services._load_frame(services._in_window(db.session.query(
+            Step.ResourceID, Step.Start, Step.End, Step.OpNo,
+        ).filter(
+            Step.Start.isnot(None),
+            Step.End.isnot(None),
+            Step.OpNo.between(*BUFFER_OPS),
+        ), Step.Start), {'ResourceID': 'int16', 'Start': 'epoch', 'End': 'epoch', 'OpNo': 'int16'})
+
+    # Transitions Busy : premier etat de chaque machine puis chaque changement
+    rid, busy = states['ResourceID'].to_numpy(), states['Busy'].to_numpy()
+    change = np.ones(len(states), dtype=bool)
+    change[1:] = (rid[1:] != rid[:-1]) | (busy[1:] != busy[:-1])
+    transitions = pd.DataFrame({
+        'ts': states['TimeStamp'].to_numpy()[change] * _US_PER_SEC,
+        'station': rid[change].astype(np.int16),
+        'event': np.where(busy[change], 'busy_start', 'idle_start'),
+        'op': np.int16(-1),
+    })
+    buffers = pd.concat([
+        pd.DataFrame({'ts': steps[column].to_numpy() * _US_PER_SEC, 'station': steps['ResourceID'],
+                      'event': event, 'op': steps['OpNo']})
+        for column, event in (('Start', 'buffer_start'), ('End', 'buffer_end'))
+    ])
+    events = pd.concat([transitions, buffers], ignore_index=True)
+    events['ts'] = events['ts'].astype(np.int64)
+    return events.sort_values('ts', kind='stable', ignore_index=True)
+
+
+def _agv_samples(start: Optional[datetime], end: Optional[datetime]) -> 'pd.DataFrame':
+    """Telemetrie Robotino triee : ``ts`` (us), position, vitesse, batterie."""
+    import numpy as np
+    import pandas as pd
+
+    schema = robotino.load_manifest()['columns']
+    available = [name for name in AGV_COLUMNS if name in schema]
+    ts, values = robotino.load_columns(available, start, end)
+    frame = pd.DataFrame({'ts': ts})
+    for name, alias in AGV_COLUMNS.items():
+        frame[alias] = values[name] if name in values else np.nan
+    frame['speed'] = np.hypot(frame['vx'].astype(np.float64), frame['vy'].astype(np.float64))
+    return frame.drop(columns=['vx', 'vy'])
+
+
+def align(events: 'pd.DataFrame', samples: 'pd.DataFrame', tolerance_sec: float) -> 'pd.DataFrame':
+    """Jointure as-of : echantillon AGV le plus proche de chaque evenement.
+
+    Les deux series doivent etre triees sur ``ts`` (us). Les colonnes AGV
+    d'un evenement sans echantillon a moins de ``tolerance_sec`` sont NaN ;
+    ``lag_sec`` est l'ecart signe echantillon - evenement.
+    """
+    import pandas as pd
+
+    samples = samples.rename(columns={'ts': 'agv_ts'})
+    samples['ts'] = samples['agv_ts']
+    merged = pd.merge_asof(
+        events, samples, on='ts', direction='nearest',
+        tolerance=int(tolerance_sec * _US_PER_SEC),
+    )
+    merged['lag_sec'] = (merged['agv_ts'] - merged['ts']) / _US_PER_SEC
+    return merged
+
+
+# ============================================================================
+# Vue par station
+# ============================================================================
+
+def _station_summary(station: int, name: str, rows: 'pd.DataFrame') -> dict:
+    """Indicateurs d'une station a partir de ses evenements alignes."""
+    matched = rows['agv_ts'].notna()
+    moving = matched & (rows['speed'] > AGV_MOVING_SPEED_MPS)
+    idle = rows['event'] == 'idle_start'
+    buffer = rows['event'].isin(('buffer_start', 'buffer_end'))
+    voltage = rows.loc[matched, 'voltage']
+    return {
+        'station': station,
+        'name': name,
+        'events': int(len(rows)),
+        'matched': int(matched.sum()),
+        'idle_starts': int((idle & matched).sum()),
+        'idle_while_agv_moving': int((idle & moving).sum()),
+        'idle_while_agv_stopped': int((idle & matched & ~moving).sum()),
+        'buffer_ops': int((buffer & matched).sum()),
+        'buffer_ops_while_agv_moving': int((buffer & moving).sum()),
+        'mean_voltage': round(float(voltage.mean()), 3) if voltage.notna().any() else None,
+        'battery_low_events': int((matched & (rows['battery_low'] == True)).sum()),  # noqa: E712 - NaN exclus
+    }
+
+
+def _event_rows(rows: 'pd.DataFrame') -> list[dict]:
+    """Evenements alignes d'une station, serialisables en JSON."""
+    out = []
+    for row in rows.head(MAX_EVENT_ROWS).itertuples(index=False):
+        matched = row.agv_ts == row.agv_ts  # NaN si non apparie
+        out.append({
+            'timestamp': robotino._from_epoch_us(row.ts).isoformat(),
+            'event': row.event,
+            'op': int(row.op) if row.op >= 0 else None,
+            'lag_sec': round(float(row.lag_sec), 3) if matched else None,
+            'agv_x': round(float(row.x), 3) if matched else None,
+            'agv_y': round(float(row.y), 3) if matched else None,
+            'agv_speed': round(float(row.speed), 3) if matched else None,
+            'voltage': round(float(row.voltage), 3) if matched and row.voltage == row.voltage else None,
+            'battery_low': bool(row.battery_low) if matched else None,
+        })
+    return out
+
+
+def correlate(start: Optional[datetime] = None, end: Optional[datetime] = None,
+              tolerance_sec: Optional[float] = None, station: Optional[int] = None) -> dict:
+    """Aligne les evenements MES sur la telemetrie AGV et resume par station.
+
+    Sans ``start`` / ``end``, la fenetre est celle de la telemetrie stockee
+    (elargie de la tolerance) : les evenements hors de cette plage ne
+    peuvent pas etre apparies.
+
+    Args:
+        start, end: Fenetre ``[start, end[``.
+        tolerance_sec: Ecart maximal evenement / echantillon
+                       (defaut ``AGV_JOIN_TOLERANCE_SEC``).
+        station: Si fourni, ne garde que cette station et ajoute le detail
+                 de ses evenements alignes (cle ``event_rows``).
+
+    Returns:
+        dict avec cles : tolerance_sec, window, events, matched, stations,
+        status (``'unavailable'`` sans telemetrie).
+    """
+    tolerance_sec = AGV_JOIN_TOLERANCE_SEC if tolerance_sec is None else tolerance_sec
+    manifest = robotino.load_manifest()
+    if not manifest['segments']:
+        return {'tolerance_sec': tolerance_sec, 'window': None, 'events': 0, 'matched': 0,
+                'stations': [], 'status': 'unavailable'}
+
+    margin = timedelta(seconds=tolerance_sec)
+    start = services._local_naive(start) if start else None
+    end = services._local_naive(end) if end else None
+    if start is None:
+        start = robotino._from_epoch_us(manifest['segments'][0]['first']) - margin
+    if end is None:
+        end = robotino._from_epoch_us(manifest['last_timestamp']) + margin + timedelta(microseconds=1)
+
+    events = _mes_events(start, end)
+    if station is not None:
+        events = events[events['station'] == station]
+    merged = align(events, _agv_samples(start - margin, end + margin), tolerance_sec)
+
+    names = services._get_resource_names()
+    stations = [
+        _station_summary(int(rid), names.get(int(rid), f'Machine {rid}'), rows)
+        for rid, rows in merged.groupby('station', sort=True)
+    ]
+    result = {
+        'tolerance_sec': tolerance_sec,
+        'window': {'start': start.isoformat(), 'end': end.isoformat()},
+        'events': int(len(merged)),
+        'matched': int(merged['agv_ts'].notna().sum()),
+        'stations': stations,
+        'status': 'normal',
+    }
+    if station is not None:
+        result['event_rows'] = _event_rows(merged)
+    return result
+
+
+# ============================================================================
+# Route
+# ============================================================================
+
+@bp.route('/api/agv/correlation')
+@login_required
+def api_agv_correlation():
+    """Vue de correlation AGV x MES par station.
+
+    Parametres : ``start`` / ``end`` (ISO 8601), ``tolerance`` (secondes)
+    et ``station`` (ResourceID, ajoute le detail des evenements).
+    """
+    try:
+        start = services.parse_datetime(request.args.get('start', ''))
+        end = services.parse_datetime(request.args.get('end', ''))
+        tolerance = request.args.get('tolerance', type=float)
+        if tolerance is not None and tolerance < 0:
+            raise ValueError("tolerance doit etre positive")
+        station = request.args.get('station', type=int)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(correlate(start, end, tolerance, station))
@@ -5,21 +5,29 @@ Ce module fournit deux routes d'export, accessibles uniquement aux
 utilisateurs ayant le role ``responsable`` ou superieur :
 
 - ``/export/excel`` : classeur Excel avec 5 onglets (Performance,
-  Qualite, Delai, Energie, Stock), mis en forme avec openpyxl.
+  Qualite, Delai, Energie, Stock), ecrit en flux avec openpyxl
+  (mode ``write_only``).
 - ``/export/pdf`` : rapport PDF genere via weasyprint (avec fallback
   HTML si weasyprint n'est pas installe).
+- ``/export/jobs`` : meme exports executes en arriere-plan (voir
+  ``jobs``), avec suivi du statut et telechargement par jeton.
+
+Les fichiers generes sont conserves dans un cache disque adresse par le
+contenu des KPIs (voir ``report_cache``) : un export identique est servi
+sans nouveau rendu.
 
 Le nom du fichier telecharge suit le format :
 ``telefan_kpis_YYYYMMDD_HHMM.{xlsx|pdf|html}``
 """
 
-import io
 import logging
+import shutil
 from datetime import datetime
+from typing import BinaryIO, Callable, Iterator
 
-from flask import Blueprint, flash, request, send_file
+from flask import Blueprint, current_app, flash, jsonify, request, send_file, session, url_for
 
-from . import services
+from . import health, jobs, report_cache, services
 from .auth import login_required, role_required
 
 bp = Blueprint('export', __name__)
@@ -37,7 +45,7 @@ def _collect_kpis() -> dict:
     Returns:
         Dictionnaire {nom_kpi: dict_resultat} pour tous les KPIs.
     """
-    return {
+    kpis = {
         'oee': services.calculate_oee(),
         'utilization': services.calculate_utilization(),
         'throughput': services.calculate_throughput(),
@@ -50,19 +58,21 @@ def _collect_kpis() -> dict:
         'buffer_occupancy': services.calculate_buffer_occupancy(),
         'stock_variation': services.calculate_stock_variation(),
     }
+    health.mark_snapshot()
+    return kpis
 
 
 def _get_filters() -> dict[str, str]:
-    """Recupere les filtres temporels depuis les parametres de requete.
+    """Recupere les filtres temporels depuis la query string ou le formulaire.
 
     Returns:
         Dictionnaire {year, month, day, hour} (chaines vides si absent).
     """
     return {
-        'year': request.args.get('year', ''),
-        'month': request.args.get('month', ''),
-        'day': request.args.get('day', ''),
-        'hour': request.args.get('hour', ''),
+        'year': request.values.get('year', ''),
+        'month': request.values.get('month', ''),
+        'day': request.values.get('day', ''),
+        'hour': request.values.get('hour', ''),
     }
 
 
@@ -100,174 +110,282 @@ def _generate_filename(extension: str) -> str:
     return f"telefan_kpis_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}"
 
 
+# ============================================================================
+# Rendu des rapports (avec cache disque)
+# ============================================================================
+
+REPORT_MIMETYPES: dict[str, str] = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+    'html': 'text/html',
+}
+
+
+def get_report(fmt: str, kpis: dict, label: str, now: str) -> tuple[BinaryIO, str]:
+    """Retourne le rapport ``fmt`` ouvert en lecture, genere seulement si absent du cache.
+
+    La cle de cache ne depend que des KPIs, du filtre et du format : un
+    rapport deja rendu pour les memes chiffres est servi tel quel (sa date
+    de generation est alors celle du premier rendu). Le fichier est remis
+    ouvert : une eviction concurrente ne peut plus le faire disparaitre
+    avant son envoi ou sa copie.
+
+    Args:
+        fmt: Format du rapport (``'excel'`` ou ``'pdf'``).
+        kpis: Dictionnaire complet des KPIs (retour de ``_collect_kpis``).
+        label: Label descriptif des filtres temporels.
+        now: Date/heure courante formatee (utilisee si le rapport est rendu).
+
+    Returns:
+        Tuple ``(fichier binaire ouvert, extension)`` ; le fichier est a
+        fermer par l'appelant.
+    """
+    key = report_cache.cache_key(kpis, label, fmt)
+    cached = report_cache.open_report(key)
+    if cached is not None:
+        logger.info("Rapport %s servi depuis le cache (%s)", fmt, key[:12])
+        return cached
+
+    if fmt == 'excel':
+        return report_cache.put(key, 'xlsx', lambda fh: _write_excel(kpis, label, now, fh)), 'xlsx'
+
+    content, extension = _render_pdf(kpis, label, now)
+    return report_cache.put(key, extension, lambda fh: fh.write(content)), extension
+
+
 # ============================================================================
 # Export Excel
 # ============================================================================
 
-@bp.route('/export/excel')
-@login_required
-@role_required('responsable')
-def export_excel():
-    """Genere et telecharge un classeur Excel avec 5 onglets KPI.
+# Largeur maximale d'une colonne Excel (en caracteres)
+EXCEL_MAX_COL_WIDTH: int = 40
 
-    Onglets :
-    1. Performance — OEE, cadence, temps de cycle, utilisation par machine
-    2. Qualite — Non-conformite, temps de detection, detail par machine
-    3. Delai — Lead time, distribution par ordre
-    4. Energie — Consommation electrique et air comprime, timeline
-    5. Stock — Occupation buffers, variation de stock
+# Couleurs d'en-tete par categorie KPI
+EXCEL_HEADER_COLORS: dict[str, str] = {
+    'perf': 'FF0000',
+    'qualite': '38B6FF',
+    'delai': 'F2C0FF',
+    'energie': '09B200',
+    'stock': '737373',
+}
+
+
+class _ExcelSheet:
+    """Onglet Excel dont les lignes sont produites a la demande.
+
+    En mode ``write_only``, openpyxl exige que la largeur des colonnes soit
+    fixee avant la premiere ligne. ``rows`` est donc une fonction qui
+    regenere les lignes depuis les listes de KPIs (deja en memoire) : un
+    premier parcours calcule les largeurs, un second ecrit chaque ligne des
+    qu'elle est produite. Aucune ligne n'est conservee entre les deux.
+
+    Chaque ligne est un couple ``(style, valeurs)`` ou ``style`` vaut
+    ``'title'``, ``'filter'``, ``'label'``, ``'plain'``, ``'header'``
+    ou ``'data'``.
+    """
+
+    def __init__(self, title: str, category: str, rows: Callable[[], Iterator[tuple[str, tuple]]]):
+        self.title = title
+        self.category = category
+        self.rows = rows
+
+    def widths(self) -> dict[int, int]:
+        """Largeur maximale (en caracteres) de chaque colonne non vide."""
+        widths: dict[int, int] = {}
+        for _style, values in self.rows():
+            for col, value in enumerate(values, 1):
+                if value:
+                    widths[col] = max(widths.get(col, 0), len(str(value)))
+        return widths
+
+
+def _build_excel_sheets(kpis: dict, label: str, now: str) -> list[_ExcelSheet]:
+    """Decrit les 5 onglets KPI du classeur Excel.
+
+    Args:
+        kpis: Dictionnaire complet des KPIs (retour de ``_collect_kpis``).
+        label: Label descriptif des filtres temporels.
+        now: Date/heure courante formatee.
+
+    Returns:
+        Liste ordonnee des onglets.
+    """
+    blank = ('plain', ())
+
+    # --- Onglet 1 : Performance ---
+    def perf():
+        yield 'title', (f"T'ELEFAN MES 4.0 - Export {now}",)
+        yield 'filter', (f"Filtre: {label}",)
+        yield blank
+        yield 'label', ('OEE Global', f"{kpis['oee'].get('value', 0)}%")
+        yield 'plain', ('Disponibilite', f"{kpis['oee'].get('availability', 0)}%")
+        yield 'plain', ('Performance', f"{kpis['oee'].get('performance', 0)}%")
+        yield 'plain', ('Qualite', f"{kpis['oee'].get('quality', 0)}%")
+        yield blank
+        yield 'label', ('Cadence reelle', f"{kpis['throughput'].get('value', 0)} pieces/h")
+        yield 'label', ('Temps cycle moyen', f"{kpis['cycle_time'].get('value', 0)} s")
+        yield blank
+        yield 'header', ('Machine', 'Utilisation (%)')
+        for m in kpis['utilization'].get('by_machine', []):
+            yield 'data', (m['name'], m['value'])
+
+    # --- Onglet 2 : Qualite ---
+    def qualite():
+        yield 'filter', (f"Filtre: {label}",)
+        yield blank
+        yield 'label', ('Taux non-conformite', f"{kpis['non_conformity'].get('value', 0)}%")
+        yield 'plain', ('Taux ordres', f"{kpis['non_conformity'].get('rate_orders', 0)}%")
+        yield 'plain', ('Taux detection pieces', f"{kpis['non_conformity'].get('rate_parts', 0)}%")
+        yield blank
+        yield 'label', ('Temps detection moyen', f"{kpis['detection_time'].get('value', 0)} s")
+        yield blank
+        yield 'header', ('Machine', 'Total', 'Erreurs', 'Taux (%)')
+        for m in kpis['non_conformity'].get('by_machine', []):
+            yield 'data', (m['name'], m['total'], m['errors'], m['rate'])
+
+    # --- Onglet 3 : Delai ---
+    def delai():
+        yield 'filter', (f"Filtre: {label}",)
+        yield blank
+        yield 'label', ('Lead Time moyen', f"{kpis['lead_time'].get('value', 0)} h")
+        yield 'label', ('Temps attente buffer moyen', f"{kpis['buffer_wait'].get('value', 0)} s")
+        yield blank
+        yield 'header', ('Ordre', 'Lead Time (h)', 'Debut')
+        for d in kpis['lead_time'].get('distribution', []):
+            yield 'data', (d['order'], d['hours'], d['start'])
+
+    # --- Onglet 4 : Energie ---
+    def energie():
+        yield 'filter', (f"Filtre: {label}",)
+        yield blank
+        yield 'label', ('Energie par unite',
+                        f"{kpis['energy'].get('value', 0)} {kpis['energy'].get('unit', 'Wh/u')}")
+        yield 'label', ('Air comprime par unite',
+                        f"{kpis['energy'].get('air_value', 0)} {kpis['energy'].get('air_unit', 'L/u')}")
+        yield 'plain', ('Note', kpis['energy'].get('note', ''))
+        yield blank
+        yield 'header', ('Periode', 'Consommation (Wh)')
+        for t in kpis['energy'].get('timeline', []):
+            yield 'data', (t['period'], t['kwh'])
+
+    # --- Onglet 5 : Stock ---
+    def stock():
+        yield 'filter', (f"Filtre: {label}",)
+        yield blank
+        yield 'label', ('Taux occupation global', f"{kpis['buffer_occupancy'].get('value', 0)}%")
+        yield blank
+        yield 'header', ('Buffer', 'Capacite', 'Occupe', 'Taux (%)')
+        for b in kpis['buffer_occupancy'].get('by_buffer', []):
+            yield 'data', (b['name'], b['capacity'], b['occupied'], b['rate'])
+        yield blank
+        yield 'header', ('Buffer', 'Variation (%)')
+        for v in kpis['stock_variation'].get('variations', []):
+            yield 'data', (v['buffer'], v['variation_pct'])
+
+    return [
+        _ExcelSheet('Performance', 'perf', perf),
+        _ExcelSheet('Qualite', 'qualite', qualite),
+        _ExcelSheet('Delai', 'delai', delai),
+        _ExcelSheet('Energie', 'energie', energie),
+        _ExcelSheet('Stock', 'stock', stock),
+    ]
+
+
+def _write_excel(kpis: dict, label: str, now: str, fileobj) -> None:
+    """Ecrit le classeur Excel des KPIs en mode flux (``write_only``).
+
+    Chaque ligne est passee a ``ws.append`` des qu'elle est produite, et
+    openpyxl la serialise aussitot dans un fichier temporaire : aucune
+    cellule n'est conservee en memoire apres son ecriture, quel que soit le
+    nombre de lignes.
+
+    Args:
+        kpis: Dictionnaire complet des KPIs (retour de ``_collect_kpis``).
+        label: Label descriptif des filtres temporels.
+        now: Date/heure courante formatee.
+        fileobj: Fichier binaire ouvert en ecriture.
     """
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
 
-    kpis = _collect_kpis()
-    filters = _get_filters()
-    label = _filters_label(filters)
-    wb = Workbook()
+    wb = Workbook(write_only=True)
 
     # --- Styles communs ---
     header_font = Font(bold=True, size=11, color='FFFFFF')
+    header_align = Alignment(horizontal='center')
     thin_border = Border(
         left=Side(style='thin'), right=Side(style='thin'),
         top=Side(style='thin'), bottom=Side(style='thin'),
     )
-
-    # Couleurs d'en-tete par categorie KPI
-    HEADER_FILLS = {
-        'perf':    PatternFill(start_color='FF0000', end_color='FF0000', fill_type='solid'),
-        'qualite': PatternFill(start_color='38B6FF', end_color='38B6FF', fill_type='solid'),
-        'delai':   PatternFill(start_color='F2C0FF', end_color='F2C0FF', fill_type='solid'),
-        'energie': PatternFill(start_color='09B200', end_color='09B200', fill_type='solid'),
-        'stock':   PatternFill(start_color='737373', end_color='737373', fill_type='solid'),
+    first_col_fonts = {
+        'title': Font(bold=True, size=13),
+        'filter': Font(italic=True, size=10),
+        'label': Font(bold=True),
     }
 
-    def _write_header(ws, row, headers, fill):
-        """Ecrit une ligne d'en-tete stylisee dans la feuille."""
-        for col, header_text in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header_text)
-            cell.font = header_font
-            cell.fill = fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = thin_border
+    for sheet in _build_excel_sheets(kpis, label, now):
+        ws = wb.create_sheet(sheet.title)
+
+        # Largeurs fixees avant la premiere ligne (contrainte write_only)
+        for col, width in sheet.widths().items():
+            ws.column_dimensions[get_column_letter(col)].width = min(width + 4, EXCEL_MAX_COL_WIDTH)
+
+        color = EXCEL_HEADER_COLORS[sheet.category]
+        header_fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+        for style, values in sheet.rows():
+            cells = []
+            for col, value in enumerate(values, 1):
+                if style == 'header':
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = header_font
+                    cell.fill = header_fill
+                    cell.alignment = header_align
+                    cell.border = thin_border
+                elif style == 'data':
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.border = thin_border
+                elif col == 1 and style in first_col_fonts:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = first_col_fonts[style]
+                else:
+                    cell = value
+                cells.append(cell)
+            ws.append(cells)
+
+    wb.save(fileobj)
 
-    def _write_data_row(ws, row, values):
-        """Ecrit une ligne de donnees avec bordures."""
-        for col, value in enumerate(values, 1):
-            ws.cell(row=row, column=col, value=value).border = thin_border
 
-    # --- Onglet 1 : Performance ---
-    ws = wb.active
-    ws.title = 'Performance'
-    ws.cell(row=1, column=1, value=f"T'ELEFAN MES 4.0 - Export {datetime.now().strftime('%d/%m/%Y %H:%M')}").font = Font(bold=True, size=13)
-    ws.cell(row=2, column=1, value=f"Filtre: {label}").font = Font(italic=True, size=10)
-
-    ws.cell(row=4, column=1, value='OEE Global').font = Font(bold=True)
-    ws.cell(row=4, column=2, value=f"{kpis['oee'].get('value', 0)}%")
-    ws.cell(row=5, column=1, value='Disponibilite')
-    ws.cell(row=5, column=2, value=f"{kpis['oee'].get('availability', 0)}%")
-    ws.cell(row=6, column=1, value='Performance')
-    ws.cell(row=6, column=2, value=f"{kpis['oee'].get('performance', 0)}%")
-    ws.cell(row=7, column=1, value='Qualite')
-    ws.cell(row=7, column=2, value=f"{kpis['oee'].get('quality', 0)}%")
-
-    ws.cell(row=9, column=1, value='Cadence reelle').font = Font(bold=True)
-    ws.cell(row=9, column=2, value=f"{kpis['throughput'].get('value', 0)} pieces/h")
-    ws.cell(row=10, column=1, value='Temps cycle moyen').font = Font(bold=True)
-    ws.cell(row=10, column=2, value=f"{kpis['cycle_time'].get('value', 0)} s")
-
-    row = 12
-    _write_header(ws, row, ['Machine', 'Utilisation (%)'], HEADER_FILLS['perf'])
-    for m in kpis['utilization'].get('by_machine', []):
-        row += 1
-        _write_data_row(ws, row, [m['name'], m['value']])
-
-    # --- Onglet 2 : Qualite ---
-    ws2 = wb.create_sheet('Qualite')
-    ws2.cell(row=1, column=1, value=f"Filtre: {label}").font = Font(italic=True, size=10)
-    ws2.cell(row=3, column=1, value='Taux non-conformite').font = Font(bold=True)
-    ws2.cell(row=3, column=2, value=f"{kpis['non_conformity'].get('value', 0)}%")
-    ws2.cell(row=4, column=1, value='Taux ordres')
-    ws2.cell(row=4, column=2, value=f"{kpis['non_conformity'].get('rate_orders', 0)}%")
-    ws2.cell(row=5, column=1, value='Taux detection pieces')
-    ws2.cell(row=5, column=2, value=f"{kpis['non_conformity'].get('rate_parts', 0)}%")
-    ws2.cell(row=7, column=1, value='Temps detection moyen').font = Font(bold=True)
-    ws2.cell(row=7, column=2, value=f"{kpis['detection_time'].get('value', 0)} s")
-
-    row = 9
-    _write_header(ws2, row, ['Machine', 'Total', 'Erreurs', 'Taux (%)'], HEADER_FILLS['qualite'])
-    for m in kpis['non_conformity'].get('by_machine', []):
-        row += 1
-        _write_data_row(ws2, row, [m['name'], m['total'], m['errors'], m['rate']])
+@bp.route('/export/excel')
+@login_required
+@role_required('responsable')
+def export_excel():
+    """Genere et telecharge un classeur Excel avec 5 onglets KPI.
 
-    # --- Onglet 3 : Delai ---
-    ws3 = wb.create_sheet('Delai')
-    ws3.cell(row=1, column=1, value=f"Filtre: {label}").font = Font(italic=True, size=10)
-    ws3.cell(row=3, column=1, value='Lead Time moyen').font = Font(bold=True)
-    ws3.cell(row=3, column=2, value=f"{kpis['lead_time'].get('value', 0)} h")
-    ws3.cell(row=4, column=1, value='Temps attente buffer moyen').font = Font(bold=True)
-    ws3.cell(row=4, column=2, value=f"{kpis['buffer_wait'].get('value', 0)} s")
-
-    row = 6
-    _write_header(ws3, row, ['Ordre', 'Lead Time (h)', 'Debut'], HEADER_FILLS['delai'])
-    for d in kpis['lead_time'].get('distribution', []):
-        row += 1
-        _write_data_row(ws3, row, [d['order'], d['hours'], d['start']])
+    Onglets :
+    1. Performance — OEE, cadence, temps de cycle, utilisation par machine
+    2. Qualite — Non-conformite, temps de detection, detail par machine
+    3. Delai — Lead time, distribution par ordre
+    4. Energie — Consommation electrique et air comprime, timeline
+    5. Stock — Occupation buffers, variation de stock
 
-    # --- Onglet 4 : Energie ---
-    ws4 = wb.create_sheet('Energie')
-    ws4.cell(row=1, column=1, value=f"Filtre: {label}").font = Font(italic=True, size=10)
-    ws4.cell(row=3, column=1, value='Energie par unite').font = Font(bold=True)
-    ws4.cell(row=3, column=2, value=f"{kpis['energy'].get('value', 0)} {kpis['energy'].get('unit', 'Wh/u')}")
-    ws4.cell(row=4, column=1, value='Air comprime par unite').font = Font(bold=True)
-    ws4.cell(row=4, column=2, value=f"{kpis['energy'].get('air_value', 0)} {kpis['energy'].get('air_unit', 'L/u')}")
-    ws4.cell(row=5, column=1, value='Note')
-    ws4.cell(row=5, column=2, value=kpis['energy'].get('note', ''))
-
-    row = 7
-    _write_header(ws4, row, ['Periode', 'Consommation (Wh)'], HEADER_FILLS['energie'])
-    for t in kpis['energy'].get('timeline', []):
-        row += 1
-        _write_data_row(ws4, row, [t['period'], t['kwh']])
+    Le classeur est ecrit sur disque (cache des rapports) puis envoye par
+    blocs au client : la memoire consommee ne depend pas du nombre de lignes.
+    """
+    kpis = _collect_kpis()
+    label = _filters_label(_get_filters())
+    now = datetime.now().strftime('%d/%m/%Y %H:%M')
 
-    # --- Onglet 5 : Stock ---
-    ws5 = wb.create_sheet('Stock')
-    ws5.cell(row=1, column=1, value=f"Filtre: {label}").font = Font(italic=True, size=10)
-    ws5.cell(row=3, column=1, value='Taux occupation global').font = Font(bold=True)
-    ws5.cell(row=3, column=2, value=f"{kpis['buffer_occupancy'].get('value', 0)}%")
-
-    row = 5
-    _write_header(ws5, row, ['Buffer', 'Capacite', 'Occupe', 'Taux (%)'], HEADER_FILLS['stock'])
-    for b in kpis['buffer_occupancy'].get('by_buffer', []):
-        row += 1
-        _write_data_row(ws5, row, [b['name'], b['capacity'], b['occupied'], b['rate']])
-
-    row += 2
-    _write_header(ws5, row, ['Buffer', 'Variation (%)'], HEADER_FILLS['stock'])
-    for v in kpis['stock_variation'].get('variations', []):
-        row += 1
-        _write_data_row(ws5, row, [v['buffer'], v['variation_pct']])
-
-    # Ajustement automatique de la largeur des colonnes
-    for ws_sheet in [ws, ws2, ws3, ws4, ws5]:
-        for col in ws_sheet.columns:
-            max_length = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            ws_sheet.column_dimensions[col_letter].width = min(max_length + 4, 40)
-
-    # Serialisation et envoi du fichier
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    report, extension = get_report('excel', kpis, label, now)
 
     flash("Export généré avec succès.", "success")
     return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        report,
+        mimetype=REPORT_MIMETYPES[extension],
         as_attachment=True,
-        download_name=_generate_filename('xlsx'),
+        download_name=_generate_filename(extension),
     )
 
 
@@ -286,34 +404,41 @@ def export_pdf():
     le fichier HTML est renvoye directement en tant que fallback.
     """
     kpis = _collect_kpis()
-    filters = _get_filters()
-    label = _filters_label(filters)
+    label = _filters_label(_get_filters())
     now = datetime.now().strftime('%d/%m/%Y %H:%M')
 
+    report, extension = get_report('pdf', kpis, label, now)
+
+    flash("Export généré avec succès.", "success")
+    return send_file(
+        report,
+        mimetype=REPORT_MIMETYPES[extension],
+        as_attachment=True,
+        download_name=_generate_filename(extension),
+    )
+
+
+def _render_pdf(kpis: dict, label: str, now: str) -> tuple[bytes, str]:
+    """Convertit le rapport HTML en PDF, avec fallback HTML.
+
+    Args:
+        kpis: Dictionnaire complet des KPIs (retour de ``_collect_kpis``).
+        label: Label descriptif des filtres temporels.
+        now: Date/heure courante formatee.
+
+    Returns:
+        Tuple ``(contenu, extension)`` : ``'pdf'`` si weasyprint est
+        disponible, ``'html'`` sinon.
+    """
     html_content = _build_pdf_html(kpis, label, now)
 
     # Tentative de conversion weasyprint, sinon fallback HTML
     try:
         from weasyprint import HTML
-        pdf_bytes = HTML(string=html_content).write_pdf()
-        output = io.BytesIO(pdf_bytes)
-        flash("Export généré avec succès.", "success")
-        return send_file(
-            output,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=_generate_filename('pdf'),
-        )
+        return HTML(string=html_content).write_pdf(), 'pdf'
     except (ImportError, OSError):
         logger.warning("weasyprint non installe, fallback vers export HTML.")
-        output = io.BytesIO(html_content.encode('utf-8'))
-        flash("Export généré avec succès.", "success")
-        return send_file(
-            output,
-            mimetype='text/html',
-            as_attachment=True,
-            download_name=_generate_filename('html'),
-        )
+        return html_content.encode('utf-8'), 'html'
 
 
 def _build_pdf_html(kpis: dict, label: str, now: str) -> str:
@@ -398,3 +523,107 @@ def _build_pdf_html(kpis: dict, label: str, now: str) -> str:
 
     parts.append('</body></html>')
     return '\n'.join(parts)
+
+
+# ============================================================================
+# Exports asynchrones (file d'attente)
+# ============================================================================
+
+EXPORT_FORMATS: tuple[str, ...] = ('excel', 'pdf')
+
+
+def render_report(fmt: str, filters: dict[str, str], path: str) -> tuple[str, str]:
+    """Calcule les KPIs et ecrit le rapport ``fmt`` dans le fichier ``path``.
+
+    Doit etre appele dans un contexte applicatif Flask.
+
+    Args:
+        fmt: Format du rapport (``'excel'`` ou ``'pdf'``).
+        filters: Filtres temporels (retour de ``_get_filters``).
+        path: Chemin du fichier a ecrire.
+
+    Returns:
+        Tuple ``(download_name, mimetype)`` du fichier produit.
+    """
+    kpis = _collect_kpis()
+    label = _filters_label(filters)
+    now = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+    report, extension = get_report(fmt, kpis, label, now)
+    with report, open(path, 'wb') as out:
+        shutil.copyfileobj(report, out)
+    return _generate_filename(extension), REPORT_MIMETYPES[extension]
+
+
+def _job_payload(job: dict) -> dict:
+    """Ajoute les URLs de suivi et de telechargement a la vue d'un job."""
+    payload = dict(job)
+    payload['status_url'] = url_for('export.export_job_status', job_id=job['id'])
+    payload['download_url'] = (
+        url_for('export.export_job_download', job_id=job['id'])
+        if job['status'] == 'done' else None
+    )
+    return payload
+
+
+@bp.route('/export/jobs', methods=['POST'])
+@login_required
+@role_required('responsable')
+def create_export_job():
+    """Place un export en file d'attente et retourne immediatement son jeton.
+
+    Parametres (formulaire ou query string) : ``format`` (``excel`` ou
+    ``pdf``) et les filtres temporels ``year``, ``month``, ``day``, ``hour``.
+
+    Returns:
+        202 avec le job en JSON, 400 si format inconnu, 503 si la file est pleine.
+    """
+    fmt = request.values.get('format', '')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Format inconnu : {fmt!r}"}), 400
+
+    filters = _get_filters()
+    try:
+        job = jobs.submit_job(
+            current_app._get_current_object(),
+            lambda path: render_report(fmt, filters, path),
+            owner=session['user'],
+        )
+    except jobs.JobQueueFull as exc:
+        logger.warning("File d'export pleine : %s", exc)
+        return jsonify({'error': "Trop d'exports en cours, reessayez plus tard."}), 503, {'Retry-After': '30'}
+
+    return jsonify(_job_payload(job)), 202
+
+
+@bp.route('/export/jobs/<job_id>')
+@login_required
+@role_required('responsable')
+def export_job_status(job_id: str):
+    """Retourne l'etat d'un job d'export (JSON)."""
+    job = jobs.get_job(job_id, owner=session['user'])
+    if job is None:
+        return jsonify({'error': 'Job inconnu ou expire'}), 404
+    return jsonify(_job_payload(job))
+
+
+@bp.route('/export/jobs/<job_id>/download')
+@login_required
+@role_required('responsable')
+def export_job_download(job_id: str):
+    """Telecharge le fichier d'un job d'export termine."""
+    job = jobs.get_job(job_id, owner=session['user'])
+    if job is None:
+        return jsonify({'error': 'Job inconnu ou expire'}), 404
+    if job['status'] != 'done':
+        return jsonify(_job_payload(job)), 409
+
+    job_file = jobs.get_job_file(job_id, owner=session['user'])
+    if job_file is None:
+        return jsonify({'error': 'Fichier expire'}), 404
+    return send_file(
+        job_file['path'],
+        mimetype=job_file['mimetype'],
+        as_attachment=True,
+        download_name=job_file['download_name'],
+    )
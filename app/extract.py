@@ -0,0 +1,194 @@
+"""
+Extraction des donnees brutes MES4 en flux (CSV / NDJSON compresses gzip).
+
+Les exports Excel/PDF ne contiennent que des KPIs agreges. Ce module expose
+les lignes sources de ``tblmachinereport``, ``tblfinstep`` et
+``tblfinorderpos`` sur une fenetre temporelle, pour analyse externe :
+
+    GET /extract/<table>?start=2025-03-01T00:00&end=2025-04-01&format=csv
+
+Les lignes sont lues par un curseur cote serveur (``yield_per``) et
+compressees bloc par bloc : la memoire reste constante quel que soit le
+nombre de lignes, et le premier octet (en-tete) est envoye immediatement.
+
+Acces reserve au role ``responsable`` ou superieur.
+
+Correspondance table <-> colonne de fenetrage
+==============================================
+
++------------------+------------+
+| Table            | Colonne    |
++------------------+------------+
+| tblmachinereport | TimeStamp  |
+| tblfinstep       | Start      |
+| tblfinorderpos   | Start      |
++------------------+------------+
+"""
+
+import csv
+import io
+import json
+import logging
+import zlib
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from . import db
+from .auth import login_required, role_required
+from .models import MachineReport, OrderPosition, Step
+
+bp = Blueprint('extract', __name__)
+
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes lues par aller-retour du curseur (et par bloc compresse)
+EXTRACT_CHUNK_ROWS: int = 5_000
+
+# Tables extractibles : nom -> (modele, colonne de fenetrage)
+EXTRACT_TABLES = {
+    'tblmachinereport': (MachineReport, 'TimeStamp'),
+    'tblfinstep': (Step, 'Start'),
+    'tblfinorderpos': (OrderPosition, 'Start'),
+}
+
+EXTRACT_FORMATS: tuple[str, ...] = ('csv', 'ndjson')
+
+
+def _parse_datetime(value: str) -> Optional[datetime]:
+    """Parse une date ISO 8601 (``2025-03-27`` ou ``2025-03-27T14:30``).
+
+    Returns:
+        ``None`` si ``value`` est vide.
+
+    Raises:
+        ValueError: si le format est invalide.
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def _json_default(value):
+    """Serialise les dates pour ``json.dumps``."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_rows(table: str, start: Optional[datetime] = None,
+              end: Optional[datetime] = None,
+              chunk_rows: int = EXTRACT_CHUNK_ROWS) -> Iterator[tuple[list[str], list]]:
+    """Parcourt les lignes d'une table par blocs via un curseur cote serveur.
+
+    Args:
+        table: Nom de la table (cle de ``EXTRACT_TABLES``).
+        start: Borne inclusive de la fenetre (optionnelle).
+        end: Borne exclusive de la fenetre (optionnelle).
+        chunk_rows: Nombre de lignes par bloc.
+
+    Yields:
+        Tuples ``(colonnes, lignes)`` ; ``lignes`` contient au plus
+        ``chunk_rows`` tuples de valeurs.
+    """
+    model, time_attr = EXTRACT_TABLES[table]
+    columns = [c.name for c in model.__table__.columns]
+    time_col = getattr(model, time_attr)
+
+    stmt = db.select(*[getattr(model, name) for name in columns])
+    if start is not None:
+        stmt = stmt.where(time_col >= start)
+    if end is not None:
+        stmt = stmt.where(time_col < end)
+    stmt = stmt.order_by(time_col, *model.__table__.primary_key.columns)
+
+    # yield_per active stream_results : curseur non bufferise cote driver
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_rows))
+    try:
+        for partition in result.partitions(chunk_rows):
+            yield columns, partition
+    finally:
+        result.close()
+
+
+def _encode_csv(columns: list[str], rows: list, header: bool) -> bytes:
+    """Encode un bloc de lignes en CSV (UTF-8)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buf.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(columns: list[str], rows: list, header: bool) -> bytes:  # noqa: ARG001
+    """Encode un bloc de lignes en NDJSON (un objet JSON par ligne)."""
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+        for row in rows
+    ).encode('utf-8')
+
+
+def generate_gzip(table: str, fmt: str, start: Optional[datetime],
+                  end: Optional[datetime]) -> Iterator[bytes]:
+    """Produit le flux gzip d'une extraction, bloc par bloc.
+
+    L'en-tete gzip (et l'en-tete CSV) est emis avant la premiere lecture
+    en base, puis chaque bloc est compresse et vide (``Z_SYNC_FLUSH``)
+    pour que le client recoive les donnees au fil de l'eau.
+    """
+    encode = _encode_csv if fmt == 'csv' else _encode_ndjson
+    model, _ = EXTRACT_TABLES[table]
+    columns = [c.name for c in model.__table__.columns]
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 : format gzip
+
+    yield compressor.compress(encode(columns, [], header=True)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    count = 0
+    for _, rows in iter_rows(table, start, end):
+        count += len(rows)
+        yield compressor.compress(encode(columns, rows, header=False)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    yield compressor.flush()
+    logger.info("Extraction %s (%s) : %d lignes", table, fmt, count)
+
+
+@bp.route('/extract/<table>')
+@login_required
+@role_required('responsable')
+def extract_table(table: str):
+    """Telecharge les lignes brutes d'une table sur une fenetre temporelle.
+
+    Parametres de requete :
+    - ``start`` / ``end`` : bornes ISO 8601 (``end`` exclue), optionnelles ;
+    - ``format`` : ``csv`` (defaut) ou ``ndjson``.
+
+    Returns:
+        Flux ``application/gzip`` (``<table>_<start>_<end>.<format>.gz``),
+        ou 400/404 en JSON si les parametres sont invalides.
+    """
+    if table not in EXTRACT_TABLES:
+        return jsonify({'error': f"Table inconnue : {table}", 'tables': sorted(EXTRACT_TABLES)}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXTRACT_FORMATS:
+        return jsonify({'error': f"Format inconnu : {fmt}"}), 400
+
+    try:
+        start = _parse_datetime(request.args.get('start', ''))
+        end = _parse_datetime(request.args.get('end', ''))
+    except ValueError as exc:
+        return jsonify({'error': f"Date invalide : {exc}"}), 400
+
+    stamp = '_'.join(d.strftime('%Y%m%d%H%M') for d in (start, end) if d) or 'complet'
+    filename = f"{table}_{stamp}.{fmt}.gz"
+
+    return Response(
+        stream_with_context(generate_gzip(table, fmt, start, end)),
+        mimetype='application/gzip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no',  # Desactive le buffering d'un proxy nginx
+        },
+    )
@@ -0,0 +1,178 @@
+"""
+Sondes de sante pour l'orchestrateur (docker-compose, load balancer).
+
+- ``/healthz`` (liveness) : le processus repond. Ne touche pas a la BDD,
+  un echec signifie qu'il faut redemarrer le conteneur.
+- ``/readyz`` (readiness) : le worker peut servir des KPIs rapidement.
+  Repond 200 quand la BDD est joignable et que le prechauffage est
+  termine, 503 sinon ; le corps JSON detaille chaque verification.
+
+Le prechauffage (``start_warmup``) tourne dans un thread au demarrage :
+attente de la BDD avec backoff (series de tentatives repetees toutes les
+``WARMUP_RETRY_INTERVAL_SEC`` tant que la BDD reste injoignable, pour que
+le worker devienne pret des qu'elle arrive), chargement des tables de reference
+(``reference``), puis un calcul complet des KPIs qui charge
+pandas, compile les mappers SQLAlchemy et remplit le pool de connexions.
+``create_app()`` rend donc la main immediatement ; le trafic n'est dirige
+vers le worker qu'une fois ``/readyz`` au vert.
+
+L'age de l'instantane est le temps ecoule depuis le dernier calcul complet
+des KPIs (prechauffage, export ou rapport planifie). Si
+``READYZ_MAX_SNAPSHOT_AGE_SEC`` est defini (> 0), un instantane plus ancien
+rend le worker non pret.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from flask import Blueprint, Flask, jsonify
+
+from . import db, reference
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('health', __name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+# Prechauffage des KPIs au demarrage (desactive dans les tests)
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1').lower() in ('1', 'true', 'yes')
+# Age maximal de l'instantane KPI pour etre pret (0 = pas de limite)
+READYZ_MAX_SNAPSHOT_AGE_SEC = float(os.getenv('READYZ_MAX_SNAPSHOT_AGE_SEC', '0'))
+# Pause entre deux series de tentatives de connexion quand la BDD reste injoignable
+WARMUP_RETRY_INTERVAL_SEC = float(os.getenv('WARMUP_RETRY_INTERVAL_SEC', '10'))
+
+_lock = threading.Lock()
+_state: dict = {
+    'database': None,       # None = pas encore verifie, True / False ensuite
+    'warm': False,          # prechauffage termine
+    'snapshot_at': None,    # time.time() du dernier calcul complet des KPIs
+}
+
+
+# ============================================================================
+# Etat
+# ============================================================================
+
+def mark_database(ok: bool) -> None:
+    """Enregistre le resultat de la derniere tentative de connexion BDD."""
+    with _lock:
+        _state['database'] = ok
+
+
+def mark_warm() -> None:
+    """Signale la fin du prechauffage."""
+    with _lock:
+        _state['warm'] = True
+
+
+def mark_snapshot() -> None:
+    """Signale qu'un instantane complet des KPIs vient d'etre calcule."""
+    with _lock:
+        _state['snapshot_at'] = time.time()
+
+
+def snapshot_age() -> Optional[float]:
+    """Secondes depuis le dernier instantane des KPIs (``None`` si aucun)."""
+    with _lock:
+        snapshot_at = _state['snapshot_at']
+    return None if snapshot_at is None else time.time() - snapshot_at
+
+
+def reset() -> None:
+    """Remet l'etat a zero (tests)."""
+    with _lock:
+        _state.update(database=None, warm=False, snapshot_at=None)
+
+
+# ============================================================================
+# Prechauffage
+# ============================================================================
+
+def _warmup(app: Flask) -> None:
+    """Attend la BDD (sans limite de duree) puis calcule une fois tous les KPIs.
+
+    Chaque serie de tentatives de ``_wait_for_database`` dure quelques
+    secondes ; tant qu'elle echoue, une nouvelle serie est lancee apres
+    ``WARMUP_RETRY_INTERVAL_SEC``. Sans cela, une BDD arrivee apres la
+    premiere serie laisserait ``/readyz`` a 503 indefiniment.
+    """
+    from . import _wait_for_database, export
+
+    while not _wait_for_database(app):
+        logger.warning("BDD toujours injoignable, nouvelle serie de tentatives dans %.0f s.",
+                       WARMUP_RETRY_INTERVAL_SEC)
+        time.sleep(WARMUP_RETRY_INTERVAL_SEC)
+    if STARTUP_WARMUP:
+        start = time.perf_counter()
+        with app.app_context():
+            try:
+                reference.refresh(force=True)
+                export._collect_kpis()
+            except Exception as exc:
+                logger.warning("Prechauffage des KPIs interrompu : %s", exc)
+            finally:
+                db.session.remove()
+        logger.info("Prechauffage des KPIs termine en %.1f s.", time.perf_counter() - start)
+    mark_warm()
+
+
+def start_warmup(app: Flask) -> threading.Thread:
+    """Lance ``_warmup`` dans un thread daemon (``create_app`` ne bloque pas)."""
+    thread = threading.Thread(target=_warmup, args=(app,), name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+# ============================================================================
+# Routes
+# ============================================================================
+
+def _check_database() -> bool:
+    """Verifie la connexion BDD par un ``SELECT 1``."""
+    from sqlalchemy import text
+
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as exc:
+        logger.warning("readyz : BDD injoignable : %s", exc)
+        return False
+
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness : le processus repond (aucun acces BDD)."""
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness : BDD joignable, KPIs prechauffes, instantane assez recent."""
+    with _lock:
+        started = _state['database'] is not None
+        warm = _state['warm']
+
+    # Tant que le thread de demarrage attend la BDD, inutile de l'interroger
+    database = _check_database() if started else False
+    age = snapshot_age()
+    fresh = (
+        READYZ_MAX_SNAPSHOT_AGE_SEC <= 0
+        or (age is not None and age <= READYZ_MAX_SNAPSHOT_AGE_SEC)
+    )
+    ready = database and warm and fresh
+    body = {
+        'status': 'ready' if ready else 'not_ready',
+        'checks': {
+            'database': database,
+            'cache_warm': warm,
+            'snapshot_age_sec': None if age is None else round(age, 1),
+            'snapshot_fresh': fresh,
+        },
+    }
+    return jsonify(body), 200 if ready else 503
@@ -0,0 +1,199 @@
+"""
+File d'attente des exports asynchrones.
+
+Les exports (Excel, PDF) recalculent les 11 KPIs puis generent un fichier,
+ce qui peut prendre plusieurs secondes. Executes dans un thread de requete,
+ils bloquent les workers waitress au detriment des pages du dashboard.
+
+Ce module les execute en arriere-plan :
+- un pool de threads borne (``EXPORT_JOB_WORKERS``) limite la concurrence ;
+- le nombre de jobs en attente est plafonne (``EXPORT_JOB_MAX_PENDING``) ;
+- les fichiers produits sont conserves sur disque (``EXPORT_DIR``) pendant
+  ``EXPORT_JOB_TTL_SEC`` secondes, puis supprimes.
+
+Chaque job est identifie par un jeton aleatoire non devinable, qui sert
+a la fois a consulter son statut et a telecharger le fichier.
+
+Cycle de vie d'un job : ``pending`` -> ``running`` -> ``done`` | ``error``.
+"""
+
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '2'))          # Exports simultanes
+EXPORT_JOB_MAX_PENDING = int(os.getenv('EXPORT_JOB_MAX_PENDING', '20'))  # Jobs en attente max
+EXPORT_JOB_TTL_SEC = int(os.getenv('EXPORT_JOB_TTL_SEC', '3600'))       # Retention des fichiers
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'telefan_exports'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_jobs: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+class JobQueueFull(RuntimeError):
+    """Levee quand trop de jobs sont deja en attente."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Retourne le pool de threads partage (cree au premier appel)."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=EXPORT_JOB_WORKERS,
+                thread_name_prefix='export-job',
+            )
+        return _executor
+
+
+def submit_job(app: Flask, render: Callable[[str], tuple[str, str]], owner: str) -> dict:
+    """Place un export dans la file d'attente.
+
+    Args:
+        app: Instance Flask (le job s'execute dans son contexte applicatif).
+        render: Fonction ``render(path) -> (download_name, mimetype)`` qui
+                ecrit le fichier a l'emplacement ``path``.
+        owner: Identifiant de l'utilisateur qui a demande l'export.
+
+    Returns:
+        Copie publique du job cree (voir ``get_job``).
+
+    Raises:
+        JobQueueFull: si ``EXPORT_JOB_MAX_PENDING`` jobs sont deja en attente.
+    """
+    purge_expired()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+
+    job_id = secrets.token_urlsafe(16)
+    job = {
+        'id': job_id,
+        'owner': owner,
+        'status': 'pending',
+        'created': time.time(),
+        'finished': None,
+        'path': os.path.join(EXPORT_DIR, job_id),
+        'download_name': None,
+        'mimetype': None,
+        'error': None,
+    }
+
+    with _lock:
+        pending = sum(1 for j in _jobs.values() if j['status'] in ('pending', 'running'))
+        if pending >= EXPORT_JOB_MAX_PENDING:
+            raise JobQueueFull(f"{pending} exports deja en attente")
+        _jobs[job_id] = job
+
+    _get_executor().submit(_run_job, app, job, render)
+    return _public(job)
+
+
+def _run_job(app: Flask, job: dict, render: Callable[[str], tuple[str, str]]) -> None:
+    """Execute un job dans un thread du pool."""
+    job['status'] = 'running'
+    try:
+        with app.app_context():
+            download_name, mimetype = render(job['path'])
+        job['download_name'] = download_name
+        job['mimetype'] = mimetype
+        job['status'] = 'done'
+    except Exception as exc:
+        logger.exception("Echec du job d'export %s", job['id'])
+        job['error'] = str(exc)
+        job['status'] = 'error'
+    finally:
+        job['finished'] = time.time()
+
+
+def get_job(job_id: str, owner: Optional[str] = None) -> Optional[dict[str, Any]]:
+    """Retourne l'etat d'un job, ou ``None`` s'il est inconnu ou expire.
+
+    Args:
+        job_id: Jeton du job.
+        owner: Si fourni, le job n'est retourne qu'a son proprietaire.
+    """
+    purge_expired()
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None or (owner is not None and job['owner'] != owner):
+        return None
+    return _public(job)
+
+
+def get_job_file(job_id: str, owner: Optional[str] = None) -> Optional[dict]:
+    """Retourne ``{path, download_name, mimetype}`` d'un job termine, sinon ``None``."""
+    purge_expired()
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None or job['status'] != 'done':
+        return None
+    if owner is not None and job['owner'] != owner:
+        return None
+    if not os.path.exists(job['path']):
+        return None
+    return {
+        'path': job['path'],
+        'download_name': job['download_name'],
+        'mimetype': job['mimetype'],
+    }
+
+
+def purge_expired() -> None:
+    """Supprime les jobs termines depuis plus de ``EXPORT_JOB_TTL_SEC`` et leurs fichiers.
+
+    Les fichiers orphelins du repertoire (processus precedent) sont
+    supprimes selon leur date de modification.
+    """
+    now = time.time()
+    with _lock:
+        expired = [
+            job_id for job_id, job in _jobs.items()
+            if job['finished'] is not None and now - job['finished'] > EXPORT_JOB_TTL_SEC
+        ]
+        for job_id in expired:
+            _remove_file(_jobs.pop(job_id)['path'])
+        known = {job['path'] for job in _jobs.values()}
+
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if path in known:
+            continue
+        try:
+            if now - os.path.getmtime(path) > EXPORT_JOB_TTL_SEC:
+                _remove_file(path)
+        except OSError:
+            pass
+
+
+def _remove_file(path: str) -> None:
+    """Supprime un fichier en ignorant son absence."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _public(job: dict) -> dict[str, Any]:
+    """Vue d'un job exposable en JSON (sans chemin disque ni proprietaire)."""
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'created': job['created'],
+        'finished': job['finished'],
+        'download_name': job['download_name'],
+        'error': job['error'],
+    }
@@ -0,0 +1,557 @@
+"""
+Suivi en direct : lecture incrementale des tables MES et KPIs en O(1).
+
+Sur une ligne en production, ``tblmachinereport``, ``tblfinstep``,
+``tblfinorderpos`` et ``tblpartsreport`` recoivent des lignes en continu,
+alors que chaque rafraichissement des KPIs relit tout l'historique. Le
+tailer interroge chaque table au-dela de son dernier horodatage vu (le
+*watermark*) et replie uniquement les nouvelles lignes dans des cumuls en
+memoire :
+
++-------------------+-------------------------------------+----------------------------------+
+| Table             | Watermark (horodatage + cles vues)  | Cumuls                           |
++-------------------+-------------------------------------+----------------------------------+
+| tblmachinereport  | TimeStamp, (ResourceID, ID)         | busy / total s par machine,      |
+|                   |                                     | etat ouvert reporte              |
+| tblfinstep        | End, (ONo, OPos, StepNo)            | temps nominal / reel, energie    |
+| tblfinorderpos    | End, (ONo, OPos)                    | pieces, pieces en erreur         |
+| tblpartsreport    | TimeStamp, (ResourceID, ID)         | detections, detections en erreur |
++-------------------+-------------------------------------+----------------------------------+
+
+Les lignes dont l'horodatage egale le watermark sont relues puis ignorees
+si leur cle a deja ete vue : plusieurs lignes a la meme seconde ne sont
+ni perdues ni comptees deux fois. Une ligne inseree avec un horodatage
+anterieur au watermark n'est en revanche pas vue (les tables MES sont
+alimentees dans l'ordre chronologique).
+
+Le dernier etat de chaque machine reste *ouvert* : sa duree est comptee a
+l'arrivee de l'evenement suivant, avec les memes filtres que
+``services._stream_machine_time`` (durees <= 0 et trous > 24 h exclus).
+OEE, utilisation, cadence, non-conformite et energie se lisent alors dans
+les cumuls (``snapshot``), sans requete.
+
+Fenetres glissantes (1 h / 8 h / 24 h) : les memes lignes alimentent un
+anneau de ``RING_MINUTES`` seaux d'une minute et, pour chaque fenetre, la
+somme des seaux qu'elle couvre. Avancer d'une minute retire le seau sortant
+de chaque somme puis vide le seau recycle : O(1) par minute, quelle que soit
+la taille de la fenetre. La fin des fenetres est le dernier horodatage MES
+lu (l'heure courante sur une ligne en production). La duree d'un etat
+machine est repartie sur les minutes qu'il couvre (coupee a l'anneau) ;
+l'etat ouvert de chaque machine est compte jusqu'a ce dernier horodatage a
+la lecture de la fenetre, sans etre range dans l'anneau. Les autres lignes
+sont rangees dans la minute ou elles commencent (debut d'etape) ou se
+terminent (piece finie, detection), comme le filtre de periode de
+``services``.
+
+Les cumuls sont propres a chaque application (``app.extensions['live']``),
+comme les index de ``machine_timeline`` et ``production_index``.
+
+Le tailer est active par ``LIVE_TAILER_ENABLED`` ; ``/api/live`` renvoie
+l'instantane (``?refresh=1`` force une lecture immediate) et
+``/api/kpis?window=1h`` les KPIs d'une fenetre glissante.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Iterator, Optional
+
+from flask import Blueprint, Flask, current_app, jsonify, request
+
+from . import db, reference, services
+from .auth import login_required
+from .models import MachineReport, OrderPosition, PartsReport, Step
+
+bp = Blueprint('live', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+LIVE_POLL_INTERVAL_SEC = float(os.getenv('LIVE_POLL_INTERVAL_SEC', '10'))
+
+# Performance retenue tant qu'aucune etape n'est connue (cf. calculate_oee)
+DEFAULT_PERFORMANCE: float = 85.0
+
+# Fenetres glissantes (minutes) et anneau de seaux d'une minute
+ROLLING_WINDOWS: dict[str, int] = {'1h': 60, '8h': 480, '24h': 1_440}
+RING_MINUTES: int = max(ROLLING_WINDOWS.values())
+# Grandeurs cumulees par seau (colonnes de l'anneau)
+RING_FIELDS: tuple[str, ...] = (
+    'busy_sec', 'total_sec', 'nominal_sec', 'actual_sec', 'steps',
+    'cycle_sec', 'cycles', 'pieces', 'piece_errors', 'parts', 'part_errors',
+)
+_FIELD = {name: i for i, name in enumerate(RING_FIELDS)}
+
+_lock = threading.Lock()
+_tailer_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+
+def _new_state() -> dict:
+    """Cumuls et watermarks vides."""
+    return {
+        'watermarks': {},           # table -> {'ts': epoch s, 'keys': set}
+        'open': {},                 # ResourceID -> (epoch s, busy) du dernier etat
+        'machines': {},             # ResourceID -> [busy_sec, total_sec]
+        'nominal_sec': 0, 'actual_sec': 0, 'steps': 0,
+        'energy_mws': 0, 'air_mnl': 0,
+        'pieces': 0, 'piece_errors': 0, 'first_end': None, 'last_end': None,
+        'parts': 0, 'part_errors': 0,
+        'rows': 0, 'polled_at': None,
+        'ring': None,               # RING_MINUTES x RING_FIELDS (alloue a la 1re ligne)
+        'ring_head': None,          # minute epoch du seau le plus recent
+        'ring_last': None,          # dernier horodatage lu (epoch s), fin des fenetres
+        'ring_first': None,         # premiere minute vue (fenetres incompletes)
+        'window_sums': {},          # fenetre -> sommes des seaux couverts
+    }
+
+
+def _state() -> dict:
+    """Cumuls de l'application courante (crees vides au premier acces)."""
+    return current_app.extensions.setdefault('live', _new_state())
+
+
+def reset() -> None:
+    """Remet les cumuls et les watermarks a zero (la prochaine lecture relit tout)."""
+    with _lock:
+        current_app.extensions.pop('live', None)
+
+
+# ============================================================================
+# Lecture incrementale
+# ============================================================================
+
+def _new_rows(table: str, query, ts_column, ts_name: str, key_names: tuple[str, ...],
+              columns: dict[str, str]) -> Iterator[dict]:
+    """Lots des lignes posterieures au watermark de ``table`` (``services._iter_since``)."""
+    state = _state()
+    mark = state['watermarks'].setdefault(table, {'ts': None, 'keys': set()})
+    for chunk in services._iter_since(mark, query, ts_column, ts_name, key_names, columns):
+        state['rows'] += len(chunk[ts_name])
+        yield chunk
+
+
+def _advance_ring(minute: int) -> None:
+    """Avance la tete de l'anneau jusqu'a ``minute`` (O(1) par minute)."""
+    import numpy as np
+
+    state = _state()
+    if state['ring'] is None:
+        state['ring'] = np.zeros((RING_MINUTES, len(RING_FIELDS)), dtype=np.int64)
+        state['window_sums'] = {name: np.zeros(len(RING_FIELDS), dtype=np.int64) for name in ROLLING_WINDOWS}
+    head = state['ring_head']
+    if head is None or minute - head >= RING_MINUTES:
+        # Premier seau ou saut plus long que l'anneau : tout est sorti
+        state['ring'][:] = 0
+        for sums in state['window_sums'].values():
+            sums[:] = 0
+        state['ring_head'] = minute
+        if state['ring_first'] is None:
+            state['ring_first'] = minute
+        return
+    ring = state['ring']
+    for m in range(head + 1, minute + 1):
+        for name, width in ROLLING_WINDOWS.items():
+            state['window_sums'][name] -= ring[(m - width) % RING_MINUTES]
+        ring[m % RING_MINUTES] = 0
+    state['ring_head'] = max(head, minute)
+
+
+def _advance_to(second: int) -> None:
+    """Avance l'anneau jusqu'a l'horodatage ``second`` (epoch s) et le retient comme fin des fenetres."""
+    state = _state()
+    _advance_ring(second // 60)
+    state['ring_last'] = second if state['ring_last'] is None else max(state['ring_last'], second)
+
+
+def _covered_seconds(starts: 'np.ndarray', ends: 'np.ndarray', edges: 'np.ndarray') -> 'np.ndarray':
+    """Secondes des intervalles ``[starts, ends[`` anterieures a chaque borne de ``edges``.
+
+    Somme de rampes ``max(0, t - s) - max(0, t - e)`` evaluee par recherche
+    dichotomique dans les debuts et fins tries : O((n + b) log n).
+    """
+    import numpy as np
+
+    def ramps(points):
+        points = np.sort(points)
+        before = np.searchsorted(points, edges, side='left')
+        return before * edges - np.concatenate(([0], np.cumsum(points)))[before]
+
+    return ramps(starts) - ramps(ends)
+
+
+def _add_spans_to_ring(starts: 'np.ndarray', ends: 'np.ndarray', **fields: 'np.ndarray') -> None:
+    """Repartit des durees ``[starts, ends[`` (epoch s) sur les seaux qu'elles couvrent.
+
+    Chaque champ recoit les secondes des intervalles ou son masque est vrai.
+    Les parties anterieures a l'anneau sont ignorees.
+    """
+    import numpy as np
+
+    state = _state()
+    if not len(starts):
+        return
+    _advance_to(int(ends.max()))
+    head = state['ring_head']
+    minutes = np.arange(head - RING_MINUTES + 1, head + 1, dtype=np.int64)
+    edges = np.append(minutes, head + 1) * 60
+    values = np.zeros((RING_MINUTES, len(RING_FIELDS)), dtype=np.int64)
+    for name, mask in fields.items():
+        values[:, _FIELD[name]] = np.diff(_covered_seconds(starts[mask], ends[mask], edges))
+    state['ring'][minutes % RING_MINUTES] += values
+    for name, width in ROLLING_WINDOWS.items():
+        state['window_sums'][name] += values[-width:].sum(axis=0)
+
+
+def _add_to_ring(seconds: 'np.ndarray', **fields: 'np.ndarray') -> None:
+    """Ajoute des contributions horodatees (epoch s) aux seaux et aux fenetres.
+
+    La tete avance d'abord jusqu'a la minute la plus recente ; les
+    contributions plus anciennes que l'anneau sont ignorees.
+    """
+    import numpy as np
+
+    state = _state()
+    if not len(seconds):
+        return
+    minutes = seconds // 60
+    _advance_to(int(seconds.max()))
+    head = state['ring_head']
+    keep = minutes > head - RING_MINUTES
+    if not keep.any():
+        return
+    minutes = minutes[keep]
+    values = np.zeros((len(minutes), len(RING_FIELDS)), dtype=np.int64)
+    for name, column in fields.items():
+        values[:, _FIELD[name]] = column[keep]
+    np.add.at(state['ring'], minutes % RING_MINUTES, values)
+    for name, width in ROLLING_WINDOWS.items():
+        state['window_sums'][name] += values[minutes > head - width].sum(axis=0)
+
+
+def _fold_machine_states() -> None:
+    """Cumule busy / total par machine en reportant l'etat ouvert."""
+    import numpy as np
+
+    state = _state()
+    query = db.session.query(
+        MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.ID, MachineReport.Busy,
+    ).filter(
+        MachineReport.ResourceID.in_(services.REAL_MACHINE_IDS),
+    ).order_by(MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.ID)
+    columns = {'ResourceID': 'int8', 'TimeStamp': 'epoch', 'ID': 'int64', 'Busy': 'bool'}
+
+    for chunk in _new_rows('machine', query, MachineReport.TimeStamp, 'TimeStamp', ('ResourceID', 'ID'), columns):
+        rid, ts, busy = chunk['ResourceID'].astype(np.int64), chunk['TimeStamp'], chunk['Busy']
+        # Etat precedent de chaque ligne : la ligne d'avant (meme machine) ou l'etat ouvert
+        prev_ts = np.empty(len(ts), dtype=np.int64)
+        prev_busy = np.zeros(len(ts), dtype=bool)
+        has_prev = np.ones(len(ts), dtype=bool)
+        prev_ts[1:], prev_busy[1:] = ts[:-1], busy[:-1]
+        firsts = np.flatnonzero(np.concatenate(([True], rid[1:] != rid[:-1])))
+        for i in firsts:
+            carried = state['open'].get(int(rid[i]))
+            if carried is None:
+                has_prev[i] = False
+            else:
+                prev_ts[i], prev_busy[i] = carried
+
+        duration = ts - prev_ts
+        keep = has_prev & (duration > 0) & (duration < services.MAX_EVENT_DURATION_SEC)
+        total = np.bincount(rid[keep], weights=duration[keep])
+        busy_total = np.bincount(rid[keep], weights=np.where(prev_busy, duration, 0)[keep])
+        _advance_to(int(ts.max()))
+        _add_spans_to_ring(prev_ts[keep], ts[keep], busy_sec=prev_busy[keep],
+                           total_sec=np.ones(int(keep.sum()), dtype=bool))
+        for machine in np.flatnonzero(total):
+            acc = state['machines'].setdefault(int(machine), [0, 0])
+            acc[0] += int(busy_total[machine])
+            acc[1] += int(total[machine])
+
+        lasts = np.concatenate((firsts[1:] - 1, [len(ts) - 1]))
+        for i in lasts:
+            state['open'][int(rid[i])] = (int(ts[i]), bool(busy[i]))
+
+
+def _fold_steps() -> None:
+    """Cumule temps nominal / reel (performance) et energie theorique des etapes finies."""
+    import numpy as np
+
+    state = _state()
+    operations = reference.operations()
+    query = db.session.query(
+        Step.ONo, Step.OPos, Step.StepNo, Step.ResourceID, Step.OpNo, Step.Start, Step.End,
+        Step.ErrorStep,
+    ).filter(
+        Step.Start.isnot(None),
+        Step.End.isnot(None),
+    ).order_by(Step.End)
+    columns = {'ONo': 'int64', 'OPos': 'int64', 'StepNo': 'int64', 'ResourceID': 'int16',
+               'OpNo': 'int16', 'Start': 'epoch', 'End': 'epoch', 'ErrorStep': 'bool'}
+
+    for chunk in _new_rows('step', query, Step.End, 'End', ('ONo', 'OPos', 'StepNo'), columns):
+        specs = np.array([operations.get(key, (0, 0, 0))
+                          for key in zip(chunk['ResourceID'].tolist(), chunk['OpNo'].tolist())],
+                         dtype=np.int64).reshape(-1, 3)
+        working, energy, air = specs[:, 0], specs[:, 1], specs[:, 2]
+        actual = chunk['End'] - chunk['Start']
+        nominal = working > 0
+        state['nominal_sec'] += int(working[nominal].sum())
+        state['actual_sec'] += int(actual[nominal & (actual > 0)].sum())
+        state['steps'] += int(nominal.sum())
+        state['energy_mws'] += int(energy.sum())
+        state['air_mnl'] += int(air.sum())
+
+        # Temps de cycle : etapes productives sans erreur (cf. calculate_cycle_time)
+        cycle = ((chunk['OpNo'] < 200) & ~chunk['ErrorStep']
+                 & (actual > 0) & (actual < services.CYCLE_TIME_MAX_FILTER_SEC))
+        _add_to_ring(
+            chunk['Start'],
+            nominal_sec=np.where(nominal, working, 0),
+            actual_sec=np.where(nominal & (actual > 0), actual, 0),
+            steps=nominal.astype(np.int64),
+            cycle_sec=np.where(cycle, actual, 0),
+            cycles=cycle.astype(np.int64),
+        )
+
+
+def _fold_order_positions() -> None:
+    """Cumule les pieces finies et les pieces en erreur."""
+    import numpy as np
+
+    state = _state()
+    query = db.session.query(
+        OrderPosition.ONo, OrderPosition.OPos, OrderPosition.End, OrderPosition.Error,
+    ).filter(OrderPosition.End.isnot(None)).order_by(OrderPosition.End)
+    columns = {'ONo': 'int64', 'OPos': 'int64', 'End': 'epoch', 'Error': 'bool'}
+
+    for chunk in _new_rows('order_position', query, OrderPosition.End, 'End', ('ONo', 'OPos'), columns):
+        ends = chunk['End']
+        state['pieces'] += len(ends)
+        state['piece_errors'] += int(chunk['Error'].sum())
+        _add_to_ring(ends, pieces=np.ones(len(ends), dtype=np.int64),
+                     piece_errors=chunk['Error'].astype(np.int64))
+        first, last = int(ends.min()), int(ends.max())
+        state['first_end'] = first if state['first_end'] is None else min(first, state['first_end'])
+        state['last_end'] = last if state['last_end'] is None else max(last, state['last_end'])
+
+
+def _fold_parts_reports() -> None:
+    """Cumule les detections de pieces et celles en erreur."""
+    import numpy as np
+
+    state = _state()
+    query = db.session.query(
+        PartsReport.ResourceID, PartsReport.ID, PartsReport.TimeStamp, PartsReport.ErrorID,
+    ).order_by(PartsReport.TimeStamp)
+    columns = {'ResourceID': 'int16', 'ID': 'int64', 'TimeStamp': 'epoch', 'ErrorID': 'int32'}
+
+    for chunk in _new_rows('parts_report', query, PartsReport.TimeStamp, 'TimeStamp', ('ResourceID', 'ID'), columns):
+        state['parts'] += len(chunk['ErrorID'])
+        state['part_errors'] += int((chunk['ErrorID'] != 0).sum())
+        _add_to_ring(chunk['TimeStamp'], parts=np.ones(len(chunk['ErrorID']), dtype=np.int64),
+                     part_errors=(chunk['ErrorID'] != 0).astype(np.int64))
+
+
+def poll() -> int:
+    """Replie les nouvelles lignes de chaque table dans les cumuls.
+
+    Doit etre appele dans un contexte d'application.
+
+    Returns:
+        Nombre de nouvelles lignes lues.
+    """
+    with _lock:
+        state = _state()
+        before = state['rows']
+        _fold_machine_states()
+        _fold_steps()
+        _fold_order_positions()
+        _fold_parts_reports()
+        state['polled_at'] = time.time()
+        return state['rows'] - before
+
+
+# ============================================================================
+# KPIs depuis les cumuls
+# ============================================================================
+
+def snapshot() -> dict:
+    """KPIs courants calcules depuis les cumuls (aucune requete SQL).
+
+    Memes formules que ``services`` : disponibilite et utilisation
+    (``tblmachinereport``), performance (temps nominal / reel plafonne a
+    100 %), qualite et cadence (``tblfinorderpos``), non-conformite combinee
+    (``tblfinorderpos`` + ``tblpartsreport``) et energie theorique.
+    """
+    with _lock:
+        state = _state()
+        machines = {rid: tuple(acc) for rid, acc in state['machines'].items()}
+        s = dict(state)
+
+    busy = sum(b for b, _ in machines.values())
+    total = sum(t for _, t in machines.values())
+    availability = (busy / total * 100) if total > 0 else 0
+    rates = {rid: (b / t * 100) if t > 0 else 0 for rid, (b, t) in sorted(machines.items())}
+    utilization = sum(rates.values()) / len(rates) if rates else 0
+
+    if s['steps']:
+        performance = min((s['nominal_sec'] / s['actual_sec'] * 100) if s['actual_sec'] > 0 else 0, 100)
+    else:
+        performance = DEFAULT_PERFORMANCE
+    pieces, piece_errors = s['pieces'], s['piece_errors']
+    quality = ((pieces - piece_errors) / pieces * 100) if pieces > 0 else 0
+    oee = availability * performance * quality / 10_000 if total > 0 else 0
+
+    hours = ((s['last_end'] - s['first_end']) / 3600) if pieces >= 2 else 0
+    observations = pieces + s['parts']
+    non_conformity = ((piece_errors + s['part_errors']) / observations * 100) if observations else 0
+
+    return {
+        'oee': {
+            'value': round(oee, 1),
+            'availability': round(availability, 1),
+            'performance': round(performance, 1),
+            'quality': round(quality, 1),
+        },
+        'utilization': {
+            'overall': round(utilization, 1),
+            'by_machine': [{'id': rid, 'value': round(rate, 1)} for rid, rate in rates.items()],
+        },
+        'throughput': {'value': round(pieces / hours, 1) if hours > 0 else 0, 'pieces': pieces},
+        'non_conformity': {
+            'value': round(non_conformity, 2),
+            'total_pieces': pieces,
+            'total_errors': piece_errors + s['part_errors'],
+        },
+        'energy': {
+            'kwh': round(s['energy_mws'] / services.MWS_PER_KWH, 4),
+            'air_l': round(s['air_mnl'] / services.MNL_PER_LITER, 1),
+        },
+        'rows': s['rows'],
+        'polled_at': s['polled_at'],
+    }
+
+
+def _open_seconds(state: dict, since: int) -> tuple[int, int]:
+    """Secondes busy / totales des etats ouverts entre ``since`` et le dernier horodatage lu.
+
+    Memes filtres que les etats clos : un etat ouvert depuis plus de
+    ``services.MAX_EVENT_DURATION_SEC`` n'est pas compte.
+    """
+    last = state['ring_last']
+    busy = total = 0
+    if last is None:
+        return busy, total
+    for opened, is_busy in state['open'].values():
+        if not 0 < last - opened < services.MAX_EVENT_DURATION_SEC:
+            continue
+        seconds = max(last - max(opened, since), 0)
+        total += seconds
+        busy += seconds if is_busy else 0
+    return busy, total
+
+
+def rolling_kpis(window: str) -> dict:
+    """OEE, cadence, temps de cycle et non-conformite sur une fenetre glissante.
+
+    Lit la somme maintenue pour ``window`` (aucune requete, aucun parcours
+    des seaux), plus l'etat ouvert de chaque machine jusqu'au dernier
+    horodatage lu. La cadence est rapportee a la duree couverte par la
+    fenetre, bornee par le debut des donnees lues.
+
+    Args:
+        window: Cle de ``ROLLING_WINDOWS`` (``'1h'``, ``'8h'``, ``'24h'``).
+
+    Raises:
+        ValueError: Fenetre inconnue.
+    """
+    if window not in ROLLING_WINDOWS:
+        raise ValueError(f"Fenetre inconnue : {window} (attendu : {', '.join(ROLLING_WINDOWS)})")
+    width = ROLLING_WINDOWS[window]
+    with _lock:
+        state = _state()
+        head, first = state['ring_head'], state['ring_first']
+        sums = state['window_sums'].get(window)
+        values = dict(zip(RING_FIELDS, (int(v) for v in sums))) if sums is not None \
+            else dict.fromkeys(RING_FIELDS, 0)
+        if head is not None:
+            busy, total = _open_seconds(state, (head - width + 1) * 60)
+            values['busy_sec'] += busy
+            values['total_sec'] += total
+
+    availability = (values['busy_sec'] / values['total_sec'] * 100) if values['total_sec'] > 0 else 0
+    if values['steps']:
+        performance = min((values['nominal_sec'] / values['actual_sec'] * 100)
+                          if values['actual_sec'] > 0 else 0, 100)
+    else:
+        performance = DEFAULT_PERFORMANCE
+    pieces, piece_errors = values['pieces'], values['piece_errors']
+    quality = ((pieces - piece_errors) / pieces * 100) if pieces > 0 else 0
+    oee = availability * performance * quality / 10_000 if values['total_sec'] > 0 else 0
+
+    covered = min(width, head - first + 1) if head is not None else 0
+    observations = pieces + values['parts']
+    errors = piece_errors + values['part_errors']
+    non_conformity = (errors / observations * 100) if observations else 0
+    cycle_time = (values['cycle_sec'] / values['cycles']) if values['cycles'] else 0
+
+    return {
+        'window': window,
+        'start': services._from_epoch((head - width + 1) * 60).isoformat() if head is not None else None,
+        'end': services._from_epoch((head + 1) * 60).isoformat() if head is not None else None,
+        'oee': {
+            'value': round(oee, 1),
+            'availability': round(availability, 1),
+            'performance': round(performance, 1),
+            'quality': round(quality, 1),
+        },
+        'throughput': {'value': round(pieces / (covered / 60), 1) if covered else 0, 'pieces': pieces},
+        'cycle_time': {'value': round(cycle_time, 1), 'count': values['cycles']},
+        'non_conformity': {'value': round(non_conformity, 2), 'total_pieces': pieces, 'total_errors': errors},
+    }
+
+
+# ============================================================================
+# Thread de lecture et route
+# ============================================================================
+
+def _tailer_loop(app: Flask) -> None:
+    """Boucle du thread de lecture."""
+    while not _stop_event.is_set():
+        try:
+            with app.app_context():
+                poll()
+        except Exception:
+            logger.exception("Erreur du suivi en direct")
+        finally:
+            with app.app_context():
+                db.session.remove()
+        _stop_event.wait(LIVE_POLL_INTERVAL_SEC)
+
+
+def start_tailer(app: Flask) -> None:
+    """Demarre le thread de lecture (une seule fois par processus)."""
+    global _tailer_thread
+    if _tailer_thread is not None and _tailer_thread.is_alive():
+        return
+    _tailer_thread = threading.Thread(target=_tailer_loop, args=(app,), name='live-tailer', daemon=True)
+    _tailer_thread.start()
+    logger.info("Suivi en direct demarre (toutes les %.0f s).", LIVE_POLL_INTERVAL_SEC)
+
+
+def ensure_fresh(force: bool = False) -> None:
+    """Lit les nouvelles lignes si le thread de lecture ne le fait pas deja."""
+    if force or _tailer_thread is None or not _tailer_thread.is_alive():
+        poll()
+
+
+@bp.route('/api/live')
+@login_required
+def api_live():
+    """KPIs en direct depuis les cumuls (``?refresh=1`` : lecture immediate)."""
+    ensure_fresh(request.args.get('refresh') == '1')
+    return jsonify(snapshot())
@@ -0,0 +1,315 @@
+"""
+Index des timelines d'etat machine : temps Busy / erreur / total sur toute fenetre.
+
+Pour chaque machine reelle, les etats de ``tblmachinereport`` sont ranges
+en intervalles ``[debut, fin[`` tries (un etat dure jusqu'a l'evenement
+suivant de la machine ; durees <= 0 et trous > 24 h exclus, comme
+``services._get_machine_durations``), avec les sommes cumulees des temps
+total, Busy et en erreur (``ErrorL0`` ou ``ErrorL2``) :
+
+    debut      : [s0, s1, s2, ...]         fin : [e0, e1, e2, ...]
+    cum_total  : [0, d0, d0+d1, ...]       (idem cum_busy, cum_error)
+
+Le temps couvert avant un instant ``t`` vaut ``cum[i]`` plus la part de
+l'intervalle ``i`` deja ecoulee, ou ``i`` est trouve par recherche
+dichotomique sur ``fin``. Le temps d'une fenetre ``[t0, t1[`` est la
+difference des deux valeurs : O(log n) par machine, quelle que soit la
+fenetre, et les intervalles a cheval sur une borne sont coupes. Une serie
+de seaux (zoom de graphique) coute O(log n) par seau.
+
+L'index est propre a chaque application (``app.extensions``) et complete
+a chaque acces par les seules lignes posterieures au dernier horodatage lu
+(``services._iter_since``) ; le dernier etat de chaque machine reste
+ouvert jusqu'a l'evenement suivant. Les tableaux croissent par doublement
+de capacite (``services._extend_array``) : un ajout ne recopie pas
+l'historique. Les suppressions et les lignes inserees avant le dernier
+horodatage lu ne sont pas vues : ``reset()`` force une reconstruction.
+
+Memoire : l'index garde tout l'historique en memoire, soit 42 octets par
+etat (jusqu'au double avec la reserve de croissance), environ 40 Mo par
+million d'etats. C'est le prix de l'acces O(log n) : la lecture en flux
+qu'il remplace (``_stream_machine_time`` avant l'index) relisait toute la
+table a chaque appel mais en memoire constante, quel que soit le nombre
+d'annees.
+
+    GET /api/machines/timeline?machine=3&start=...&end=...&buckets=48
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from flask import Blueprint, current_app, jsonify, request
+
+from . import db, services
+from .auth import login_required
+from .models import MachineReport
+
+if TYPE_CHECKING:
+    import numpy as np
+
+bp = Blueprint('machine_timeline', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+# Seaux renvoyes par defaut / au maximum par /api/machines/timeline
+DEFAULT_BUCKETS: int = 48
+MAX_BUCKETS: int = 2_000
+
+_COLUMNS: dict[str, str] = {
+    'ResourceID': 'int8',
+    'TimeStamp': 'epoch',
+    'ID': 'int64',
+    'Busy': 'bool',
+    'ErrorL0': 'bool',
+    'ErrorL2': 'bool',
+}
+
+_lock = threading.Lock()
+
+
+# ============================================================================
+# Construction incrementale
+# ============================================================================
+
+def _empty_machine() -> dict:
+    import numpy as np
+
+    return {
+        'start': np.empty(0, dtype=np.int64),
+        'end': np.empty(0, dtype=np.int64),
+        'busy': np.empty(0, dtype=bool),
+        'error': np.empty(0, dtype=bool),
+        'cum_total': np.zeros(1, dtype=np.int64),
+        'cum_busy': np.zeros(1, dtype=np.int64),
+        'cum_error': np.zeros(1, dtype=np.int64),
+        'buffers': {},      # tampons a croissance amortie sous les tableaux ci-dessus
+    }
+
+
+def _append(machine: dict, start: 'np.ndarray', end: 'np.ndarray',
+            busy: 'np.ndarray', error: 'np.ndarray') -> None:
+    """Ajoute des intervalles (tries, posterieurs) a la timeline d'une machine.
+
+    O(len(start)) amorti : l'historique n'est pas recopie.
+    """
+    import numpy as np
+
+    duration = end - start
+    for name, values in (('start', start), ('end', end), ('busy', busy), ('error', error)):
+        services._extend_array(machine, machine['buffers'], name, values)
+    for name, values in (('cum_total', duration),
+                         ('cum_busy', np.where(busy, duration, 0)),
+                         ('cum_error', np.where(error, duration, 0))):
+        services._extend_array(machine, machine['buffers'], name, machine[name][-1] + np.cumsum(values))
+
+
+def _fold(index: dict) -> int:
+    """Ajoute a l'index les evenements posterieurs au watermark.
+
+    Returns:
+        Nombre de nouveaux evenements lus.
+    """
+    import numpy as np
+
+    query = db.session.query(
+        MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.ID,
+        MachineReport.Busy, MachineReport.ErrorL0, MachineReport.ErrorL2,
+    ).filter(
+        MachineReport.ResourceID.in_(services.REAL_MACHINE_IDS),
+    ).order_by(MachineReport.ResourceID, MachineReport.TimeStamp, MachineReport.ID)
+
+    rows = 0
+    for chunk in services._iter_since(index['mark'], query, MachineReport.TimeStamp, 'TimeStamp',
+                                      ('ResourceID', 'ID'), _COLUMNS):
+        rows += len(chunk['TimeStamp'])
+        rid = chunk['ResourceID']
+        bounds = np.flatnonzero(np.concatenate(([True], rid[1:] != rid[:-1], [True])))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            machine = int(rid[lo])
+            ts = chunk['TimeStamp'][lo:hi]
+            busy = chunk['Busy'][lo:hi]
+            error = chunk['ErrorL0'][lo:hi] | chunk['ErrorL2'][lo:hi]
+            # Etat ouvert de la machine en tete : sa duree se termine au 1er evenement
+            carried = index['open'].get(machine)
+            if carried is not None:
+                ts = np.concatenate(([carried[0]], ts))
+                busy = np.concatenate(([carried[1]], busy))
+                error = np.concatenate(([carried[2]], error))
+            index['open'][machine] = (int(ts[-1]), bool(busy[-1]), bool(error[-1]))
+
+            duration = ts[1:] - ts[:-1]
+            keep = (duration > 0) & (duration < services.MAX_EVENT_DURATION_SEC)
+            if keep.any():
+                _append(index['machines'].setdefault(machine, _empty_machine()),
+                        ts[:-1][keep], ts[1:][keep], busy[:-1][keep], error[:-1][keep])
+    return rows
+
+
+def refresh() -> dict:
+    """Index de l'application courante, complete par les nouveaux evenements.
+
+    Une requete par appel (vide si aucune ligne n'a ete ajoutee).
+    """
+    with _lock:
+        index = current_app.extensions.setdefault('machine_timeline', {
+            'mark': {'ts': None, 'keys': set()},
+            'open': {},         # ResourceID -> (epoch s, busy, error) du dernier etat
+            'machines': {},     # ResourceID -> intervalles et sommes cumulees
+        })
+        _fold(index)
+        return index
+
+
+def reset() -> None:
+    """Supprime l'index de l'application courante (reconstruit au prochain acces)."""
+    with _lock:
+        current_app.extensions.pop('machine_timeline', None)
+
+
+# ============================================================================
+# Requetes
+# ============================================================================
+
+def _covered(machine: dict, t: 'np.ndarray') -> dict[str, 'np.ndarray']:
+    """Temps total / Busy / erreur couverts avant chaque instant de ``t``."""
+    import numpy as np
+
+    start, end = machine['start'], machine['end']
+    i = np.searchsorted(end, t, side='right')     # intervalles termines avant t
+    j = np.minimum(i, len(start) - 1)
+    partial = np.where(i < len(start), np.clip(t - start[j], 0, end[j] - start[j]), 0)
+    return {
+        'total': machine['cum_total'][i] + partial,
+        'busy': machine['cum_busy'][i] + np.where(machine['busy'][j], partial, 0),
+        'error': machine['cum_error'][i] + np.where(machine['error'][j], partial, 0),
+    }
+
+
+def bucket_totals(machine: dict, edges: 'np.ndarray') -> dict[str, 'np.ndarray']:
+    """Temps total / Busy / erreur et nombre d'etats commences par seau.
+
+    Args:
+        machine: Timeline d'une machine (``refresh()['machines'][rid]``).
+        edges: Bornes croissantes des seaux (epoch s), ``len(edges) - 1`` seaux.
+    """
+    import numpy as np
+
+    edges = np.asarray(edges, dtype=np.int64)
+    if not len(machine['start']):
+        zeros = np.zeros(max(len(edges) - 1, 0), dtype=np.int64)
+        return {'total': zeros, 'busy': zeros, 'error': zeros, 'count': zeros}
+    totals = {name: np.diff(values) for name, values in _covered(machine, edges).items()}
+    totals['count'] = np.diff(np.searchsorted(machine['start'], edges, side='left'))
+    return totals
+
+
+def span(index: dict) -> Optional[tuple[int, int]]:
+    """Debut du premier et fin du dernier intervalle indexes (epoch s)."""
+    machines = [m for m in index['machines'].values() if len(m['start'])]
+    if not machines:
+        return None
+    return min(int(m['start'][0]) for m in machines), max(int(m['end'][-1]) for m in machines)
+
+
+def window_totals(t0: Optional[int] = None, t1: Optional[int] = None) -> dict[int, dict[str, int]]:
+    """Temps total / Busy / erreur et nombre d'etats de chaque machine sur ``[t0, t1[``.
+
+    Args:
+        t0, t1: Bornes en secondes epoch (``None`` = non bornee).
+
+    Returns:
+        ``{ResourceID: {'total', 'busy', 'error', 'count'}}`` (machines
+        ayant au moins une seconde dans la fenetre).
+    """
+    index = refresh()
+    bounds = span(index)
+    if bounds is None:
+        return {}
+    t0 = bounds[0] if t0 is None else t0
+    t1 = bounds[1] if t1 is None else t1
+    out = {}
+    for rid, machine in sorted(index['machines'].items()):
+        totals = bucket_totals(machine, [t0, t1])
+        if totals['total'][0] > 0:
+            out[rid] = {name: int(values[0]) for name, values in totals.items()}
+    return out
+
+
+def timeline(machine: Optional[int] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, buckets: int = DEFAULT_BUCKETS) -> dict:
+    """Disponibilite par seaux egaux sur ``[start, end[`` (zoom de graphique).
+
+    Args:
+        machine: ResourceID (``None`` = toutes les machines reelles cumulees).
+        start, end: Fenetre (defaut : la plage indexee).
+        buckets: Nombre de seaux (1 a ``MAX_BUCKETS``).
+
+    Raises:
+        ValueError: Nombre de seaux ou fenetre invalide.
+    """
+    import numpy as np
+
+    if not 1 <= buckets <= MAX_BUCKETS:
+        raise ValueError(f"buckets doit etre entre 1 et {MAX_BUCKETS}")
+    index = refresh()
+    bounds = span(index)
+    if bounds is None:
+        return {'machine': machine, 'buckets': [], 'status': 'unavailable'}
+    t0 = bounds[0] if start is None else int((services._local_naive(start) - services._EPOCH).total_seconds())
+    t1 = bounds[1] if end is None else int((services._local_naive(end) - services._EPOCH).total_seconds())
+    if t1 <= t0:
+        raise ValueError("end doit etre posterieur a start")
+
+    edges = np.unique(np.linspace(t0, t1, buckets + 1).round().astype(np.int64))
+    machines = [index['machines'][machine]] if machine in index['machines'] else (
+        [] if machine is not None else list(index['machines'].values())
+    )
+    totals = {name: np.zeros(len(edges) - 1, dtype=np.int64) for name in ('total', 'busy', 'error', 'count')}
+    for intervals in machines:
+        for name, values in bucket_totals(intervals, edges).items():
+            totals[name] += values
+
+    return {
+        'machine': machine,
+        'start': services._from_epoch(t0).isoformat(),
+        'end': services._from_epoch(t1).isoformat(),
+        'buckets': [
+            {
+                'start': services._from_epoch(lo).isoformat(),
+                'total_sec': int(total),
+                'busy_sec': int(busy),
+                'error_sec': int(error),
+                'availability': round(busy / total * 100, 1) if total > 0 else None,
+            }
+            for lo, total, busy, error in zip(edges[:-1].tolist(), totals['total'].tolist(),
+                                              totals['busy'].tolist(), totals['error'].tolist())
+        ],
+        'status': 'normal',
+    }
+
+
+# ============================================================================
+# Route
+# ============================================================================
+
+@bp.route('/api/machines/timeline')
+@login_required
+def api_machine_timeline():
+    """Temps Busy / erreur / total par seaux pour un zoom de graphique.
+
+    Parametres : ``machine`` (ResourceID, defaut toutes), ``start`` /
+    ``end`` (ISO 8601) et ``buckets`` (defaut ``DEFAULT_BUCKETS``).
+    """
+    try:
+        start = services.parse_datetime(request.args.get('start', ''))
+        end = services.parse_datetime(request.args.get('end', ''))
+        machine = request.args.get('machine', type=int)
+        buckets = request.args.get('buckets', DEFAULT_BUCKETS, type=int)
+        return jsonify(timeline(machine, start, end, buckets))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
@@ -0,0 +1,260 @@
+"""
+Metriques d'execution au format texte Prometheus.
+
+Ce module instrumente :
+- le decorateur ``services._safe_kpi`` : chaque appel d'une fonction KPI
+  est chronometre et rattache a un *scope* qui compte les requetes SQL
+  emises et les lignes lues pendant son execution ;
+- les fonctions internes couteuses (ex. ``_get_machine_durations``) via
+  ``@timed`` ;
+- le moteur SQLAlchemy (evenements ``before_cursor_execute`` et
+  ``do_orm_execute``).
+
+Les metriques sont publiees sur ``/metrics`` (role ``admin``, ou jeton
+``METRICS_TOKEN`` en en-tete ``Authorization: Bearer`` pour un scraper).
+
+Metriques exposees
+==================
+
++------------------------------------------+-----------+---------------------------+
+| Nom                                      | Type      | Labels                    |
++------------------------------------------+-----------+---------------------------+
+| telefan_kpi_duration_seconds             | histogram | kpi                       |
+| telefan_kpi_errors_total                 | counter   | kpi                       |
+| telefan_kpi_sql_statements_total         | counter   | kpi                       |
+| telefan_kpi_rows_fetched_total           | counter   | kpi                       |
+| telefan_section_duration_seconds         | histogram | section                   |
++------------------------------------------+-----------+---------------------------+
+"""
+
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Optional
+
+from flask import Blueprint, Response, request, session
+
+bp = Blueprint('metrics', __name__)
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Jeton optionnel pour un scraper Prometheus (sinon session admin requise)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+_lock = threading.Lock()
+_histograms: dict[tuple[str, str], dict] = {}   # (metrique, label) -> etat
+_counters: dict[tuple[str, str], float] = {}     # (metrique, label) -> valeur
+
+# Scope courant : compteurs SQL du KPI en cours d'execution
+_scope: ContextVar[Optional[dict]] = ContextVar('_metrics_scope', default=None)
+
+_instrumented = False
+
+
+# ============================================================================
+# Enregistrement
+# ============================================================================
+
+def _observe(metric: str, label: str, value: float) -> None:
+    """Ajoute une observation a un histogramme."""
+    with _lock:
+        hist = _histograms.get((metric, label))
+        if hist is None:
+            hist = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            _histograms[(metric, label)] = hist
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist['buckets'][i] += 1
+        hist['sum'] += value
+        hist['count'] += 1
+
+
+def _inc(metric: str, label: str, value: float = 1) -> None:
+    """Incremente un compteur."""
+    with _lock:
+        _counters[(metric, label)] = _counters.get((metric, label), 0) + value
+
+
+@contextmanager
+def kpi_scope(name: str) -> Iterator[dict]:
+    """Chronometre un calcul de KPI et compte ses requetes SQL.
+
+    Les scopes imbriques sont ignores : les requetes d'un KPI appele par
+    un autre sont comptees dans le KPI exterieur.
+
+    Args:
+        name: Nom du KPI (label ``kpi``).
+
+    Yields:
+        Dictionnaire ``{'statements', 'rows'}`` mis a jour en direct.
+    """
+    if _scope.get() is not None:
+        yield _scope.get()
+        return
+
+    stats = {'statements': 0, 'rows': 0}
+    token = _scope.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        _scope.reset(token)
+        _observe('telefan_kpi_duration_seconds', name, time.perf_counter() - start)
+        _inc('telefan_kpi_sql_statements_total', name, stats['statements'])
+        _inc('telefan_kpi_rows_fetched_total', name, stats['rows'])
+
+
+def add_rows(count: int) -> None:
+    """Ajoute ``count`` lignes lues au scope KPI courant (lectures en flux)."""
+    stats = _scope.get()
+    if stats is not None:
+        stats['rows'] += count
+
+
+def record_error(name: str) -> None:
+    """Compte une erreur de calcul pour le KPI ``name``."""
+    _inc('telefan_kpi_errors_total', name)
+
+
+def timed(section: str) -> Callable:
+    """Decorateur chronometrant une fonction interne (label ``section``)."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _observe('telefan_section_duration_seconds', section, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# Instrumentation SQLAlchemy
+# ============================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001
+    """Compte chaque requete envoyee au driver pendant un scope KPI."""
+    stats = _scope.get()
+    if stats is not None:
+        stats['statements'] += 1
+
+
+def _do_orm_execute(orm_execute_state):
+    """Compte les lignes lues par les requetes ORM pendant un scope KPI.
+
+    Le resultat est materialise (``freeze``) pour etre compte puis rejoue.
+    Les lectures en flux (``yield_per`` / ``stream_results``) ne sont pas
+    concernees, afin de ne pas charger en memoire un curseur serveur :
+    leur lecteur les compte lui-meme via ``add_rows``.
+    """
+    stats = _scope.get()
+    if stats is None:
+        return None
+    options = orm_execute_state.execution_options
+    if options.get('yield_per') or options.get('stream_results'):
+        return None
+    if not orm_execute_state.is_select:
+        return None
+
+    frozen = orm_execute_state.invoke_statement().freeze()
+    stats['rows'] += len(frozen.data)
+    return frozen()
+
+
+def init_app(app) -> None:  # noqa: ARG001
+    """Installe les ecouteurs SQLAlchemy (une seule fois par processus)."""
+    global _instrumented
+    if _instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.orm import Session
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    _instrumented = True
+
+
+# ============================================================================
+# Exposition au format texte Prometheus
+# ============================================================================
+
+_HELP = {
+    'telefan_kpi_duration_seconds': ('histogram', 'Duree de calcul des fonctions KPI.', 'kpi'),
+    'telefan_kpi_errors_total': ('counter', 'Erreurs capturees par _safe_kpi.', 'kpi'),
+    'telefan_kpi_sql_statements_total': ('counter', 'Requetes SQL emises par KPI.', 'kpi'),
+    'telefan_kpi_rows_fetched_total': ('counter', 'Lignes lues par les requetes ORM par KPI.', 'kpi'),
+    'telefan_section_duration_seconds': ('histogram', 'Duree des fonctions internes instrumentees.', 'section'),
+}
+
+
+def _escape(value: str) -> str:
+    """Echappe une valeur de label Prometheus."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value: float) -> str:
+    """Formate un nombre (entier sans decimales)."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Retourne toutes les metriques au format d'exposition texte Prometheus."""
+    with _lock:
+        histograms = {key: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                      for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for metric, (kind, help_text, label_name) in _HELP.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        if kind == 'histogram':
+            for (name, label), hist in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                lbl = f'{label_name}="{_escape(label)}"'
+                for bound, count in zip(LATENCY_BUCKETS, hist['buckets']):
+                    lines.append(f'{metric}_bucket{{{lbl},le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{lbl},le="+Inf"}} {hist["count"]}')
+                lines.append(f'{metric}_sum{{{lbl}}} {_fmt(hist["sum"])}')
+                lines.append(f'{metric}_count{{{lbl}}} {hist["count"]}')
+        else:
+            for (name, label), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}{{{label_name}="{_escape(label)}"}} {_fmt(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    """Remet toutes les metriques a zero (tests)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _authorized() -> bool:
+    """Session admin, ou jeton ``METRICS_TOKEN`` valide."""
+    if session.get('role') == 'admin':
+        return True
+    if METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header, f'Bearer {METRICS_TOKEN}')
+    return False
+
+
+@bp.route('/metrics')
+def metrics():
+    """Expose les metriques au format texte Prometheus (admin uniquement)."""
+    if not _authorized():
+        return Response('Acces non autorise.\n', status=403, mimetype='text/plain')
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
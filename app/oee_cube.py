@@ -0,0 +1,317 @@
+"""
+Cube OEE multi-granularite : machine x equipe x jour.
+
+``calculate_oee()`` ne donne qu'une valeur globale. Les chefs d'equipe
+veulent l'OEE et ses trois composantes par machine, par equipe et par jour.
+Appeler ``calculate_oee()`` pour chaque tranche reviendrait a relire les
+sources des centaines de fois : le cube est construit en une seule passe
+groupee par source, puis toute tranche, agregation ou detail est calculee
+en memoire a partir des mesures additives des cellules.
+
+Mesures stockees (additives)
+============================
+
++--------------+------------------------------+---------------------------------+
+| Cellule      | Mesures                      | Source                          |
++--------------+------------------------------+---------------------------------+
+| machine,     | busy_sec, total_sec          | tblmachinereport (durees)       |
+| jour, equipe | nominal_sec, actual_sec      | tblfinstep x tblresourceoperation|
++--------------+------------------------------+---------------------------------+
+| jour, equipe | pieces, errors               | tblfinorderpos                  |
++--------------+------------------------------+---------------------------------+
+
+La qualite est une mesure de ligne (``tblfinorderpos`` ne rattache pas les
+pieces a une machine) : une tranche par machine utilise la qualite de la
+ligne sur les memes jours / equipes.
+
+Chaque evenement est rattache a l'equipe et au jour de son debut (l'equipe
+de nuit 22h-06h appartient au jour ou elle commence). Les ratios suivent
+les conventions de ``calculate_oee()`` : l'agregation de tout le cube
+redonne ses valeurs.
+
+    GET /api/oee/cube?by=machine,shift&day=2025-03-27
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from flask import Blueprint, jsonify, request
+
+from . import db, services
+from .auth import login_required
+from .models import OrderPosition, ResourceOperation, Step
+from .scheduler import SHIFTS
+
+bp = Blueprint('oee_cube', __name__)
+
+logger = logging.getLogger(__name__)
+
+# Dimensions du cube, dans l'ordre des cles de cellule
+CUBE_DIMENSIONS: tuple[str, ...] = ('machine', 'day', 'shift')
+
+# Performance retenue quand aucune etape n'est disponible (cf. calculate_oee)
+DEFAULT_PERFORMANCE: float = 85.0
+
+_MACHINE_MEASURES = ('busy_sec', 'total_sec', 'nominal_sec', 'actual_sec')
+_LINE_MEASURES = ('pieces', 'errors')
+
+
+# ============================================================================
+# Construction
+# ============================================================================
+
+def _shift_lookup() -> tuple[list[str], list[int], list[int]]:
+    """Tables heure -> (index d'equipe, decalage de jour) d'apres ``SHIFTS``.
+
+    Une equipe qui chevauche minuit (22h-06h) rattache ses heures du matin
+    au jour precedent.
+    """
+    names = [name for name, _, _ in SHIFTS]
+    shift_of_hour = [0] * 24
+    day_offset = [0] * 24
+    for index, (_, start_h, end_h) in enumerate(SHIFTS):
+        hours = range(start_h, end_h) if end_h > start_h else [*range(start_h, 24), *range(0, end_h)]
+        for hour in hours:
+            shift_of_hour[hour] = index
+            day_offset[hour] = -1 if end_h <= start_h and hour < end_h else 0
+    return names, shift_of_hour, day_offset
+
+
+def _slice_keys(epoch: 'np.ndarray') -> tuple['np.ndarray', 'np.ndarray']:
+    """Jour (jours depuis 1970) et index d'equipe de chaque timestamp epoch."""
+    import numpy as np
+
+    _, shift_of_hour, day_offset = _shift_lookup()
+    hours = (epoch % 86_400) // 3_600
+    days = epoch // 86_400 + np.asarray(day_offset, dtype=np.int64)[hours]
+    shifts = np.asarray(shift_of_hour, dtype=np.int8)[hours]
+    return days, shifts
+
+
+def build_cube() -> dict:
+    """Construit le cube sur la fenetre courante (``services.time_window``).
+
+    Une requete et un ``groupby`` par source : durees machine, etapes
+    (temps nominal vs reel) et pieces terminees.
+
+    Returns:
+        dict avec cles ``machine_cells`` ({(machine, jour, equipe): mesures})
+        et ``line_cells`` ({(jour, equipe): mesures}) ; ``jour`` est un
+        nombre de jours depuis 1970, ``equipe`` un index de ``SHIFTS``.
+    """
+    import pandas as pd
+
+    # --- Disponibilite : durees des etats machine ---
+    durations = services._get_machine_durations()
+    frames = []
+    if not durations.empty:
+        days, shifts = _slice_keys(durations['TimeStamp'].to_numpy())
+        frames.append(pd.DataFrame({
+            'machine': durations['ResourceID'].to_numpy(),
+            'day': days,
+            'shift': shifts,
+            'busy_sec': durations['Duration'].where(durations['Busy'], 0).to_numpy(),
+            'total_sec': durations['Duration'].to_numpy(),
+        }))
+    del durations
+
+    # --- Performance : temps nominal vs temps reel des etapes ---
+    steps = services._load_frame(services._in_window(db.session.query(
+        Step.ResourceID, Step.Start, Step.End, ResourceOperation.WorkingTime,
+    ).join(
+        ResourceOperation,
+        db.and_(
+            Step.ResourceID == ResourceOperation.ResourceID,
+            Step.OpNo == ResourceOperation.OpNo,
+        ),
+    ).filter(
+        Step.End.isnot(None),
+        Step.Start.isnot(None),
+        ResourceOperation.WorkingTime > 0,
+    ), Step.Start), {'ResourceID': 'int16', 'Start': 'epoch', 'End': 'epoch', 'WorkingTime': 'int32'})
+    if not steps.empty:
+        actual = steps['End'] - steps['Start']
+        days, shifts = _slice_keys(steps['Start'].to_numpy())
+        frames.append(pd.DataFrame({
+            'machine': steps['ResourceID'].to_numpy(),
+            'day': days,
+            'shift': shifts,
+            'nominal_sec': steps['WorkingTime'].to_numpy(),
+            'actual_sec': actual.where(actual > 0, 0).to_numpy(),
+        }))
+    del steps
+
+    machine_cells = {}
+    if frames:
+        facts = pd.concat(frames, ignore_index=True)
+        facts = facts.reindex(columns=['machine', 'day', 'shift', *_MACHINE_MEASURES]).fillna(0)
+        grouped = facts.groupby(['machine', 'day', 'shift'], sort=True)[list(_MACHINE_MEASURES)].sum()
+        del facts
+        machine_cells = {
+            (int(m), int(d), int(s)): {k: int(v) for k, v in zip(_MACHINE_MEASURES, row)}
+            for (m, d, s), row in zip(grouped.index, grouped.itertuples(index=False))
+        }
+
+    # --- Qualite : pieces terminees de la ligne ---
+    positions = services._load_frame(services._in_window(db.session.query(
+        OrderPosition.End, OrderPosition.Error,
+    ).filter(
+        OrderPosition.End.isnot(None)
+    ), OrderPosition.End), {'End': 'epoch', 'Error': 'bool'})
+    line_cells = {}
+    if not positions.empty:
+        days, shifts = _slice_keys(positions['End'].to_numpy())
+        grouped = pd.DataFrame({
+            'day': days, 'shift': shifts,
+            'pieces': 1, 'errors': positions['Error'].to_numpy().astype('int32'),
+        }).groupby(['day', 'shift'], sort=True)[list(_LINE_MEASURES)].sum()
+        line_cells = {
+            (int(d), int(s)): {k: int(v) for k, v in zip(_LINE_MEASURES, row)}
+            for (d, s), row in zip(grouped.index, grouped.itertuples(index=False))
+        }
+
+    return {'machine_cells': machine_cells, 'line_cells': line_cells}
+
+
+# ============================================================================
+# Tranches et agregations
+# ============================================================================
+
+def _ratios(measures: dict) -> dict:
+    """Calcule OEE et composantes (%) a partir des mesures additives."""
+    total = measures['total_sec']
+    actual = measures['actual_sec']
+    pieces = measures['pieces']
+    availability = (measures['busy_sec'] / total * 100) if total > 0 else 0
+    if measures['nominal_sec'] or actual:
+        performance = min((measures['nominal_sec'] / actual * 100) if actual > 0 else 0, 100.0)
+    else:
+        performance = DEFAULT_PERFORMANCE
+    quality = ((pieces - measures['errors']) / pieces * 100) if pieces > 0 else 0
+    oee = (availability / 100) * (performance / 100) * (quality / 100) * 100
+    return {
+        'oee': round(oee, 1),
+        'availability': round(availability, 1),
+        'performance': round(performance, 1),
+        'quality': round(quality, 1),
+    }
+
+
+def rollup(cube: dict, by: tuple[str, ...] = CUBE_DIMENSIONS,
+           machine: Optional[int] = None, day: Optional[date] = None,
+           shift: Optional[str] = None) -> list[dict]:
+    """Agrege le cube selon les dimensions ``by`` apres filtrage.
+
+    ``by=()`` donne une seule cellule (tout le cube) ; ``by=('machine',)``
+    une cellule par machine, etc.
+
+    Args:
+        cube: Resultat de ``build_cube()``.
+        by: Dimensions conservees (sous-ensemble de ``CUBE_DIMENSIONS``).
+        machine: Filtre ResourceID (optionnel).
+        day: Filtre jour de production (optionnel).
+        shift: Filtre nom d'equipe de ``SHIFTS`` (optionnel).
+
+    Returns:
+        Liste de cellules triees : dimensions de ``by``, mesures et ratios.
+
+    Raises:
+        ValueError: dimension ou equipe inconnue.
+    """
+    unknown = set(by) - set(CUBE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Dimension inconnue : {', '.join(sorted(unknown))}")
+    names = [name for name, _, _ in SHIFTS]
+    if shift is not None and shift not in names:
+        raise ValueError(f"Equipe inconnue : {shift}")
+    day_num = (day - date(1970, 1, 1)).days if day is not None else None
+    shift_num = names.index(shift) if shift is not None else None
+
+    def keep(m, d, s):
+        return ((machine is None or m == machine)
+                and (day_num is None or d == day_num)
+                and (shift_num is None or s == shift_num))
+
+    def group_key(m, d, s):
+        values = {'machine': m, 'day': d, 'shift': s}
+        return tuple(values[dim] for dim in by)
+
+    groups: dict[tuple, dict] = {}
+    for (m, d, s), measures in cube['machine_cells'].items():
+        if keep(m, d, s):
+            acc = groups.setdefault(group_key(m, d, s), dict.fromkeys(_MACHINE_MEASURES, 0))
+            for name in _MACHINE_MEASURES:
+                acc[name] += measures[name]
+
+    # Qualite de ligne sur les memes jours / equipes que chaque groupe
+    line_by = tuple(dim for dim in by if dim != 'machine')
+    line_groups: dict[tuple, dict] = {}
+    for (d, s), measures in cube['line_cells'].items():
+        if (day_num is None or d == day_num) and (shift_num is None or s == shift_num):
+            values = {'day': d, 'shift': s}
+            acc = line_groups.setdefault(tuple(values[dim] for dim in line_by),
+                                         dict.fromkeys(_LINE_MEASURES, 0))
+            for name in _LINE_MEASURES:
+                acc[name] += measures[name]
+    # Sans dimension machine, les tranches avec pieces mais sans donnees
+    # machine apparaissent aussi
+    keys = set(groups) if 'machine' in by else set(groups) | set(line_groups)
+
+    cells = []
+    for key in sorted(keys):
+        dims = dict(zip(by, key))
+        line_key = tuple(dims[dim] for dim in line_by)
+        measures = {
+            **groups.get(key, dict.fromkeys(_MACHINE_MEASURES, 0)),
+            **line_groups.get(line_key, dict.fromkeys(_LINE_MEASURES, 0)),
+        }
+        cell = {}
+        for dim, value in dims.items():
+            if dim == 'day':
+                value = (date(1970, 1, 1) + timedelta(days=value)).isoformat()
+            elif dim == 'shift':
+                value = names[value]
+            cell[dim] = value
+        cell.update(measures)
+        cell.update(_ratios(measures))
+        cells.append(cell)
+    return cells
+
+
+# ============================================================================
+# Route
+# ============================================================================
+
+@bp.route('/api/oee/cube')
+@login_required
+def cube_api():
+    """Tranche du cube OEE en JSON.
+
+    Parametres : ``by`` (dimensions separees par des virgules, defaut
+    ``machine,day,shift`` ; vide = total), filtres ``machine``, ``day``
+    (``AAAA-MM-JJ``), ``shift``, et fenetre ``start`` / ``end`` (ISO 8601)
+    appliquee a la construction du cube.
+    """
+    try:
+        by_param = request.args.get('by', ','.join(CUBE_DIMENSIONS))
+        by = tuple(dim for dim in by_param.split(',') if dim)
+        machine = request.args.get('machine', type=int)
+        day_param = request.args.get('day', '')
+        day = date.fromisoformat(day_param) if day_param else None
+        start = request.args.get('start', '')
+        end = request.args.get('end', '')
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+        if day is not None and start is None and end is None:
+            # Lecture limitee au jour demande, avec une marge pour l'equipe de
+            # nuit et la duree du dernier evenement de la journee
+            start = datetime.combine(day, datetime.min.time())
+            end = start + timedelta(days=2)
+        with services.time_window(start, end):
+            cube = build_cube()
+        cells = rollup(cube, by=by, machine=machine, day=day,
+                       shift=request.args.get('shift') or None)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'dimensions': list(by), 'cells': cells})
@@ -0,0 +1,242 @@
+"""
+Index des etapes et des pieces finies, tries par date de fin.
+
+``calculate_energy_summary`` et ``calculate_throughput`` relisaient toutes
+les etapes / pieces finies a chaque appel et regroupaient les heures dans
+des dictionnaires Python. L'index garde, par application
+(``app.extensions``) :
+
+- ``tblfinstep`` : les dates de fin triees de chaque serie
+  ``(ResourceID, OpNo)`` ;
+- ``tblfinorderpos`` : les dates de fin triees des pieces finies.
+
+Dans un tableau trie, le nombre d'elements avant ``t`` est sa position
+(recherche dichotomique) : c'est le compte cumule. L'energie et l'air
+theoriques d'une etape etant constants dans une serie (valeurs de
+``tblresourceoperation``, cache ``reference``), les cumuls d'energie et
+d'air d'une serie valent ce compte multiplie par la valeur nominale ; par
+``ResourceID``, ils somment les series de la machine. Comptes, energie et
+air sur ``[t0, t1[`` coutent donc O(log n) par serie et par seau, quelle
+que soit la largeur des seaux.
+
+L'index est complete a chaque acces par les seules lignes posterieures a
+la derniere date de fin lue (``services._iter_since``) ; les tableaux
+croissent par doublement de capacite (``services._extend_array``), sans
+recopier l'historique a chaque ajout. Les suppressions et les lignes
+finies avant cette date ne sont pas vues : ``reset()`` force une
+reconstruction.
+
+Memoire : 8 octets par etape et par piece finies (jusqu'au double avec la
+reserve de croissance), pour tout l'historique, au lieu de la relecture
+complete des tables a chaque appel.
+
+    GET /api/production/buckets?start=...&end=...&width=3600
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from flask import Blueprint, current_app, jsonify, request
+
+from . import db, reference, services
+from .auth import login_required
+from .models import OrderPosition, Step
+
+if TYPE_CHECKING:
+    import numpy as np
+
+bp = Blueprint('production_index', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+# Largeur des seaux par defaut (s) et nombre maximal de seaux par requete
+DEFAULT_BUCKET_SEC: int = 3_600
+MAX_BUCKETS: int = 5_000
+
+_lock = threading.Lock()
+
+
+# ============================================================================
+# Construction incrementale
+# ============================================================================
+
+def _index() -> dict:
+    """Index de l'application courante (cree vide au premier acces)."""
+    return current_app.extensions.setdefault('production_index', {
+        'steps_mark': {'ts': None, 'keys': set()},
+        'positions_mark': {'ts': None, 'keys': set()},
+        'steps': {},            # (ResourceID, OpNo) -> dates de fin triees
+        'positions': {},        # 'End' -> dates de fin triees des pieces finies
+        'buffers': {'steps': {}, 'positions': {}},  # tampons a croissance amortie
+    })
+
+
+def steps() -> dict[tuple[int, int], 'np.ndarray']:
+    """Dates de fin triees (epoch s) des etapes finies, par ``(ResourceID, OpNo)``.
+
+    Une requete par appel (vide si aucune etape n'a ete terminee).
+    """
+    import numpy as np
+
+    query = db.session.query(
+        Step.ONo, Step.OPos, Step.StepNo, Step.ResourceID, Step.OpNo, Step.End,
+    ).filter(Step.End.isnot(None)).order_by(Step.End)
+    columns = {'ONo': 'int64', 'OPos': 'int64', 'StepNo': 'int64',
+               'ResourceID': 'int16', 'OpNo': 'int16', 'End': 'epoch'}
+
+    with _lock:
+        index = _index()
+        for chunk in services._iter_since(index['steps_mark'], query, Step.End, 'End',
+                                          ('ONo', 'OPos', 'StepNo'), columns):
+            # Tri stable par serie : les dates de fin restent triees dans chaque serie
+            keys = chunk['ResourceID'].astype(np.int64) * 65_536 + chunk['OpNo'].astype(np.int64)
+            order = np.argsort(keys, kind='stable')
+            keys, ends = keys[order], chunk['End'][order]
+            bounds = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1], [True])))
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                series = (int(keys[lo] // 65_536), int(keys[lo] % 65_536))
+                services._extend_array(index['steps'], index['buffers']['steps'], series, ends[lo:hi])
+        return index['steps']
+
+
+def positions() -> 'np.ndarray':
+    """Dates de fin triees (epoch s) des pieces finies (``tblfinorderpos``).
+
+    Une requete par appel (vide si aucune piece n'a ete terminee).
+    """
+    import numpy as np
+
+    query = db.session.query(
+        OrderPosition.ONo, OrderPosition.OPos, OrderPosition.End,
+    ).filter(OrderPosition.End.isnot(None)).order_by(OrderPosition.End)
+    columns = {'ONo': 'int64', 'OPos': 'int64', 'End': 'epoch'}
+
+    with _lock:
+        index = _index()
+        for chunk in services._iter_since(index['positions_mark'], query, OrderPosition.End, 'End',
+                                          ('ONo', 'OPos'), columns):
+            services._extend_array(index['positions'], index['buffers']['positions'], 'End', chunk['End'])
+        return index['positions'].get('End', np.empty(0, dtype=np.int64))
+
+
+def reset() -> None:
+    """Supprime l'index de l'application courante (reconstruit au prochain acces)."""
+    with _lock:
+        current_app.extensions.pop('production_index', None)
+
+
+# ============================================================================
+# Requetes
+# ============================================================================
+
+def count(ends: 'np.ndarray', edges) -> 'np.ndarray':
+    """Nombre d'elements de ``ends`` (trie) par seau ``[edges[k], edges[k+1][``."""
+    import numpy as np
+
+    return np.diff(np.searchsorted(ends, np.asarray(edges, dtype=np.int64), side='left'))
+
+
+def window_bounds(start: Optional[datetime] = None, end: Optional[datetime] = None) -> tuple[int, int]:
+    """Fenetre ``[start, end[`` en secondes epoch (bornes absentes : non bornee).
+
+    Une borne avec fuseau est ramenee a l'heure locale naive (``services._local_naive``).
+    """
+    t0 = -2**62 if start is None else (services._local_naive(start) - services._EPOCH) // services._ONE_SECOND
+    t1 = 2**62 if end is None else (services._local_naive(end) - services._EPOCH) // services._ONE_SECOND
+    return t0, t1
+
+
+def energy_by_resource(edges) -> dict[int, dict[str, 'np.ndarray']]:
+    """Etapes finies, energie (mWs) et air (mNl) theoriques par machine et par seau.
+
+    Args:
+        edges: Bornes croissantes des seaux (epoch s).
+
+    Returns:
+        ``{ResourceID: {'steps', 'energy_mws', 'air_mnl'}}`` (tableaux d'un
+        element par seau).
+    """
+    import numpy as np
+
+    operations = reference.operations()
+    out: dict[int, dict[str, 'np.ndarray']] = {}
+    for (resource_id, op_no), ends in steps().items():
+        spec = operations.get((resource_id, op_no))
+        counts = count(ends, edges)
+        acc = out.setdefault(resource_id, {
+            name: np.zeros(len(counts), dtype=np.int64) for name in ('steps', 'energy_mws', 'air_mnl')
+        })
+        acc['steps'] += counts
+        if spec is not None:
+            acc['energy_mws'] += counts * spec.electric_energy
+            acc['air_mnl'] += counts * spec.compressed_air
+    return out
+
+
+def buckets(start: datetime, end: datetime, width_sec: int = DEFAULT_BUCKET_SEC) -> dict:
+    """Pieces finies, etapes, energie et air par seaux de ``width_sec`` sur ``[start, end[``.
+
+    Raises:
+        ValueError: Fenetre vide, largeur invalide ou trop de seaux.
+    """
+    import numpy as np
+
+    t0, t1 = window_bounds(start, end)
+    if t1 <= t0:
+        raise ValueError("end doit etre posterieur a start")
+    if width_sec <= 0:
+        raise ValueError("width doit etre positive")
+    if -(-(t1 - t0) // width_sec) > MAX_BUCKETS:
+        raise ValueError(f"Plus de {MAX_BUCKETS} seaux : augmenter width")
+
+    edges = np.append(np.arange(t0, t1, width_sec, dtype=np.int64), t1)
+    pieces = count(positions(), edges)
+    totals = {name: np.zeros(len(edges) - 1, dtype=np.int64) for name in ('steps', 'energy_mws', 'air_mnl')}
+    for acc in energy_by_resource(edges).values():
+        for name, values in acc.items():
+            totals[name] += values
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'width_sec': width_sec,
+        'buckets': [
+            {
+                'start': services._from_epoch(lo).isoformat(),
+                'pieces': n,
+                'steps': s,
+                'wh': round(mws / services.MWS_PER_KWH * 1000, 6),
+                'air_l': round(mnl / services.MNL_PER_LITER, 3),
+            }
+            for lo, n, s, mws, mnl in zip(edges[:-1].tolist(), pieces.tolist(), totals['steps'].tolist(),
+                                          totals['energy_mws'].tolist(), totals['air_mnl'].tolist())
+        ],
+    }
+
+
+# ============================================================================
+# Route
+# ============================================================================
+
+@bp.route('/api/production/buckets')
+@login_required
+def api_production_buckets():
+    """Pieces, etapes et energie theorique par seaux sur une fenetre.
+
+    Parametres : ``start`` / ``end`` (ISO 8601, obligatoires) et ``width``
+    (secondes, defaut ``DEFAULT_BUCKET_SEC``).
+    """
+    try:
+        start = services.parse_datetime(request.args.get('start', ''))
+        end = services.parse_datetime(request.args.get('end', ''))
+        if start is None or end is None:
+            raise ValueError("start et end sont obligatoires")
+        width = request.args.get('width', DEFAULT_BUCKET_SEC, type=int)
+        return jsonify(buckets(start, end, width))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
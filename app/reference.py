@@ -0,0 +1,188 @@
+"""
+Cache des tables de reference (machines, operations, buffers).
+
+``tblresource`` (12 lignes), ``tblresourceoperation`` (142) et
+``tblbuffer`` (10) ne changent presque jamais, mais etaient relues a chaque KPI : noms des machines plusieurs fois par page, une
+requete ``tblresourceoperation`` par etape pour l'energie, dimensions des
+buffers deux fois par ``/stock``. Elles sont chargees une fois par
+application (``app.extensions['reference']``) et servies depuis des
+dictionnaires :
+
++-------------------------+----------------------------------------------+
+| Fonction                | Contenu                                      |
++-------------------------+----------------------------------------------+
+| ``resource_names()``    | ``{ResourceID: ResourceName}``               |
+| ``operations()``        | ``{(ResourceID, OpNo): OperationSpec}``      |
+| ``buffers()``           | ``[BufferSpec]`` (capacite precalculee)      |
++-------------------------+----------------------------------------------+
+
+Au plus toutes les ``REFERENCE_CHECK_INTERVAL_SEC`` secondes, une seule
+requete calcule l'empreinte des trois tables (nombre de lignes et somme
+des CRC32 du contenu de chaque ligne) ; le cache n'est recharge que si elle
+a change. Un renommage a longueur egale (``CP-AM-CAM`` -> ``CP-AM-CAN``)
+change l'empreinte. ``CRC32`` est natif sur MariaDB / MySQL ; sur SQLite,
+``init_app`` le declare sur chaque connexion. Le prechauffage (``health``)
+charge le cache au demarrage.
+"""
+
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import NamedTuple
+
+from flask import current_app
+
+from . import db
+from .models import Buffer, Resource, ResourceOperation
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+# Intervalle minimal entre deux verifications d'empreinte (0 = a chaque appel)
+REFERENCE_CHECK_INTERVAL_SEC = float(os.getenv('REFERENCE_CHECK_INTERVAL_SEC', '60'))
+
+_lock = threading.Lock()
+_sqlite_crc32_installed = False
+
+
+class OperationSpec(NamedTuple):
+    """Valeurs nominales d'une operation sur une machine."""
+    working_time: int       # secondes
+    electric_energy: int    # mWs
+    compressed_air: int     # mNl
+
+
+class BufferSpec(NamedTuple):
+    """Dimensions d'un buffer."""
+    resource_id: int
+    buf_no: int
+    name: str
+    capacity: int           # Rows x Columns x max(Sides, 1)
+
+
+# ============================================================================
+# Chargement
+# ============================================================================
+
+def _sqlite_crc32(dbapi_connection, connection_record) -> None:  # noqa: ARG001
+    """Declare ``crc32(texte)`` sur une connexion SQLite (natif sur MariaDB)."""
+    import sqlite3
+
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            'crc32', 1, lambda value: None if value is None else zlib.crc32(str(value).encode('utf-8')),
+            deterministic=True,
+        )
+
+
+def init_app(app) -> None:  # noqa: ARG001
+    """Installe ``crc32`` sur les connexions SQLite (une seule fois par processus)."""
+    global _sqlite_crc32_installed
+    if _sqlite_crc32_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, 'connect', _sqlite_crc32)
+    _sqlite_crc32_installed = True
+
+
+def _fingerprint() -> tuple:
+    """Empreinte des tables de reference, en une requete.
+
+    Par table : nombre de lignes et somme des CRC32 de chaque ligne (toutes
+    les colonnes lues par ``_load``, separees par ``|``).
+    """
+    def summary(model, columns: tuple) -> tuple:
+        row = None
+        for column in columns:
+            text = db.func.coalesce(db.cast(column, db.String), '')
+            row = text if row is None else row + '|' + text
+        parts = (db.func.count(), db.func.coalesce(db.func.sum(db.func.crc32(row)), 0))
+        return tuple(db.select(part).select_from(model).scalar_subquery() for part in parts)
+
+    row = db.session.query(
+        *summary(Resource, (Resource.ResourceID, Resource.ResourceName)),
+        *summary(ResourceOperation, (
+            ResourceOperation.ResourceID,
+            ResourceOperation.OpNo,
+            ResourceOperation.WorkingTime,
+            ResourceOperation.ElectricEnergy,
+            ResourceOperation.CompressedAir,
+        )),
+        *summary(Buffer, (Buffer.ResourceId, Buffer.BufNo, Buffer.Rows, Buffer.Columns, Buffer.Sides,
+                          Buffer.Description)),
+    ).one()
+    return tuple(int(value) for value in row)
+
+
+def _load() -> dict:
+    """Lit les trois tables de reference."""
+    return {
+        'resource_names': {r.ResourceID: r.ResourceName for r in Resource.query.all()},
+        'operations': {
+            (op.ResourceID, op.OpNo): OperationSpec(
+                op.WorkingTime or 0, op.ElectricEnergy or 0, op.CompressedAir or 0,
+            )
+            for op in ResourceOperation.query.all()
+        },
+        'buffers': [
+            BufferSpec(b.ResourceId, b.BufNo, b.Description or f'Buffer {b.ResourceId}-{b.BufNo}',
+                       (b.Rows or 0) * (b.Columns or 0) * max(b.Sides or 0, 1))
+            for b in Buffer.query.all()
+        ],
+    }
+
+
+def refresh(force: bool = False) -> dict:
+    """Recharge le cache si l'empreinte des tables a change.
+
+    L'empreinte n'est verifiee qu'une fois par
+    ``REFERENCE_CHECK_INTERVAL_SEC`` (sauf ``force``). Doit etre appele dans
+    un contexte d'application.
+
+    Returns:
+        Le cache de l'application courante.
+    """
+    cache = current_app.extensions.setdefault('reference', {'fingerprint': None, 'checked_at': None})
+    now = time.monotonic()
+    if not force and cache['checked_at'] is not None \
+            and now - cache['checked_at'] < REFERENCE_CHECK_INTERVAL_SEC:
+        return cache
+    with _lock:
+        fingerprint = _fingerprint()
+        if force or fingerprint != cache['fingerprint']:
+            cache.update(_load(), fingerprint=fingerprint)
+            logger.info("Tables de reference chargees (%d operations).", len(cache['operations']))
+        cache['checked_at'] = now
+    return cache
+
+
+def invalidate() -> None:
+    """Force une verification d'empreinte au prochain acces."""
+    cache = current_app.extensions.get('reference')
+    if cache is not None:
+        cache['checked_at'] = None
+
+
+# ============================================================================
+# Acces
+# ============================================================================
+
+def resource_names() -> dict[int, str]:
+    """``{ResourceID: ResourceName}`` de toutes les machines."""
+    return refresh()['resource_names']
+
+
+def operations() -> dict[tuple[int, int], OperationSpec]:
+    """``{(ResourceID, OpNo): OperationSpec}`` de ``tblresourceoperation``."""
+    return refresh()['operations']
+
+
+def buffers() -> list[BufferSpec]:
+    """Buffers de ``tblbuffer`` avec leur capacite."""
+    return refresh()['buffers']
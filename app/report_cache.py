@@ -0,0 +1,185 @@
+"""
+Cache disque des rapports generes (Excel, PDF, HTML).
+
+La generation d'un rapport (``_build_pdf_html`` + weasyprint, ou le
+classeur openpyxl) est l'operation la plus couteuse de l'application.
+Plusieurs responsables exportant la meme periode inchangee obtiennent
+pourtant des fichiers identiques.
+
+Les rapports sont donc adresses par leur contenu : la cle est un hash
+SHA-256 de l'instantane des KPIs, du filtre temporel et du format. Tant
+que les chiffres ne changent pas, la cle est la meme et le fichier est
+servi depuis le disque ; des que les donnees evoluent, la cle change et
+le rapport est regenere.
+
+Le cache est borne en taille (``REPORT_CACHE_MAX_BYTES``) : au-dela, les
+fichiers les moins recemment utilises sont supprimes (LRU sur la date de
+modification, rafraichie a chaque lecture).
+
+Les rapports sont remis ouverts (``open_report``, ``put``) : le fichier est
+ouvert sous le verrou de l'eviction. Sous Linux, un fichier ouvert reste
+lisible meme si l'eviction le supprime ensuite. Sous Windows (executable
+livre), un fichier ouvert ne peut ni etre remplace ni supprime : ``put``
+sert alors le rapport deja en cache (meme cle, meme contenu) et l'eviction
+saute les rapports en cours d'envoi, qui seront evinces a un passage
+suivant. Un envoi ou une copie en cours n'echoue donc jamais.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+REPORT_CACHE_DIR = os.getenv(
+    'REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'telefan_report_cache'),
+)
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Extensions possibles d'un rapport en cache (le PDF peut retomber en HTML)
+REPORT_EXTENSIONS: tuple[str, ...] = ('xlsx', 'pdf', 'html')
+
+# A incrementer quand la mise en page des rapports change (invalide le cache)
+REPORT_LAYOUT_VERSION: int = 1
+
+_lock = threading.Lock()
+
+
+def cache_key(kpis: dict, label: str, fmt: str) -> str:
+    """Calcule la cle d'un rapport a partir de son contenu.
+
+    Args:
+        kpis: Instantane des KPIs (retour de ``export._collect_kpis``).
+        label: Label descriptif des filtres temporels.
+        fmt: Format demande (``'excel'`` ou ``'pdf'``).
+
+    Returns:
+        Empreinte SHA-256 hexadecimale.
+    """
+    payload = json.dumps(
+        {'v': REPORT_LAYOUT_VERSION, 'fmt': fmt, 'label': label, 'kpis': kpis},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _path(key: str, extension: str) -> str:
+    """Chemin du rapport ``key`` au format ``extension``."""
+    return os.path.join(REPORT_CACHE_DIR, f'{key}.{extension}')
+
+
+def open_report(key: str) -> Optional[tuple[BinaryIO, str]]:
+    """Ouvre le rapport en cache pour ``key``.
+
+    Le fichier est ouvert sous le verrou de l'eviction : une fois ouvert, il
+    reste lisible meme s'il est supprime du cache.
+
+    Returns:
+        Tuple ``(fichier binaire ouvert, extension)``, ou ``None`` si absent.
+    """
+    with _lock:
+        for extension in REPORT_EXTENSIONS:
+            path = _path(key, extension)
+            try:
+                fh = open(path, 'rb')
+            except OSError:
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return fh, extension
+    return None
+
+
+def put(key: str, extension: str, write: Callable) -> BinaryIO:
+    """Ecrit un rapport dans le cache puis applique la limite de taille.
+
+    L'ecriture passe par un fichier temporaire renomme atomiquement :
+    un lecteur concurrent ne voit jamais de fichier partiel. Si le rapport
+    existant ne peut pas etre remplace (ouvert par un autre envoi sous
+    Windows), il est servi tel quel : la cle garantit le meme contenu.
+
+    Args:
+        key: Cle du rapport (voir ``cache_key``).
+        extension: Extension du fichier (``'xlsx'``, ``'pdf'``, ``'html'``).
+        write: Fonction ``write(fh)`` ecrivant le contenu dans un fichier binaire.
+
+    Returns:
+        Le rapport ecrit, ouvert en lecture (a fermer par l'appelant).
+    """
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = _path(key, extension)
+
+    fd, tmp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        with _lock:
+            try:
+                os.replace(tmp_path, path)
+            except PermissionError:
+                # Windows : le meme rapport est deja en cache et en cours de lecture
+                _remove_file(tmp_path)
+            result = open(path, 'rb')
+    except BaseException:
+        _remove_file(tmp_path)
+        raise
+
+    _evict(keep=path)
+    return result
+
+
+def _evict(keep: str) -> None:
+    """Supprime les rapports les plus anciens au-dela de ``REPORT_CACHE_MAX_BYTES``.
+
+    Args:
+        keep: Chemin a ne jamais supprimer (rapport qui vient d'etre ecrit).
+    """
+    with _lock:
+        entries = []
+        for name in os.listdir(REPORT_CACHE_DIR):
+            path = os.path.join(REPORT_CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Les .tmp abandonnes depuis plus d'une heure sont aussi nettoyes
+            if name.endswith('.tmp'):
+                if time.time() - stat.st_mtime > 3600:
+                    _remove_file(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= REPORT_CACHE_MAX_BYTES:
+                break
+            if path == keep or not _remove_file(path):
+                # Rapport en cours d'envoi (Windows) : evince a un passage suivant
+                continue
+            total -= size
+            logger.info("Cache rapports : eviction de %s", os.path.basename(path))
+
+
+def _remove_file(path: str) -> bool:
+    """Supprime un fichier en ignorant son absence.
+
+    Returns:
+        ``False`` si le fichier existe encore (ouvert sous Windows, droits).
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,904 @@
+"""
+Telemetrie Robotino (AGV) : ingestion en flux et stockage columnaire.
+
+Le Robotino exporte sa telemetrie en CSV (``ressources/robotino_data.csv``) :
+un echantillon toutes les ~0,4 s, ~115 colonnes (chargeur, batterie,
+odometrie, capteurs de distance, E/S numeriques). Ce module :
+
+- lit ces CSV en flux (``ingest_csv``), ligne a ligne, et ne retient que
+  les echantillons posterieurs au dernier timestamp deja stocke : un fichier
+  complete puis re-ingere n'ajoute que ses nouvelles lignes ;
+- les range dans un stockage columnaire type (``ROBOTINO_STORE_DIR``) :
+  un segment ``.npz`` par lot de ``ROBOTINO_SEGMENT_ROWS`` lignes et un
+  ``manifest.json`` (schema, segments, dernier timestamp) ;
+- sert des series temporelles bornees et sous-echantillonnees sur
+  ``/api/robotino`` sans relire le CSV ;
+- encode en delta (changements seuls) les colonnes qui varient peu et
+  restitue l'etat de toutes les colonnes a un instant t en O(log n)
+  (``state_at``, ``/api/robotino/state``) ;
+- integre la puissance mesuree (``power_voltage`` x ``power_output_current``)
+  en energie cumulee : l'energie de n'importe quelle fenetre se lit en
+  O(log n) (``energy_between``, ``/api/robotino/energy``, page ``/energie``) ;
+- reconstruit la trajectoire de l'AGV (distance parcourue, zones d'arret,
+  trace simplifiee par Douglas-Peucker) sur ``/api/robotino/trajectory``.
+
+Types de colonnes
+=================
+
++---------+------------------------------+-----------------------------------------+
+| Type    | Stockage                     | Exemples                                |
++---------+------------------------------+-----------------------------------------+
+| time    | int64 (microsecondes epoch)  | timestamp                               |
+| bool    | bits empaquetes (packbits)   | digitalinputarray_*, accuConnected_*    |
+| int     | int32 (absent = INT_MISSING) | odometry_seq, festool_charger_time_*    |
+| float   | float32 (absent = NaN)       | odometry_x, power_voltage, distance...  |
+| text    | octets UTF-8, toujours delta | controller_software, power_batteryType  |
++---------+------------------------------+-----------------------------------------+
+
+Les messages du chargeur (journal libre) ne sont pas stockes.
+Un booleen absent est stocke a ``False``.
+
+Encodage delta
+==============
+
+La plupart des colonnes (versions, drapeaux du chargeur, relais) restent
+constantes pendant de longues periodes. Dans chaque segment, une colonne
+qui change au plus une fois toutes les ``1 / ROBOTINO_DELTA_MAX_RATIO``
+lignes est stockee en delta : timestamps des changements (le premier
+echantillon compris) et valeurs. Les colonnes delta d'un segment partagent
+quatre tableaux (noms, offsets, timestamps, valeurs), au format CSR. Les
+autres restent denses. ``ROBOTINO_ENCODING=dense`` desactive l'encodage delta
+(sauf pour le texte). Le decodage est transparent pour les lectures.
+
+Ingestion en ligne de commande : ``python scripts/ingest_robotino.py``.
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from flask import Blueprint, jsonify, request
+
+from .auth import login_required
+from .services import _local_naive, _safe_kpi, parse_datetime
+
+bp = Blueprint('robotino', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+ROBOTINO_STORE_DIR = os.getenv('ROBOTINO_STORE_DIR', os.path.join(os.getcwd(), 'data', 'robotino'))
+ROBOTINO_SEGMENT_ROWS = int(os.getenv('ROBOTINO_SEGMENT_ROWS', '10000'))
+# 'auto' = delta pour les colonnes qui changent peu, 'dense' = jamais
+ROBOTINO_ENCODING = os.getenv('ROBOTINO_ENCODING', 'auto')
+ROBOTINO_DELTA_MAX_RATIO = float(os.getenv('ROBOTINO_DELTA_MAX_RATIO', '0.125'))
+
+# Points renvoyes par defaut / au maximum par /api/robotino
+DEFAULT_POINTS: int = 500
+MAX_POINTS: int = 5_000
+DEFAULT_SERIES: tuple[str, ...] = ('odometry_x', 'odometry_y', 'power_voltage')
+
+# Energie mesuree : tension (V) x courant (A). Deux echantillons separes de
+# plus de ENERGY_MAX_GAP_SEC (robot eteint, trou d'enregistrement) ne sont
+# pas integres.
+ENERGY_COLUMNS: tuple[str, str] = ('power_voltage', 'power_output_current')
+ENERGY_MAX_GAP_SEC = float(os.getenv('ROBOTINO_ENERGY_MAX_GAP_SEC', '5'))
+ENERGY_TIMELINE_POINTS: int = 24
+
+# Trajectoire : positions odometriques (m). Un arret est une suite
+# d'echantillons a moins de DWELL_SPEED_MPS durant au moins DWELL_MIN_SEC.
+TRAJECTORY_COLUMNS: tuple[str, str] = ('odometry_x', 'odometry_y')
+DWELL_SPEED_MPS: float = 0.02
+DWELL_MIN_SEC: float = 10.0
+TRAJECTORY_CACHE_SIZE: int = 16
+# Precision de l'odometrie : les ecarts plus faibles ne sont pas subdivises
+DP_MIN_TOLERANCE_M: float = 0.001
+
+TIME_COLUMN = 'timestamp'
+INT_MISSING: int = -(2 ** 31)
+
+# Classement des colonnes par motif de nom (le premier motif trouve gagne)
+SKIP_PATTERNS: tuple[str, ...] = ('message',)
+TEXT_PATTERNS: tuple[str, ...] = ('version', 'batteryType', 'hardware', 'software')
+BOOL_PATTERNS: tuple[str, ...] = (
+    'accuConnected', 'accuLoading', 'batteryLow_', 'chargerConnected', 'externalPower',
+    'power_batteryLow', 'ext_power', 'digitalinputarray', 'digitaloutputstatus', 'relaystatus',
+)
+INT_PATTERNS: tuple[str, ...] = (
+    '_seq', '_time', 'capacities', 'Number', '_number', 'Counter', 'num_chargers',
+)
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+_MANIFEST = 'manifest.json'
+_DELTA_TIMES = '@t'
+_DELTA_VALUES = '@v'
+# Groupes de colonnes delta : valeurs numeriques en float64 (exact pour
+# bool, int32 et float32), texte en octets
+_DELTA_GROUPS: dict[str, str] = {'num': 'float64', 'text': 'bytes'}
+
+_lock = threading.Lock()
+# Index d'energie cumulee, prolonge a chaque nouveau segment
+_energy_lock = threading.Lock()
+_energy: dict = {'store': None, 'segments': 0, 'times': None, 'cumulative': None, 'last': None}
+
+
+# ============================================================================
+# Schema
+# ============================================================================
+
+def column_kind(name: str) -> Optional[str]:
+    """Type de stockage d'une colonne CSV (``None`` = non stockee)."""
+    if name == TIME_COLUMN:
+        return 'time'
+    for kind, patterns in (('skip', SKIP_PATTERNS), ('text', TEXT_PATTERNS),
+                           ('bool', BOOL_PATTERNS), ('int', INT_PATTERNS)):
+        if any(p in name for p in patterns):
+            return None if kind == 'skip' else kind
+    return 'float'
+
+
+def _to_epoch_us(value: str) -> int:
+    """``2025-04-16T15:10:13.652187`` -> microsecondes depuis 1970 (heure locale)."""
+    return (_local_naive(datetime.fromisoformat(value)) - _EPOCH) // _ONE_MICROSECOND
+
+
+def _from_epoch_us(value: int) -> datetime:
+    """Inverse de ``_to_epoch_us``."""
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def _parse_bool(value: str) -> bool:
+    return value in ('True', 'true', '1', '1.0')
+
+
+def _parse_int(value: str) -> int:
+    try:
+        return int(float(value))
+    except ValueError:
+        return INT_MISSING
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+
+_PARSERS = {'bool': _parse_bool, 'int': _parse_int, 'float': _parse_float, 'text': str}
+
+
+# ============================================================================
+# Stockage
+# ============================================================================
+
+def _store_path(name: str) -> str:
+    return os.path.join(ROBOTINO_STORE_DIR, name)
+
+
+def load_manifest() -> dict:
+    """Manifest du stockage (vide si rien n'a encore ete ingere)."""
+    try:
+        with open(_store_path(_MANIFEST), encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {'columns': {}, 'segments': [], 'last_timestamp': None}
+
+
+def _write_manifest(manifest: dict) -> None:
+    """Ecrit le manifest de facon atomique (fichier temporaire + rename)."""
+    tmp = _store_path(_MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp, _store_path(_MANIFEST))
+
+
+def _change_rows(values: 'np.ndarray') -> 'np.ndarray':
+    """Indices des lignes ou la valeur change (la premiere ligne comprise)."""
+    import numpy as np
+
+    same = values[1:] == values[:-1]
+    if values.dtype.kind == 'f':
+        same |= np.isnan(values[1:]) & np.isnan(values[:-1])
+    return np.concatenate(([0], np.flatnonzero(~same) + 1))
+
+
+def _write_segment(manifest: dict, timestamps: list[int], columns: dict[str, list]) -> None:
+    """Convertit un lot de lignes en tableaux types et l'ecrit en segment ``.npz``."""
+    import numpy as np
+
+    ts = np.asarray(timestamps, dtype=np.int64)
+    arrays = {TIME_COLUMN: ts}
+    deltas: dict[str, list] = {group: [] for group in _DELTA_GROUPS}
+    for name, values in columns.items():
+        kind = manifest['columns'][name]
+        if kind == 'text':
+            typed = np.char.encode(np.asarray(values, dtype=str), 'utf-8')
+        else:
+            typed = np.asarray(values, dtype={'bool': bool, 'int': np.int32, 'float': np.float32}[kind])
+        changes = _change_rows(typed)
+        if kind == 'text' or (ROBOTINO_ENCODING == 'auto'
+                              and len(changes) <= len(typed) * ROBOTINO_DELTA_MAX_RATIO):
+            deltas['text' if kind == 'text' else 'num'].append((name, ts[changes], typed[changes]))
+        elif kind == 'bool':
+            arrays[name] = np.packbits(typed)
+        else:
+            arrays[name] = typed
+
+    # Colonnes delta regroupees (une entree .npy par tableau coute ~200 octets)
+    for group, entries in deltas.items():
+        if not entries:
+            continue
+        arrays[f'@{group}_names'] = np.char.encode(np.array([name for name, _, _ in entries]), 'utf-8')
+        arrays[f'@{group}_offsets'] = np.cumsum([0] + [len(t) for _, t, _ in entries]).astype(np.int64)
+        arrays[f'@{group}_t'] = np.concatenate([t for _, t, _ in entries])
+        arrays[f'@{group}_v'] = np.concatenate([v.astype(_DELTA_GROUPS[group]) for _, _, v in entries])
+
+    index = len(manifest['segments']) + 1
+    filename = f'seg-{index:06d}.npz'
+    tmp = _store_path(filename + '.tmp')
+    with open(tmp, 'wb') as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, _store_path(filename))
+    manifest['segments'].append({
+        'file': filename, 'rows': len(timestamps),
+        'first': timestamps[0], 'last': timestamps[-1],
+    })
+    manifest['last_timestamp'] = timestamps[-1]
+
+
+def ingest_csv(path: str, segment_rows: Optional[int] = None) -> int:
+    """Ingere un CSV Robotino en flux dans le stockage columnaire.
+
+    Seuls les echantillons strictement posterieurs au dernier timestamp
+    stocke sont ajoutes. Les colonnes apparues dans un nouveau fichier sont
+    ajoutees au schema ; celles absentes sont stockees comme manquantes.
+
+    Args:
+        path: Chemin du CSV (en-tete avec une colonne ``timestamp``).
+        segment_rows: Lignes par segment (defaut ``ROBOTINO_SEGMENT_ROWS``).
+
+    Returns:
+        Nombre d'echantillons ajoutes.
+
+    Raises:
+        ValueError: si le CSV n'a pas de colonne ``timestamp``.
+    """
+    segment_rows = segment_rows or ROBOTINO_SEGMENT_ROWS
+    os.makedirs(ROBOTINO_STORE_DIR, exist_ok=True)
+
+    with _lock, open(path, newline='', encoding='utf-8') as fh:
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if not header or TIME_COLUMN not in header:
+            raise ValueError(f"{path} : colonne '{TIME_COLUMN}' absente")
+
+        manifest = load_manifest()
+        for name in header:
+            kind = column_kind(name)
+            if kind not in (None, 'time'):
+                manifest['columns'].setdefault(name, kind)
+        schema = manifest['columns']
+        positions = {name: header.index(name) for name in schema if name in header}
+        time_pos = header.index(TIME_COLUMN)
+        last = manifest['last_timestamp']
+
+        timestamps: list[int] = []
+        columns: dict[str, list] = {name: [] for name in schema}
+        added = 0
+        for row in reader:
+            if len(row) <= time_pos or not row[time_pos]:
+                continue
+            ts = _to_epoch_us(row[time_pos])
+            if last is not None and ts <= last:
+                continue
+            last = ts
+            timestamps.append(ts)
+            for name, kind in schema.items():
+                pos = positions.get(name)
+                value = row[pos] if pos is not None and pos < len(row) else ''
+                columns[name].append(_PARSERS[kind](value))
+            if len(timestamps) >= segment_rows:
+                _write_segment(manifest, timestamps, columns)
+                added += len(timestamps)
+                timestamps = []
+                columns = {name: [] for name in schema}
+        if timestamps:
+            _write_segment(manifest, timestamps, columns)
+            added += len(timestamps)
+        _write_manifest(manifest)
+
+    logger.info("Robotino : %d echantillons ajoutes depuis %s", added, path)
+    return added
+
+
+@lru_cache(maxsize=16)
+def _load_segment(path: str, mtime: float) -> dict:  # noqa: ARG001 - cle de cache
+    """Charge un segment (immuable une fois ecrit) en tableaux numpy."""
+    import numpy as np
+
+    with np.load(path) as data:
+        segment = {name: data[name] for name in data.files}
+    # Colonnes delta : vues par colonne sur les tableaux regroupes
+    for group in _DELTA_GROUPS:
+        if f'@{group}_names' not in segment:
+            continue
+        offsets = segment[f'@{group}_offsets']
+        for i, name in enumerate(np.char.decode(segment[f'@{group}_names'], 'utf-8')):
+            segment[name + _DELTA_TIMES] = segment[f'@{group}_t'][offsets[i]:offsets[i + 1]]
+            segment[name + _DELTA_VALUES] = segment[f'@{group}_v'][offsets[i]:offsets[i + 1]]
+    return segment
+
+
+def _segment_column(segment: dict, name: str, kind: str, rows: int) -> 'np.ndarray':
+    """Colonne d'un segment decodee (manquante si le segment ne l'a pas)."""
+    import numpy as np
+
+    if name + _DELTA_TIMES in segment:
+        changes = segment[name + _DELTA_TIMES]
+        values = segment[name + _DELTA_VALUES][np.searchsorted(changes, segment[TIME_COLUMN], side='right') - 1]
+    elif name in segment:
+        values = segment[name]
+        if kind == 'bool':
+            return np.unpackbits(values, count=rows).astype(bool)
+    elif kind == 'bool':
+        return np.zeros(rows, dtype=bool)
+    elif kind == 'text':
+        return np.full(rows, '')
+    else:
+        return np.full(rows, np.nan, dtype=np.float32)
+
+    if kind == 'text':
+        return np.char.decode(values, 'utf-8')
+    if kind == 'bool':
+        return values.astype(bool)
+    if kind == 'int':
+        return np.where(values == INT_MISSING, np.nan, values).astype(np.float64)
+    return values
+
+
+def iter_segments(start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[tuple[dict, dict]]:
+    """Parcourt les segments qui recoupent ``[start, end[``.
+
+    Yields:
+        Tuples ``(description du segment, tableaux)``.
+    """
+    manifest = load_manifest()
+    start_us = _to_epoch_us(start.isoformat()) if start else None
+    end_us = _to_epoch_us(end.isoformat()) if end else None
+    for seg in manifest['segments']:
+        if (start_us is not None and seg['last'] < start_us) or (end_us is not None and seg['first'] >= end_us):
+            continue
+        path = _store_path(seg['file'])
+        yield seg, _load_segment(path, os.path.getmtime(path))
+
+
+# ============================================================================
+# Requetes
+# ============================================================================
+
+def load_columns(columns: list[str], start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> tuple['np.ndarray', dict[str, 'np.ndarray']]:
+    """Echantillons bruts de ``columns`` sur ``[start, end[``.
+
+    Returns:
+        Tuple ``(timestamps en us, {colonne: valeurs decodees})``.
+
+    Raises:
+        ValueError: colonne inconnue.
+    """
+    import numpy as np
+
+    schema = load_manifest()['columns']
+    unknown = [name for name in columns if name not in schema]
+    if unknown:
+        raise ValueError(f"Colonne(s) inconnue(s) : {', '.join(unknown)}")
+
+    start_us = _to_epoch_us(start.isoformat()) if start else None
+    end_us = _to_epoch_us(end.isoformat()) if end else None
+    times, values = [], {name: [] for name in columns}
+    for seg, data in iter_segments(start, end):
+        ts = data[TIME_COLUMN]
+        mask = np.ones(len(ts), dtype=bool)
+        if start_us is not None:
+            mask &= ts >= start_us
+        if end_us is not None:
+            mask &= ts < end_us
+        times.append(ts[mask])
+        for name in columns:
+            values[name].append(_segment_column(data, name, schema[name], seg['rows'])[mask])
+    if not times:
+        return np.zeros(0, dtype=np.int64), {name: np.zeros(0) for name in columns}
+    return np.concatenate(times), {name: np.concatenate(arrays) for name, arrays in values.items()}
+
+
+def query_series(columns: list[str], start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, points: int = DEFAULT_POINTS) -> dict:
+    """Series ``columns`` sur ``[start, end[``, ramenees a ``points`` au plus.
+
+    Le sous-echantillonnage decoupe la plage en ``points`` intervalles de
+    temps egaux : moyenne des valeurs numeriques, ``True`` si le booleen l'a
+    ete au moins une fois dans l'intervalle. Les intervalles vides sont omis.
+
+    Returns:
+        dict avec cles ``timestamps`` (ISO 8601, debut de chaque intervalle),
+        ``series`` ({colonne: valeurs}) et ``samples`` (echantillons lus).
+
+    Raises:
+        ValueError: colonne inconnue.
+    """
+    import numpy as np
+
+    schema = load_manifest()['columns']
+    text = [name for name in columns if schema.get(name) == 'text']
+    if text:
+        raise ValueError(f"Colonne(s) texte non agregeable(s) : {', '.join(text)}")
+    ts, values = load_columns(columns, start, end)
+    if not len(ts):
+        return {'timestamps': [], 'series': {name: [] for name in columns}, 'samples': 0}
+
+    first, last = int(ts[0]), int(ts[-1])
+    buckets = max(1, min(points, len(ts)))
+    width = max(1, -(-(last - first + 1) // buckets))
+    bucket = (ts - first) // width
+    used, inverse, counts = np.unique(bucket, return_inverse=True, return_counts=True)
+
+    series = {}
+    for name in columns:
+        column = values[name]
+        if schema[name] == 'bool':
+            reduced = np.zeros(len(used), dtype=bool)
+            np.logical_or.at(reduced, inverse, column)
+            series[name] = reduced.tolist()
+        else:
+            column = column.astype(np.float64)
+            valid = ~np.isnan(column)
+            sums = np.bincount(inverse, weights=np.where(valid, column, 0), minlength=len(used))
+            n = np.bincount(inverse, weights=valid, minlength=len(used))
+            series[name] = [None if k == 0 else round(s / k, 6) for s, k in zip(sums.tolist(), n.tolist())]
+
+    return {
+        'timestamps': [_from_epoch_us(first + int(b) * width).isoformat() for b in used],
+        'series': series,
+        'samples': int(counts.sum()),
+    }
+
+
+def _value_at(data: dict, name: str, kind: str, at_us: int):
+    """Valeur de ``name`` au dernier echantillon ``<= at_us`` d'un segment."""
+    import numpy as np
+
+    if name + _DELTA_TIMES in data:
+        i = int(np.searchsorted(data[name + _DELTA_TIMES], at_us, side='right')) - 1
+        value = data[name + _DELTA_VALUES][i]
+    elif name in data:
+        row = int(np.searchsorted(data[TIME_COLUMN], at_us, side='right')) - 1
+        if kind == 'bool':
+            return bool((data[name][row >> 3] >> (7 - (row & 7))) & 1)
+        value = data[name][row]
+    else:
+        return None
+
+    if kind == 'text':
+        return value.decode('utf-8')
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'int':
+        return None if value == INT_MISSING else int(value)
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+def state_at(at: datetime, columns: Optional[list[str]] = None) -> dict:
+    """Etat des colonnes au dernier echantillon anterieur ou egal a ``at``.
+
+    Un seul segment est lu ; dans ce segment, une colonne delta se resout
+    par recherche dichotomique dans ses seuls changements.
+
+    Returns:
+        dict avec cles ``at``, ``sample`` (timestamp de l'echantillon retenu,
+        ``None`` si ``at`` precede les donnees) et ``state`` ({colonne: valeur}).
+
+    Raises:
+        ValueError: colonne inconnue.
+    """
+    from bisect import bisect_right
+
+    import numpy as np
+
+    manifest = load_manifest()
+    schema = manifest['columns']
+    columns = columns or list(schema)
+    unknown = [name for name in columns if name not in schema]
+    if unknown:
+        raise ValueError(f"Colonne(s) inconnue(s) : {', '.join(unknown)}")
+
+    at_us = _to_epoch_us(at.isoformat())
+    segments = manifest['segments']
+    index = bisect_right([seg['first'] for seg in segments], at_us) - 1
+    result = {'at': at.isoformat(), 'sample': None, 'state': {name: None for name in columns}}
+    if index < 0:
+        return result
+
+    seg = segments[index]
+    path = _store_path(seg['file'])
+    data = _load_segment(path, os.path.getmtime(path))
+    ts = data[TIME_COLUMN]
+    result['sample'] = _from_epoch_us(ts[int(np.searchsorted(ts, at_us, side='right')) - 1]).isoformat()
+    result['state'] = {name: _value_at(data, name, schema[name], at_us) for name in columns}
+    return result
+
+
+# ============================================================================
+# Energie mesuree
+# ============================================================================
+
+def _energy_segment(data: dict, rows: int, previous: Optional[tuple[int, float]]):
+    """Trapezes d'un segment : ``(timestamps, energie par pas en Wh, dernier point)``.
+
+    Les echantillons sans tension ou sans courant sont ignores ; ``previous``
+    (dernier point valide du segment precedent) raccorde les segments.
+    """
+    import numpy as np
+
+    voltage = _segment_column(data, ENERGY_COLUMNS[0], 'float', rows).astype(np.float64)
+    current = _segment_column(data, ENERGY_COLUMNS[1], 'float', rows).astype(np.float64)
+    power = voltage * current
+    valid = ~np.isnan(power)
+    if not valid.any():
+        # Segment sans puissance : rien a integrer, le raccord reste le meme
+        return np.zeros(0, dtype=np.int64), np.zeros(0), previous
+    ts, power = data[TIME_COLUMN][valid], power[valid]
+    if previous is not None:
+        ts = np.concatenate(([previous[0]], ts))
+        power = np.concatenate(([previous[1]], power))
+
+    dt = np.diff(ts) / 1e6
+    steps = (power[1:] + power[:-1]) / 2 * dt / 3_600
+    steps[dt > ENERGY_MAX_GAP_SEC] = 0.0
+    if previous is not None:
+        ts = ts[1:]
+    else:
+        steps = np.concatenate(([0.0], steps))
+    return ts, steps, (int(ts[-1]), float(power[-1]))
+
+
+def energy_index() -> tuple['np.ndarray', 'np.ndarray']:
+    """Index ``(timestamps en us, energie cumulee en Wh)`` sur tout le stockage.
+
+    Construit une fois, puis prolonge avec les seuls segments ajoutes depuis
+    (les segments sont immuables) : l'ingestion incrementale ne coute que
+    l'integration des nouveaux echantillons.
+    """
+    import numpy as np
+
+    manifest = load_manifest()
+    segments = manifest['segments']
+    with _energy_lock:
+        if _energy['store'] != ROBOTINO_STORE_DIR or _energy['segments'] > len(segments):
+            _energy.update(store=ROBOTINO_STORE_DIR, segments=0, times=np.zeros(0, dtype=np.int64),
+                           cumulative=np.zeros(0), last=None)
+        if _energy['segments'] < len(segments):
+            times, steps = [_energy['times']], []
+            last = _energy['last']
+            for seg in segments[_energy['segments']:]:
+                path = _store_path(seg['file'])
+                ts, step, last = _energy_segment(_load_segment(path, os.path.getmtime(path)), seg['rows'], last)
+                times.append(ts)
+                steps.append(step)
+            offset = _energy['cumulative'][-1] if len(_energy['cumulative']) else 0.0
+            _energy.update(
+                segments=len(segments), last=last, times=np.concatenate(times),
+                cumulative=np.concatenate([_energy['cumulative'], offset + np.cumsum(np.concatenate(steps))]),
+            )
+        return _energy['times'], _energy['cumulative']
+
+
+def _cumulative_at(times: 'np.ndarray', cumulative: 'np.ndarray', at_us) -> 'np.ndarray':
+    """Energie cumulee a des instants quelconques (interpolation lineaire)."""
+    import numpy as np
+
+    return np.interp(np.asarray(at_us, dtype=np.float64), times, cumulative)
+
+
+def energy_between(start: Optional[datetime] = None, end: Optional[datetime] = None) -> float:
+    """Energie mesuree (Wh) consommee par le Robotino sur ``[start, end[``.
+
+    Deux recherches dichotomiques dans l'index cumule : O(log n).
+    """
+    times, cumulative = energy_index()
+    if len(times) == 0:
+        return 0.0
+    start_us = _to_epoch_us(start.isoformat()) if start else times[0]
+    end_us = _to_epoch_us(end.isoformat()) if end else times[-1]
+    if end_us <= start_us:
+        return 0.0
+    low, high = _cumulative_at(times, cumulative, [start_us, end_us])
+    return float(high - low)
+
+
+_NO_ENERGY = {
+    'value': 0, 'unit': 'Wh', 'avg_power_w': 0, 'duration_h': 0, 'timeline': [],
+    'status': 'unavailable', 'note': "Aucune telemetrie Robotino sur la periode",
+}
+
+
+@_safe_kpi(_NO_ENERGY)
+def calculate_agv_energy(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         points: int = ENERGY_TIMELINE_POINTS) -> dict:
+    """Energie mesuree de l'AGV sur une fenetre, avec une timeline.
+
+    Contrairement a ``services.calculate_energy_summary`` (valeurs
+    theoriques), ce KPI integre la tension et le courant reels du Robotino
+    (methode des trapezes).
+
+    Returns:
+        dict avec cles : value (Wh), unit, avg_power_w, duration_h, timeline
+        (``[{'period', 'wh'}]``), status (``'unavailable'`` sans telemetrie), note.
+    """
+    import numpy as np
+
+    times, cumulative = energy_index()
+    if not len(times):
+        return dict(_NO_ENERGY)
+    first, last = int(times[0]), int(times[-1])
+    start_us = max(_to_epoch_us(start.isoformat()), first) if start else first
+    end_us = min(_to_epoch_us(end.isoformat()), last) if end else last
+    if end_us <= start_us:
+        return dict(_NO_ENERGY)
+
+    bounds = np.linspace(start_us, end_us, max(1, points) + 1)
+    per_bucket = np.diff(_cumulative_at(times, cumulative, bounds))
+    total = float(per_bucket.sum())
+    duration_h = (end_us - start_us) / 3.6e9
+    return {
+        'value': round(total, 2),
+        'unit': 'Wh',
+        'avg_power_w': round(total / duration_h, 2) if duration_h else 0,
+        'duration_h': round(duration_h, 3),
+        'timeline': [
+            {'period': _from_epoch_us(int(b)).strftime('%d/%m %H:%M'), 'wh': round(float(wh), 3)}
+            for b, wh in zip(bounds[:-1], per_bucket)
+        ],
+        'status': 'normal',
+        'note': 'Mesure Robotino (tension x courant)',
+    }
+
+
+# ============================================================================
+# Trajectoire
+# ============================================================================
+
+def _segment_distance(px: 'np.ndarray', py: 'np.ndarray',
+                      x0: float, y0: float, x1: float, y1: float) -> 'np.ndarray':
+    """Distance des points ``(px, py)`` au segment ``[(x0, y0), (x1, y1)]``."""
+    import numpy as np
+
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return np.hypot(px - x0, py - y0)
+    t = np.clip(((px - x0) * dx + (py - y0) * dy) / length2, 0.0, 1.0)
+    return np.hypot(px - (x0 + t * dx), py - (y0 + t * dy))
+
+
+def douglas_peucker_rank(x: 'np.ndarray', y: 'np.ndarray') -> 'np.ndarray':
+    """Tolerance a partir de laquelle chaque point disparait du trace simplifie.
+
+    Une seule passe de Douglas-Peucker (pile explicite, distances
+    vectorisees par sous-segment) donne a chaque point son ecart au segment
+    qui le remplacerait, plafonne par celui de son parent. La simplification
+    a la tolerance ``eps`` est alors exactement ``rank > eps``, et celle a
+    ``k`` points garde les ``k`` rangs les plus eleves : toutes les
+    tolerances se servent depuis un meme calcul. Les extremites valent ``inf``.
+
+    Les sous-segments dont l'ecart maximal ne depasse pas
+    ``DP_MIN_TOLERANCE_M`` ne sont pas subdivises (rang 0) : une tolerance
+    plus fine que la precision de l'odometrie n'a pas de sens, et cela
+    evite une iteration par echantillon sur un trace bruite ou immobile.
+    """
+    import numpy as np
+
+    n = len(x)
+    rank = np.zeros(n)
+    if n == 0:
+        return rank
+    rank[0] = rank[-1] = np.inf
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        lo, hi, parent = stack.pop()
+        if hi - lo < 2:
+            continue
+        dist = _segment_distance(x[lo + 1:hi], y[lo + 1:hi], x[lo], y[lo], x[hi], y[hi])
+        k = int(np.argmax(dist))
+        if dist[k] <= DP_MIN_TOLERANCE_M:
+            continue
+        idx = lo + 1 + k
+        rank[idx] = min(float(dist[k]), parent)
+        stack.append((lo, idx, rank[idx]))
+        stack.append((idx, hi, rank[idx]))
+    return rank
+
+
+def _dwell_zones(ts: 'np.ndarray', x: 'np.ndarray', y: 'np.ndarray', steps: 'np.ndarray') -> list[dict]:
+    """Zones d'arret : suites de pas plus lents que ``DWELL_SPEED_MPS``."""
+    import numpy as np
+
+    dt = np.diff(ts) / 1e6
+    slow = steps <= DWELL_SPEED_MPS * np.maximum(dt, 1e-6)
+    edges = np.diff(np.concatenate(([0], slow.astype(np.int8), [0])))
+    zones = []
+    # Le pas i relie les echantillons i et i + 1
+    for first, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        duration = (ts[stop] - ts[first]) / 1e6
+        if duration < DWELL_MIN_SEC:
+            continue
+        zones.append({
+            'x': round(float(x[first:stop + 1].mean()), 3),
+            'y': round(float(y[first:stop + 1].mean()), 3),
+            'start': _from_epoch_us(ts[first]).isoformat(),
+            'end': _from_epoch_us(ts[stop]).isoformat(),
+            'duration_sec': round(float(duration), 1),
+        })
+    return zones
+
+
+@lru_cache(maxsize=TRAJECTORY_CACHE_SIZE)
+def _trajectory(store: str, version: tuple, start_us: Optional[int], end_us: Optional[int]) -> dict:  # noqa: ARG001
+    """Trajectoire complete d'une fenetre, mise en cache par version du stockage."""
+    import numpy as np
+
+    start = _from_epoch_us(start_us) if start_us is not None else None
+    end = _from_epoch_us(end_us) if end_us is not None else None
+    ts, values = load_columns(list(TRAJECTORY_COLUMNS), start, end)
+    x, y = (values[name].astype(np.float64) for name in TRAJECTORY_COLUMNS)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    ts, x, y = ts[valid], x[valid], y[valid]
+    steps = np.hypot(np.diff(x), np.diff(y))
+    return {
+        'ts': ts, 'x': x, 'y': y,
+        'rank': douglas_peucker_rank(x, y),
+        'distance': float(steps.sum()),
+        'dwell': _dwell_zones(ts, x, y, steps) if len(ts) else [],
+    }
+
+
+def calculate_trajectory(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         tolerance: Optional[float] = None, points: Optional[int] = None) -> dict:
+    """Trajectoire de l'AGV sur ``[start, end[``.
+
+    Le trace est simplifie par Douglas-Peucker a ``tolerance`` metres et/ou
+    ramene a ``points`` points (``DEFAULT_POINTS`` si rien n'est precise).
+    Le calcul lourd (rangs, distance, arrets) est mis en cache par fenetre.
+
+    Returns:
+        dict avec cles : distance_m, duration_sec, samples, tolerance_m
+        (ecart maximal du trace renvoye), path (``timestamps``, ``x``, ``y``),
+        dwell_zones, status (``'unavailable'`` sans odometrie).
+    """
+    import numpy as np
+
+    manifest = load_manifest()
+    if not all(name in manifest['columns'] for name in TRAJECTORY_COLUMNS):
+        return {'distance_m': 0, 'duration_sec': 0, 'samples': 0, 'tolerance_m': 0,
+                'path': {'timestamps': [], 'x': [], 'y': []}, 'dwell_zones': [], 'status': 'unavailable'}
+
+    base = _trajectory(
+        ROBOTINO_STORE_DIR, (len(manifest['segments']), manifest['last_timestamp']),
+        _to_epoch_us(start.isoformat()) if start else None,
+        _to_epoch_us(end.isoformat()) if end else None,
+    )
+    rank = base['rank']
+    keep = rank > (tolerance or 0.0)
+    if points is None and tolerance is None:
+        points = DEFAULT_POINTS
+    if points is not None and keep.sum() > points:
+        threshold = np.partition(rank, len(rank) - points)[len(rank) - points]
+        keep &= rank >= threshold
+    kept = np.flatnonzero(keep)
+    dropped = rank[~keep]
+    ts = base['ts']
+    return {
+        'distance_m': round(base['distance'], 3),
+        'duration_sec': round(float(ts[-1] - ts[0]) / 1e6, 1) if len(ts) else 0,
+        'samples': int(len(ts)),
+        'tolerance_m': round(float(dropped.max()), 4) if len(dropped) else 0,
+        'path': {
+            'timestamps': [_from_epoch_us(t).isoformat() for t in ts[kept]],
+            'x': np.round(base['x'][kept], 4).tolist(),
+            'y': np.round(base['y'][kept], 4).tolist(),
+        },
+        'dwell_zones': base['dwell'],
+        'status': 'normal' if len(ts) else 'unavailable',
+    }
+
+
+# ============================================================================
+# Routes
+# ============================================================================
+
+@bp.route('/api/robotino')
+@login_required
+def api_robotino():
+    """Series de telemetrie Robotino en JSON.
+
+    Parametres : ``columns`` (separees par des virgules, defaut
+    ``DEFAULT_SERIES``), ``start`` / ``end`` (ISO 8601) et ``points``
+    (nombre maximal de points, defaut ``DEFAULT_POINTS``).
+    """
+    try:
+        columns = [c for c in request.args.get('columns', ','.join(DEFAULT_SERIES)).split(',') if c]
+        start = parse_datetime(request.args.get('start', ''))
+        end = parse_datetime(request.args.get('end', ''))
+        points = min(max(request.args.get('points', DEFAULT_POINTS, type=int), 1), MAX_POINTS)
+        if not load_manifest()['segments']:
+            return jsonify({'error': "Aucune telemetrie Robotino ingeree."}), 404
+        result = query_series(columns, start, end, points)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(result)
+
+
+@bp.route('/api/robotino/energy')
+@login_required
+def api_robotino_energy():
+    """Energie mesuree de l'AGV (Wh) sur ``[start, end[`` (ISO 8601, optionnels)."""
+    try:
+        start = parse_datetime(request.args.get('start', ''))
+        end = parse_datetime(request.args.get('end', ''))
+        points = min(max(request.args.get('points', ENERGY_TIMELINE_POINTS, type=int), 1), MAX_POINTS)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(calculate_agv_energy(start, end, points))
+
+
+@bp.route('/api/robotino/trajectory')
+@login_required
+def api_robotino_trajectory():
+    """Trajectoire simplifiee de l'AGV.
+
+    Parametres : ``start`` / ``end`` (ISO 8601), ``tolerance`` (m) et
+    ``points`` (nombre maximal de points, plafonne a ``MAX_POINTS``).
+    """
+    try:
+        start = parse_datetime(request.args.get('start', ''))
+        end = parse_datetime(request.args.get('end', ''))
+        tolerance = request.args.get('tolerance', type=float)
+        points = request.args.get('points', type=int)
+        if tolerance is not None and tolerance < 0:
+            raise ValueError("tolerance doit etre positive")
+        if points is not None:
+            points = min(max(points, 2), MAX_POINTS)
+        elif tolerance is None:
+            points = DEFAULT_POINTS
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if not load_manifest()['segments']:
+        return jsonify({'error': "Aucune telemetrie Robotino ingeree."}), 404
+    return jsonify(calculate_trajectory(start, end, tolerance, points))
+
+
+@bp.route('/api/robotino/state')
+@login_required
+def api_robotino_state():
+    """Etat de la telemetrie a l'instant ``at`` (ISO 8601, defaut : dernier echantillon).
+
+    ``columns`` (separees par des virgules) restreint les colonnes renvoyees.
+    """
+    manifest = load_manifest()
+    if not manifest['segments']:
+        return jsonify({'error': "Aucune telemetrie Robotino ingeree."}), 404
+    try:
+        at = parse_datetime(request.args.get('at', '')) or _from_epoch_us(manifest['last_timestamp'])
+        columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+        return jsonify(state_at(at, columns))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
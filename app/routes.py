@@ -26,9 +26,9 @@ Correspondance Route <-> KPIs affiches
 +-----------------+------------------------------------------------------------+
 """
 
-from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, url_for
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
 
-from . import services
+from . import live, robotino, services
 from .auth import login_required
 
 bp = Blueprint('main', __name__)
@@ -184,19 +184,21 @@ def delai():
 @bp.route('/energie')
 @login_required
 def energie():
-    """Page detail Energie : consommation electrique et air comprime."""
+    """Page detail Energie : consommation electrique, air comprime et energie AGV mesuree."""
     try:
         energy = services.calculate_energy_summary()
     except Exception as e:
         current_app.logger.error(f"calculate_energy_summary failed: {e}")
         energy = _KPI_ERROR.copy()
+    agv_energy = robotino.calculate_agv_energy()
 
-    if isinstance(energy, dict) and energy.get('status') == 'error':
+    if any(isinstance(k, dict) and k.get('status') == 'error' for k in (energy, agv_energy)):
         flash("Certains indicateurs sont temporairement indisponibles.", "warning")
 
     return render_template(
         'energie.html',
         energy=energy,
+        agv_energy=agv_energy,
     )
 
 
@@ -229,7 +231,18 @@ def stock():
 @bp.route('/api/kpis')
 @login_required
 def api_kpis():
-    """Endpoint JSON renvoyant les KPIs du dashboard (usage AJAX futur)."""
+    """Endpoint JSON renvoyant les KPIs du dashboard (usage AJAX futur).
+
+    ``?window=1h`` (``8h``, ``24h``) renvoie les KPIs de la fenetre
+    glissante correspondante, lus dans les cumuls du suivi en direct.
+    """
+    window = request.args.get('window')
+    if window:
+        if window not in live.ROLLING_WINDOWS:
+            return jsonify({'error': f"window doit etre parmi : {', '.join(live.ROLLING_WINDOWS)}"}), 400
+        live.ensure_fresh()
+        return jsonify(live.rolling_kpis(window))
+
     kpis = {}
 
     try:
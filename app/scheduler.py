@@ -0,0 +1,309 @@
+"""
+Generation planifiee des rapports par equipe, jour et semaine.
+
+Plutot que de recalculer tous les KPIs a chaque export manuel (souvent
+aux heures de pointe, en fin d'equipe), un thread d'arriere-plan genere
+les rapports Excel et PDF de chaque periode close et les archive sur
+disque. Telecharger un rapport historique devient une simple lecture de
+fichier statique.
+
+Periodes archivees
+==================
+
++---------+--------------------------+-------------------------------------+
+| Type    | Decoupage                | Exemple de nom                      |
++---------+--------------------------+-------------------------------------+
+| equipe  | 06-14h, 14-22h, 22-06h   | ``2025-03-27_matin.xlsx``           |
+| jour    | 00h-24h                  | ``2025-03-27.pdf``                  |
+| semaine | lundi 00h - lundi 00h    | ``2025-W13.xlsx``                   |
++---------+--------------------------+-------------------------------------+
+
+Une periode n'est generee que ``REPORT_GENERATION_DELAY_SEC`` apres sa
+fin, et seulement pendant la plage creuse ``REPORT_OFFPEAK_START_HOUR`` -
+``REPORT_OFFPEAK_END_HOUR`` (23h-05h par defaut), pour ne pas concurrencer
+les exports manuels ni la releve. Les periodes sans aucune ligne MES
+(machine, etape, piece) ne sont pas generees. Les KPIs sont calcules sur
+la fenetre de la periode (``services.time_window``).
+
+Le planificateur est active par la variable ``REPORT_SCHEDULER_ENABLED``.
+La page ``/rapports`` liste l'archive (role ``responsable`` ou superieur).
+"""
+
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from flask import Blueprint, Flask, abort, render_template, send_from_directory
+
+from .auth import login_required, role_required
+
+bp = Blueprint('reports', __name__)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constantes de configuration
+# ---------------------------------------------------------------------------
+REPORT_ARCHIVE_DIR = os.getenv('REPORT_ARCHIVE_DIR', os.path.join(os.getcwd(), 'rapports'))
+REPORT_SCHEDULE_INTERVAL_SEC = int(os.getenv('REPORT_SCHEDULE_INTERVAL_SEC', '900'))
+REPORT_GENERATION_DELAY_SEC = int(os.getenv('REPORT_GENERATION_DELAY_SEC', '1800'))
+REPORT_LOOKBACK_DAYS = int(os.getenv('REPORT_LOOKBACK_DAYS', '14'))
+# Plage creuse de generation [debut, fin[ en heures locales (egales = toute la journee)
+REPORT_OFFPEAK_START_HOUR = int(os.getenv('REPORT_OFFPEAK_START_HOUR', '23'))
+REPORT_OFFPEAK_END_HOUR = int(os.getenv('REPORT_OFFPEAK_END_HOUR', '5'))
+
+# Equipes : (nom, heure de debut, heure de fin) — la nuit chevauche minuit
+SHIFTS: list[tuple[str, int, int]] = [
+    ('matin', 6, 14),
+    ('apres-midi', 14, 22),
+    ('nuit', 22, 6),
+]
+
+PERIOD_KINDS: tuple[str, ...] = ('equipe', 'jour', 'semaine')
+
+_scheduler_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+
+# ============================================================================
+# Decoupage en periodes
+# ============================================================================
+
+def _period(kind: str, slug: str, label: str, start: datetime, end: datetime) -> dict:
+    """Construit la description d'une periode."""
+    return {'kind': kind, 'slug': slug, 'label': label, 'start': start, 'end': end}
+
+
+def periods_for_day(day: date) -> list[dict]:
+    """Retourne les periodes commencant le jour ``day``.
+
+    Trois equipes, la journee, et la semaine si ``day`` est un lundi.
+    """
+    periods = []
+    midnight = datetime.combine(day, time())
+
+    for name, start_h, end_h in SHIFTS:
+        start = midnight + timedelta(hours=start_h)
+        end = midnight + timedelta(hours=end_h if end_h > start_h else 24 + end_h)
+        periods.append(_period(
+            'equipe', f"{day.isoformat()}_{name}",
+            f"Equipe {name} du {day.strftime('%d/%m/%Y')} ({start_h:02d}:00-{end_h:02d}:00)",
+            start, end,
+        ))
+
+    periods.append(_period(
+        'jour', day.isoformat(), f"Journee du {day.strftime('%d/%m/%Y')}",
+        midnight, midnight + timedelta(days=1),
+    ))
+
+    if day.weekday() == 0:
+        year, week, _ = day.isocalendar()
+        sunday = day + timedelta(days=6)
+        periods.append(_period(
+            'semaine', f"{year}-W{week:02d}",
+            f"Semaine {week} ({day.strftime('%d/%m/%Y')} - {sunday.strftime('%d/%m/%Y')})",
+            midnight, midnight + timedelta(days=7),
+        ))
+
+    return periods
+
+
+def closed_periods(now: datetime, lookback_days: int = REPORT_LOOKBACK_DAYS) -> list[dict]:
+    """Liste les periodes closes depuis au moins ``REPORT_GENERATION_DELAY_SEC``.
+
+    Args:
+        now: Instant de reference.
+        lookback_days: Nombre de jours passes a examiner.
+
+    Returns:
+        Periodes triees par date de fin.
+    """
+    cutoff = now - timedelta(seconds=REPORT_GENERATION_DELAY_SEC)
+    # Les semaines commencent jusqu'a 6 jours avant la fenetre examinee
+    first_day = now.date() - timedelta(days=lookback_days + 6)
+    periods = []
+    day = first_day
+    while day <= now.date():
+        for period in periods_for_day(day):
+            if period['end'] <= cutoff and period['end'].date() >= now.date() - timedelta(days=lookback_days):
+                periods.append(period)
+        day += timedelta(days=1)
+    periods.sort(key=lambda p: p['end'])
+    return periods
+
+
+def in_offpeak(now: datetime) -> bool:
+    """Indique si ``now`` tombe dans la plage creuse de generation.
+
+    La plage peut chevaucher minuit (23h-05h) ; des heures de debut et de
+    fin egales autorisent la generation a toute heure.
+    """
+    start, end = REPORT_OFFPEAK_START_HOUR, REPORT_OFFPEAK_END_HOUR
+    if start == end:
+        return True
+    if start < end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+def has_activity(period: dict) -> bool:
+    """Indique si la periode contient au moins une ligne MES.
+
+    Une seule requete (``EXISTS`` sur les etats machine, les etapes finies
+    et les rapports pieces). Doit etre appele dans un contexte applicatif.
+    """
+    from . import db
+    from .models import MachineReport, PartsReport, Step
+
+    start, end = period['start'], period['end']
+    return bool(db.session.query(db.or_(
+        db.exists().where(MachineReport.TimeStamp >= start, MachineReport.TimeStamp < end),
+        db.exists().where(Step.End >= start, Step.End < end),
+        db.exists().where(PartsReport.TimeStamp >= start, PartsReport.TimeStamp < end),
+    )).scalar())
+
+
+# ============================================================================
+# Generation et archivage
+# ============================================================================
+
+def _archived_files(kind: str, slug: str) -> list[str]:
+    """Retourne les noms de fichiers archives pour une periode."""
+    folder = os.path.join(REPORT_ARCHIVE_DIR, kind)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder) if name.rsplit('.', 1)[0] == slug)
+
+
+def generate_period(period: dict) -> list[str]:
+    """Genere et archive les rapports Excel et PDF d'une periode.
+
+    Doit etre appele dans un contexte applicatif Flask.
+
+    Returns:
+        Chemins des fichiers archives.
+    """
+    from . import export, services
+
+    now = datetime.now().strftime('%d/%m/%Y %H:%M')
+    with services.time_window(period['start'], period['end']):
+        kpis = export._collect_kpis()
+
+    folder = os.path.join(REPORT_ARCHIVE_DIR, period['kind'])
+    os.makedirs(folder, exist_ok=True)
+
+    paths = []
+    for fmt in export.EXPORT_FORMATS:
+        report, extension = export.get_report(fmt, kpis, period['label'], now)
+        path = os.path.join(folder, f"{period['slug']}.{extension}")
+        tmp_path = path + '.tmp'
+        with report, open(tmp_path, 'wb') as out:
+            shutil.copyfileobj(report, out)
+        os.replace(tmp_path, path)
+        paths.append(path)
+
+    logger.info("Rapports archives : %s", period['label'])
+    return paths
+
+
+def run_pending(app: Flask, now: Optional[datetime] = None) -> int:
+    """Genere les rapports des periodes closes qui ne sont pas encore archivees.
+
+    Hors plage creuse, rien n'est genere ; les periodes sans donnees MES
+    sont ignorees (elles seront reexaminees au passage suivant).
+
+    Args:
+        app: Instance Flask.
+        now: Instant de reference (defaut : maintenant).
+
+    Returns:
+        Nombre de periodes generees.
+    """
+    now = now or datetime.now()
+    if not in_offpeak(now):
+        return 0
+    generated = 0
+    for period in closed_periods(now):
+        # Un rapport Excel + un rapport PDF (ou HTML en fallback)
+        if len(_archived_files(period['kind'], period['slug'])) >= 2:
+            continue
+        try:
+            with app.app_context():
+                if not has_activity(period):
+                    continue
+                generate_period(period)
+            generated += 1
+        except Exception:
+            logger.exception("Echec de generation des rapports %s", period['slug'])
+    return generated
+
+
+def _scheduler_loop(app: Flask) -> None:
+    """Boucle du thread planificateur."""
+    while not _stop_event.is_set():
+        try:
+            run_pending(app)
+        except Exception:
+            logger.exception("Erreur du planificateur de rapports")
+        _stop_event.wait(REPORT_SCHEDULE_INTERVAL_SEC)
+
+
+def start_scheduler(app: Flask) -> None:
+    """Demarre le thread planificateur (une seule fois par processus)."""
+    global _scheduler_thread
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop, args=(app,), name='report-scheduler', daemon=True,
+    )
+    _scheduler_thread.start()
+    logger.info("Planificateur de rapports demarre (toutes les %d s).", REPORT_SCHEDULE_INTERVAL_SEC)
+
+
+# ============================================================================
+# Archive : page d'index et telechargement
+# ============================================================================
+
+def list_archive() -> dict[str, list[dict]]:
+    """Liste les rapports archives par type de periode (plus recents d'abord).
+
+    Returns:
+        ``{kind: [{'slug': ..., 'files': [...]}]}``.
+    """
+    archive = {}
+    for kind in PERIOD_KINDS:
+        folder = os.path.join(REPORT_ARCHIVE_DIR, kind)
+        by_slug: dict[str, list[str]] = {}
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.endswith('.tmp'):
+                    continue
+                by_slug.setdefault(name.rsplit('.', 1)[0], []).append(name)
+        archive[kind] = [
+            {'slug': slug, 'files': sorted(files)}
+            for slug, files in sorted(by_slug.items(), reverse=True)
+        ]
+    return archive
+
+
+@bp.route('/rapports')
+@login_required
+@role_required('responsable')
+def index():
+    """Page d'index des rapports archives."""
+    return render_template('rapports.html', archive=list_archive())
+
+
+@bp.route('/rapports/<kind>/<path:filename>')
+@login_required
+@role_required('responsable')
+def download(kind: str, filename: str):
+    """Telecharge un rapport archive (lecture de fichier statique)."""
+    if kind not in PERIOD_KINDS:
+        abort(404)
+    return send_from_directory(
+        os.path.join(REPORT_ARCHIVE_DIR, kind), filename, as_attachment=True,
+    )
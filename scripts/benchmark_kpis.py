@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the KPI functions and pages.
+
+Runs every ``services.calculate_*`` function and every KPI page against
+the embedded SQLite database, scaled synthetically (1x, 10x, 100x of the
+MES4 dump), and reports p50 / p95 latency and peak Python memory.
+
+Scaled databases are built from ``data/mes4.db`` by replicating the
+time-series tables (orders, positions, steps, machine and parts reports)
+with shifted dates and order numbers; reference tables are left as is.
+
+Results are compared to a committed baseline JSON: the script exits with
+status 1 when a page does not answer HTTP 200, or when a p95 latency or a
+peak memory exceeds the baseline by more than the tolerance
+(``--tolerance`` or ``BENCH_TOLERANCE``, default 25 %).
+``--update-baseline`` refuses to record a run in which a page did not
+answer HTTP 200.
+
+Usage:
+    python scripts/benchmark_kpis.py
+    python scripts/benchmark_kpis.py --scales 1,10 --repeat 10
+    python scripts/benchmark_kpis.py --update-baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DB = os.path.join(PROJECT_ROOT, 'data', 'mes4.db')
+BENCH_DIR = os.path.join(PROJECT_ROOT, 'data', 'bench')
+BASELINE_PATH = os.path.join(PROJECT_ROOT, 'scripts', 'benchmark_baseline.json')
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = float(os.getenv('BENCH_TOLERANCE', '0.25'))
+
+# Differences below these floors are noise, never regressions
+MIN_LATENCY_DELTA_MS = 5.0
+MIN_MEMORY_DELTA_KB = 256.0
+
+# Time-series tables replicated when scaling (order number column or None)
+SCALED_TABLES = {
+    'tblfinorder': 'ONo',
+    'tblfinorderpos': 'ONo',
+    'tblfinstep': 'ONo',
+    'tblmachinereport': None,
+    'tblpartsreport': None,
+}
+
+ROUTES = ('/dashboard', '/performance', '/qualite', '/delai', '/energie', '/stock', '/api/kpis')
+
+
+# ============================================================================
+# Scaled databases
+# ============================================================================
+
+def build_scaled_db(source: str, scale: int, output: str) -> str:
+    """Create ``output`` as ``source`` with its time series replicated ``scale`` times.
+
+    Each copy is shifted by the full span of the dump (so copies never
+    overlap) and its order numbers by ``max(ONo) + 1``.
+    """
+    if os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source):
+        return output
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp_output = output + '.tmp'
+    shutil.copyfile(source, tmp_output)
+
+    conn = sqlite3.connect(tmp_output)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    first, last = conn.execute(
+        "SELECT MIN(TimeStamp), MAX(TimeStamp) FROM tblmachinereport"
+    ).fetchone()
+    span_days = (datetime.fromisoformat(last) - datetime.fromisoformat(first)).days + 1
+    ono_step = conn.execute("SELECT COALESCE(MAX(ONo), 0) + 1 FROM tblfinorder").fetchone()[0]
+    # Original rows only (copies are appended after them)
+    base_rowid = {
+        table: conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        for table in SCALED_TABLES
+    }
+
+    for copy in range(1, scale):
+        for table, ono_column in SCALED_TABLES.items():
+            columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            select = []
+            for _, name, col_type, *_ in columns:
+                if 'date' in col_type.lower():
+                    select.append(f"datetime({name}, '+{copy * span_days} days')")
+                elif name == ono_column:
+                    select.append(f"{name} + {copy * ono_step}")
+                else:
+                    select.append(name)
+            names = ', '.join(c[1] for c in columns)
+            conn.execute(f"INSERT INTO {table} ({names}) SELECT {', '.join(select)} "
+                         f"FROM {table} WHERE rowid <= {base_rowid[table]}")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_output, output)
+    return output
+
+
+# ============================================================================
+# Measurements
+# ============================================================================
+
+def _measure(func, repeat: int) -> dict:
+    """Run ``func`` ``repeat`` times, then once more under tracemalloc."""
+    func()  # warm-up (imports, pool, caches)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations.sort()
+    p95_index = min(len(durations) - 1, round(0.95 * (len(durations) - 1)))
+    return {
+        'p50_ms': round(statistics.median(durations), 2),
+        'p95_ms': round(durations[p95_index], 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_scale(db_path: str, repeat: int) -> dict:
+    """Benchmark every KPI function and page on one database."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # No background KPI warm-up competing with the timed runs
+    os.environ['STARTUP_WARMUP'] = '0'
+    sys.path.insert(0, PROJECT_ROOT)
+    from app import create_app, services
+
+    app = create_app()
+    results = {}
+    # KPI and page errors are reported through the status column, not logs
+    logging.disable(logging.ERROR)
+
+    with app.app_context():
+        for name in sorted(n for n in dir(services) if n.startswith('calculate_')):
+            results[name] = _measure(getattr(services, name), repeat)
+            print(f"    {name:<32} p50 {results[name]['p50_ms']:>9.1f} ms   "
+                  f"p95 {results[name]['p95_ms']:>9.1f} ms   peak {results[name]['peak_kb']:>9.0f} KB")
+
+    client = app.test_client()
+    client.post('/login', data={'identifiant': 'admin', 'mot_de_passe': 'admin123'})
+    for url in ROUTES:
+        results[url] = _measure(lambda url=url: client.get(url), repeat)
+        results[url]['status'] = client.get(url).status_code
+        print(f"    {url:<32} p50 {results[url]['p50_ms']:>9.1f} ms   "
+              f"p95 {results[url]['p95_ms']:>9.1f} ms   peak {results[url]['peak_kb']:>9.0f} KB"
+              f"   HTTP {results[url]['status']}")
+
+    logging.disable(logging.NOTSET)
+    return results
+
+
+# ============================================================================
+# Baseline comparison
+# ============================================================================
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """List regressions of ``results`` against ``baseline`` (same scales and names).
+
+    A page answering anything but HTTP 200 is always a regression: an error
+    page is usually fast and would otherwise look like an improvement.
+    """
+    regressions = []
+    for scale, entries in results.items():
+        for name, current in entries.items():
+            if current.get('status', 200) != 200:
+                regressions.append(f"x{scale} {name} HTTP {current['status']}")
+                continue
+            reference = baseline.get('results', {}).get(scale, {}).get(name)
+            if reference is None:
+                continue
+            checks = (('p95_ms', MIN_LATENCY_DELTA_MS), ('peak_kb', MIN_MEMORY_DELTA_KB))
+            for metric, floor in checks:
+                limit = max(reference[metric] * (1 + tolerance), reference[metric] + floor)
+                if current[metric] > limit:
+                    regressions.append(
+                        f"x{scale} {name} {metric} : {current[metric]} > {reference[metric]} "
+                        f"(+{tolerance:.0%})"
+                    )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help="comma-separated data scales (default: 1,10,100)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per function (default: 5)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative regression (default: 0.25)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="overwrite the baseline with these results")
+    args = parser.parse_args()
+
+    if not os.path.exists(SOURCE_DB):
+        print(f"  Base introuvable : {SOURCE_DB}")
+        print("  Lancez d'abord : python scripts/convert_to_sqlite.py")
+        return 2
+
+    scales = [int(s) for s in args.scales.split(',') if s]
+    results = {}
+    for scale in scales:
+        db_path = SOURCE_DB if scale == 1 else build_scaled_db(
+            SOURCE_DB, scale, os.path.join(BENCH_DIR, f'mes4_x{scale}.db'))
+        print(f"\n  Echelle x{scale} ({db_path})")
+        results[str(scale)] = run_scale(db_path, args.repeat)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        failed = [f"x{scale} {name} HTTP {entry['status']}" for scale, entries in results.items()
+                  for name, entry in entries.items() if entry.get('status', 200) != 200]
+        if failed:
+            print(f"\n  Baseline non mise a jour, {len(failed)} page(s) en erreur :")
+            for line in failed:
+                print(f"    - {line}")
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f"\n  Baseline mise a jour : {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n  Pas de baseline ({args.baseline}) : lancez avec --update-baseline")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as fh:
+        baseline = json.load(fh)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n  {len(regressions)} regression(s) :")
+        for line in regressions:
+            print(f"    - {line}")
+        return 1
+    print(f"\n  Aucune regression (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
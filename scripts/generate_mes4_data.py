@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""Generate a synthetic MES4 database at any scale.
+
+The 2025-03-27 dump only holds ~190 orders; this script simulates the
+line to produce as much history as needed, deterministically (``--seed``).
+The output follows the relationships documented in ``app/models.py``:
+
+- orders (``tblfinorder``) are released on working days between 06:00
+  and 22:00 and hold 1 to 4 positions (``tblfinorderpos``);
+- each position goes through the routing below, one ``tblfinstep`` row
+  per operation, each machine processing one part at a time;
+- every step emits ``tblmachinereport`` transitions (Busy on / off); a
+  failing step raises ErrorL0 or ErrorL2, stops the machine after a
+  detection delay and blocks it for a repair time;
+- production steps emit a ``tblpartsreport`` detection, with an error
+  code when the camera rejects the part;
+- parts are taken from the ASRS32 (op 213) and boxes stored in the
+  ASRS20 (op 215): ``tblbufferpos`` holds the final buffer state.
+
+Reference tables mirror the dump: resources, buffers, error codes and
+the 142 nominal operations of ``tblresourceoperation`` (only the 8
+routing operations are ever executed). Timestamps are whole seconds, like
+the dump's DATETIME columns, so several events of a machine may share a
+second and are ordered by their ID, as in production data.
+
+Usage:
+    python scripts/generate_mes4_data.py --scale 10 --output data/mes4_x10.db
+    python scripts/generate_mes4_data.py --orders 5000 --output mes4.sql
+"""
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app import models  # noqa: E402
+
+# Orders in the 2025-03-27 dump (scale 1)
+BASE_ORDERS = 190
+
+DEFAULT_START = '2025-01-06'
+ORDERS_PER_DAY = 300
+WORK_START_HOUR = 6
+WORK_END_HOUR = 22
+
+ORDER_DONE_STATE = 100                    # State of finished orders in the dump
+POSITIONS_PER_ORDER = (1, 2, 3, 4)
+POSITIONS_WEIGHTS = (0.35, 0.30, 0.20, 0.15)
+
+STEP_ERROR_RATE = 0.01                    # Steps raising a machine error
+SCRAP_AFTER_ERROR_RATE = 0.25            # Parts scrapped after a machine error
+CAMERA_REJECT_RATE = 0.03                 # Parts rejected by the camera (op 400)
+UNKNOWN_ERROR_RATE = 0.004                # ErrorID 99 / 5050 (known dump anomaly)
+DETECTION_DELAY_SEC = (1, 25)             # Error -> machine stop
+REPAIR_TIME_SEC = (60, 900)               # Machine stopped after an error
+TRANSPORT_SEC = (5, 40)                   # Carrier transport between stations
+
+# tblresourceoperation of the dump, all 142 rows. ResourceID 0 lists every
+# operation number with zero nominal values; OffsetTime is 0 everywhere.
+GENERIC_OPERATIONS = (
+    1, 10, 11, 12, 13, 20, 21, 40, 110, 111, 112, 113, 114, 115, 116, 117, 118, 120, 121,
+    122, 123, 126, 130, 131, 132, 133, 134, 140, 141, 142, 143, 150, 161, 162, 171, 172,
+    173, 174, 180, 192, 193, 194, 195, 200, 201, 202, 203, 205, 210, 211, 212, 213, 215,
+    216, 217, 218, 220, 300, 301, 302, 303, 304, 305, 310, 311, 316, 320, 321, 322, 323,
+    324, 325, 326, 327, 328, 329, 400, 401, 402, 403, 404, 405, 406, 407, 410, 420, 430,
+    452, 500, 501, 502, 503, 504, 505, 506, 510, 511, 512, 600, 601, 610, 654, 1001, 1002,
+    1003, 1004, 1005, 1010, 1020, 1030, 1040, 1100, 1101, 1102, 1103, 1104, 1105, 1106,
+    1107, 1108, 1109, 1110, 1111, 1112, 1113, 1120,
+)
+
+# (ResourceID, OpNo, WorkingTime s, ElectricEnergy mWs, CompressedAir mNl)
+MACHINE_OPERATIONS = [
+    (1, 210, 20, 0, 0),
+    (1, 211, 20, 0, 0),
+    (1, 212, 20, 0, 0),
+    (1, 213, 20, 0, 0),
+    (2, 116, 15, 0, 0),
+    (3, 400, 2, 0, 0),
+    (4, 201, 3, 1_257_000, 180),
+    (5, 111, 6, 1_837_000, 151),
+    (6, 510, 6, 0, 0),
+    (7, 215, 0, 0, 0),
+    (7, 310, 10, 0, 0),
+    (7, 311, 10, 0, 0),
+    (8, 215, 10, 0, 0),
+    (9, 502, 4, 0, 0),
+    (9, 503, 4, 0, 0),
+    (9, 510, 4, 0, 0),
+]
+
+# {(ResourceID, OpNo): (WorkingTime, ElectricEnergy, CompressedAir)}
+NOMINAL = {(rid, op_no): values for rid, op_no, *values in MACHINE_OPERATIONS}
+
+# Routing of a part: (OpNo, ResourceID, description), nominal values from NOMINAL
+ROUTING = [
+    (213, 1, 'release a defined part on stopper 2'),
+    (116, 2, 'pick part'),
+    (400, 3, 'check part with camera'),
+    (201, 4, 'feed back cover from magazine'),
+    (111, 5, 'pressing with force regulation'),
+    (510, 6, 'manual assembly'),
+    (310, 7, 'place part from carrier to box'),
+    (215, 8, 'store box to target'),
+]
+
+RESOURCES = [
+    (0, 'no resource', 'no resource'),
+    (1, 'CP-F-ASRS32-P', 'CP-Factory ASRS32 automated storage for pallets and covers.'),
+    (2, 'CP-AM-iPICK', 'CP-Lab/Factory straight base with pick by light application.'),
+    (3, 'CP-AM-CAM', 'CP-Lab/Factory straight base with camera application.'),
+    (4, 'CP-AM-MAG-BACK', 'CP-Factory straight base with input application for back cover.'),
+    (5, 'CP-AM-MPRESS', 'CP-Factory straight base with muscle press application.'),
+    (6, 'CP-AM-MAN', 'CP-Lab/Factory straight base with manual workplace.'),
+    (7, 'CP-F-COBOT', 'CP-Factory bypass base with UR3e robot.'),
+    (8, 'CP-F-ASRS20-B', 'CP Factory ASRS20 automated storage for boxes.'),
+    (9, 'MAN-MOBILE', 'Mobile manual workplace.'),
+    (10, 'LOG-MR-B', 'Mobile robot Robotino for boxes.'),
+    (90, 'SPARE PARTS', 'MMS spare part storage.'),
+]
+
+# (ResourceId, BufNo, Description, Type, Sides, Rows, Columns)
+BUFFERS = [
+    (1, 1, 'Storage', 1, 2, 4, 4),
+    (7, 1, 'Box', 12, 1, 1, 2),
+    (7, 2, 'Box', 12, 1, 1, 2),
+    (8, 1, 'Storage', 1, 1, 4, 5),
+    (8, 2, 'from AGV', 11, 1, 1, 1),
+    (8, 3, 'to AGV', 10, 1, 1, 1),
+    (9, 1, 'from robotino', 11, 1, 1, 1),
+    (9, 2, 'to robotino', 10, 1, 1, 1),
+    (10, 1, 'storage', 1, 1, 1, 1),
+    (90, 1, 'Spare parts buffer', 3, 2, 2, 4),
+]
+
+ERROR_CODES = [
+    (0, 'no error', 'IDLE'),
+    (1, 'general error', 'ERR'),
+    (101, 'Wrong Color', 'ERR_COL'),
+    (102, 'Wrong Height', 'ERR_HGT'),
+]
+
+PART_NUMBERS = (1, 2, 3, 4, 5)
+RAW_PARTS_BUFFER = (1, 1)                 # ASRS32 : raw parts, emptied by op 213
+BOXES_BUFFER = (8, 1)                     # ASRS20 : finished boxes, filled by op 215
+
+FLUSH_ROWS = 5_000
+
+
+# ============================================================================
+# Writers
+# ============================================================================
+
+def _tables() -> dict:
+    """SQLAlchemy tables of the application, by name."""
+    return {table.name: table for table in models.db.metadata.sorted_tables}
+
+
+class SQLiteWriter:
+    """Writes rows into a fresh SQLite database, in batches."""
+
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        from sqlalchemy import create_engine
+        engine = create_engine(f'sqlite:///{path}')
+        models.db.metadata.create_all(engine)
+        engine.dispose()
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.columns = {name: [c.name for c in t.columns] for name, t in _tables().items()}
+        self.pending: dict[str, list] = {name: [] for name in self.columns}
+
+    def add(self, table: str, row: dict) -> None:
+        self.pending[table].append(tuple(
+            _sqlite_value(row.get(name)) for name in self.columns[table]
+        ))
+        if len(self.pending[table]) >= FLUSH_ROWS:
+            self._flush(table)
+
+    def _flush(self, table: str) -> None:
+        rows = self.pending[table]
+        if rows:
+            names = self.columns[table]
+            self.conn.executemany(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                rows,
+            )
+            rows.clear()
+
+    def close(self) -> None:
+        for table in self.pending:
+            self._flush(table)
+        self.conn.commit()
+        self.conn.close()
+
+
+class SqlFileWriter:
+    """Writes a MariaDB-compatible SQL script (DROP / CREATE / INSERT)."""
+
+    def __init__(self, path: str):
+        from sqlalchemy.dialects import mysql
+        from sqlalchemy.schema import CreateTable
+
+        self.fh = open(path, 'w', encoding='utf-8')
+        self.tables = _tables()
+        self.columns = {name: [c.name for c in t.columns] for name, t in self.tables.items()}
+        self.pending: dict[str, list] = {name: [] for name in self.columns}
+
+        self.fh.write("-- Synthetic MES4 data (scripts/generate_mes4_data.py)\n")
+        self.fh.write("SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS=0;\n\n")
+        for name, table in self.tables.items():
+            ddl = str(CreateTable(table).compile(dialect=mysql.dialect())).strip()
+            ddl = ddl.replace(f'CREATE TABLE {name} ', f'CREATE TABLE `{name}` ', 1)
+            self.fh.write(f"DROP TABLE IF EXISTS `{name}`;\n{ddl} ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n")
+
+    def add(self, table: str, row: dict) -> None:
+        self.pending[table].append(
+            '(' + ','.join(_sql_literal(row.get(name)) for name in self.columns[table]) + ')'
+        )
+        if len(self.pending[table]) >= 1_000:
+            self._flush(table)
+
+    def _flush(self, table: str) -> None:
+        rows = self.pending[table]
+        if rows:
+            names = ','.join(f'`{name}`' for name in self.columns[table])
+            self.fh.write(f"INSERT INTO `{table}` ({names}) VALUES {','.join(rows)};\n")
+            rows.clear()
+
+    def close(self) -> None:
+        for table in self.pending:
+            self._flush(table)
+        self.fh.write("\nSET FOREIGN_KEY_CHECKS=1;\n")
+        self.fh.close()
+
+
+def _sqlite_value(value):
+    """Stores datetimes the way SQLAlchemy reads them back."""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _sql_literal(value) -> str:
+    """MariaDB literal for a Python value."""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"'{value.strftime('%Y-%m-%d %H:%M:%S')}'"
+    escaped = str(value).replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+# ============================================================================
+# Simulation
+# ============================================================================
+
+def _release_times(rng: random.Random, start: datetime, orders: int, per_day: int):
+    """Yields order release times on working days, 06:00-22:00."""
+    day = start
+    released = 0
+    window = (WORK_END_HOUR - WORK_START_HOUR) * 3600
+    while released < orders:
+        if day.weekday() < 5:
+            count = min(per_day, orders - released)
+            for offset in sorted(rng.uniform(0, window) for _ in range(count)):
+                yield day + timedelta(hours=WORK_START_HOUR, seconds=int(offset))
+            released += count
+        day += timedelta(days=1)
+
+
+def _buffer_slots(resource_id: int, buf_no: int) -> int:
+    for rid, bno, _, _, sides, rows, columns in BUFFERS:
+        if (rid, bno) == (resource_id, buf_no):
+            return rows * columns * max(sides, 1)
+    return 0
+
+
+def generate(writer, orders: int, start: datetime, seed: int, per_day: int = ORDERS_PER_DAY) -> dict:
+    """Simulates ``orders`` orders and writes every table through ``writer``.
+
+    Returns:
+        Row count per table.
+    """
+    rng = random.Random(seed)
+    counts: dict[str, int] = {}
+
+    def add(table: str, row: dict) -> None:
+        writer.add(table, row)
+        counts[table] = counts.get(table, 0) + 1
+
+    # --- Reference tables ---
+    for rid, name, description in RESOURCES:
+        add('tblresource', {'ResourceID': rid, 'ResourceName': name, 'Description': description})
+    for op_no in GENERIC_OPERATIONS:
+        add('tblresourceoperation', {
+            'ResourceID': 0, 'OpNo': op_no, 'WorkingTime': 0, 'OffsetTime': 0,
+            'ElectricEnergy': 0, 'CompressedAir': 0,
+        })
+    for rid, op_no, working, energy, air in MACHINE_OPERATIONS:
+        add('tblresourceoperation', {
+            'ResourceID': rid, 'OpNo': op_no, 'WorkingTime': working, 'OffsetTime': 0,
+            'ElectricEnergy': energy, 'CompressedAir': air,
+        })
+    for rid, bno, description, btype, sides, rows, columns in BUFFERS:
+        add('tblbuffer', {
+            'ResourceId': rid, 'BufNo': bno, 'Description': description, 'Type': btype,
+            'Sides': sides, 'Rows': rows, 'Columns': columns,
+        })
+    for error_id, description, short in ERROR_CODES:
+        add('tblerrorcodes', {'ErrorId': error_id, 'Description': description, 'Short': short})
+
+    # --- Buffer state : {(rid, bufno): {pos: dict}} ---
+    buffers = {}
+    for rid, bno, *_ in BUFFERS:
+        buffers[(rid, bno)] = {
+            pos: {'PNo': 0, 'Quantity': 0, 'TimeStamp': start, 'ONo': 0, 'OPos': 0}
+            for pos in range(1, _buffer_slots(rid, bno) + 1)
+        }
+    for slot in buffers[RAW_PARTS_BUFFER].values():
+        slot.update(PNo=rng.choice(PART_NUMBERS), Quantity=1)
+
+    machine_free = {rid: start for _, rid, *_ in ROUTING}
+    report_id = 0
+    parts_id = 0
+    wp_no = 0
+
+    def machine_event(rid: int, ts: datetime, busy: bool, error_l0=False, error_l2=False, reset=False):
+        nonlocal report_id
+        report_id += 1
+        add('tblmachinereport', {
+            'ResourceID': rid, 'TimeStamp': ts, 'ID': report_id,
+            'AutomaticMode': True, 'ManualMode': False, 'Busy': busy, 'Reset': reset,
+            'ErrorL0': error_l0, 'ErrorL1': False, 'ErrorL2': error_l2,
+        })
+
+    def move_buffer(key, ts, ono, opos, take: bool):
+        """Takes a part from / stores a box into a buffer (refill / ship when needed)."""
+        slots = buffers[key]
+        wanted = [p for p, s in slots.items() if (s['PNo'] > 0) == take]
+        if not wanted:
+            # ASRS32 vide : reapprovisionnement ; ASRS20 plein : expedition
+            for slot in slots.values():
+                slot.update(PNo=rng.choice(PART_NUMBERS) if take else 0,
+                            Quantity=1 if take else 0, TimeStamp=ts)
+            wanted = list(slots)
+        slot = slots[rng.choice(wanted)]
+        if take:
+            slot.update(PNo=0, Quantity=0, TimeStamp=ts, ONo=ono, OPos=opos)
+        else:
+            slot.update(PNo=rng.choice(PART_NUMBERS), Quantity=1, TimeStamp=ts, ONo=ono, OPos=opos)
+
+    for ono, release in enumerate(_release_times(rng, start, orders, per_day), start=1):
+        n_positions = rng.choices(POSITIONS_PER_ORDER, POSITIONS_WEIGHTS)[0]
+        order_start = order_end = None
+        planned = sum(NOMINAL[(rid, op_no)][0] for op_no, rid, _ in ROUTING) * n_positions + 600
+
+        for opos in range(1, n_positions + 1):
+            wp_no += 1
+            pno = rng.choice(PART_NUMBERS)
+            ready = release + timedelta(seconds=int(rng.uniform(0, 60) * opos))
+            pos_start = None
+            pos_error = False
+            step = None
+
+            for index, (op_no, rid, description) in enumerate(ROUTING):
+                working, energy, air = NOMINAL[(rid, op_no)]
+                step_start = max(ready, machine_free[rid])
+                duration = (working + 1) * rng.lognormvariate(0.1, 0.25)
+                step_error = rng.random() < STEP_ERROR_RATE
+
+                machine_event(rid, step_start, busy=True)
+                if step_error:
+                    error_at = step_start + timedelta(seconds=int(duration * rng.random()))
+                    level2 = rng.random() < 0.3
+                    machine_event(rid, error_at, busy=True, error_l0=not level2, error_l2=level2)
+                    step_end = error_at + timedelta(seconds=int(rng.uniform(*DETECTION_DELAY_SEC)))
+                    machine_event(rid, step_end, busy=False, error_l0=not level2, error_l2=level2)
+                    repaired = step_end + timedelta(seconds=int(rng.uniform(*REPAIR_TIME_SEC)))
+                    machine_event(rid, repaired, busy=False, reset=True)
+                    machine_free[rid] = repaired
+                    pos_error = pos_error or rng.random() < SCRAP_AFTER_ERROR_RATE
+                else:
+                    step_end = step_start + timedelta(seconds=int(duration))
+                    machine_event(rid, step_end, busy=False)
+                    machine_free[rid] = step_end
+
+                step = {
+                    'StepNo': (index + 1) * 10, 'ONo': ono, 'OPos': opos, 'WPNo': wp_no,
+                    'OpNo': op_no, 'Description': description,
+                    'Start': step_start, 'End': step_end, 'ResourceID': rid,
+                    'ElectricEnergyCalc': energy, 'ElectricEnergyReal': 0,
+                    'CompressedAirCalc': air, 'CompressedAirReal': 0,
+                    'ErrorStep': step_error, 'Active': False, 'StaffId': 0,
+                }
+                add('tblfinstep', step)
+
+                if op_no < 200 or op_no == 400:
+                    error_id = 0
+                    if op_no == 400 and rng.random() < CAMERA_REJECT_RATE:
+                        error_id = rng.choice((101, 102))
+                        pos_error = True
+                    elif rng.random() < UNKNOWN_ERROR_RATE:
+                        error_id = rng.choice((1, 99, 5050))
+                    parts_id += 1
+                    add('tblpartsreport', {
+                        'ResourceID': rid, 'TimeStamp': step_end, 'ID': parts_id,
+                        'PNo': pno, 'ErrorID': error_id,
+                    })
+
+                if (rid, 1) == RAW_PARTS_BUFFER and op_no == 213:
+                    move_buffer(RAW_PARTS_BUFFER, step_end, ono, opos, take=True)
+                elif (rid, 1) == BOXES_BUFFER and op_no == 215:
+                    move_buffer(BOXES_BUFFER, step_end, ono, opos, take=False)
+
+                pos_start = pos_start or step_start
+                ready = step_end + timedelta(seconds=int(rng.uniform(*TRANSPORT_SEC)))
+
+            add('tblfinorderpos', {
+                'ONo': ono, 'OPos': opos,
+                'PlannedStart': release, 'PlannedEnd': release + timedelta(seconds=planned),
+                'Start': pos_start, 'End': step['End'], 'WPNo': wp_no,
+                'StepNo': step['StepNo'], 'State': ORDER_DONE_STATE, 'ResourceID': step['ResourceID'],
+                'OpNo': step['OpNo'], 'PNo': pno, 'Error': pos_error, 'OrderPNo': pno,
+            })
+            order_start = min(order_start or pos_start, pos_start)
+            order_end = max(order_end or step['End'], step['End'])
+
+        add('tblfinorder', {
+            'ONo': ono, 'PlannedStart': release, 'PlannedEnd': release + timedelta(seconds=planned),
+            'Start': order_start, 'End': order_end, 'CNo': 0,
+            'State': ORDER_DONE_STATE, 'Enabled': True,
+        })
+
+    for (rid, bno), slots in buffers.items():
+        for pos, slot in slots.items():
+            add('tblbufferpos', {'ResourceId': rid, 'BufNo': bno, 'BufPos': pos, **slot})
+
+    writer.close()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=os.path.join(PROJECT_ROOT, 'data', 'mes4_synthetic.db'),
+                        help="SQLite database (.db) or MariaDB script (.sql)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f"multiple of the dump volume ({BASE_ORDERS} orders at scale 1)")
+    parser.add_argument('--orders', type=int, help="number of orders (overrides --scale)")
+    parser.add_argument('--orders-per-day', type=int, default=ORDERS_PER_DAY)
+    parser.add_argument('--start', default=DEFAULT_START, help="first production day (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    orders = args.orders or max(1, math.ceil(BASE_ORDERS * args.scale))
+    start = datetime.fromisoformat(args.start)
+    writer = SqlFileWriter(args.output) if args.output.endswith('.sql') else SQLiteWriter(args.output)
+
+    print()
+    print("  ============================================================")
+    print("  T'ELEFAN MES 4.0 — Generation de donnees synthetiques")
+    print("  ============================================================")
+    print(f"  Sortie : {args.output}")
+    print(f"  Ordres : {orders} (graine {args.seed})")
+    print()
+
+    counts = generate(writer, orders, start, args.seed, args.orders_per_day)
+    for table, count in sorted(counts.items()):
+        print(f"  {table:<22} {count:>10} lignes")
+    print()
+    print(f"  Taille : {os.path.getsize(args.output) / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Ingest Robotino telemetry CSV files into the columnar store.
+
+Only samples newer than the last stored timestamp are appended, so the
+script can be re-run on a growing file (e.g. from cron).
+
+Usage:
+    python scripts/ingest_robotino.py
+    python scripts/ingest_robotino.py <csv_path> [<csv_path> ...]
+"""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(PROJECT_ROOT, 'ressources', 'robotino_data.csv')
+
+sys.path.insert(0, PROJECT_ROOT)
+
+from app import robotino  # noqa: E402
+
+
+def main() -> None:
+    paths = sys.argv[1:] or [DEFAULT_CSV]
+    for path in paths:
+        added = robotino.ingest_csv(path)
+        print(f"{path} : {added} echantillons ajoutes")
+    manifest = robotino.load_manifest()
+    print(f"Stockage {robotino.ROBOTINO_STORE_DIR} : "
+          f"{sum(s['rows'] for s in manifest['segments'])} echantillons, "
+          f"{len(manifest['segments'])} segment(s), {len(manifest['columns'])} colonnes")
+
+
+if __name__ == '__main__':
+    main()
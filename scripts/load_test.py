@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""HTTP load test of the dashboard against a local server.
+
+Each virtual user logs in with one of the ``auth.USERS`` accounts (round
+robin), then replays a weighted browsing mix until the end of the run:
+dashboard, detail pages, ``/api/kpis`` and, for roles allowed to, the
+Excel / PDF exports. Users wait a random think time between requests.
+
+The report gives throughput, latency percentiles and error rate, overall
+and per page. A response is an error when its status is >= 400, when the
+request fails, or when the user is sent back to ``/login``.
+
+Usage:
+    python scripts/load_test.py --url http://localhost:5000 --users 20 --duration 60
+    python scripts/load_test.py --start-server --users 50 --think-time 0.5
+"""
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.auth import ROLE_HIERARCHY, USERS  # noqa: E402
+
+DEFAULT_URL = 'http://localhost:5000'
+DEFAULT_USERS = 10
+DEFAULT_DURATION_SEC = 60
+DEFAULT_THINK_TIME_SEC = 1.0
+REQUEST_TIMEOUT_SEC = 120
+
+# Browsing mix: (path, weight, minimum role)
+BROWSING_MIX = [
+    ('/dashboard', 40, 'employe'),
+    ('/performance', 8, 'employe'),
+    ('/qualite', 8, 'employe'),
+    ('/delai', 8, 'employe'),
+    ('/energie', 8, 'employe'),
+    ('/stock', 8, 'employe'),
+    ('/api/kpis', 16, 'employe'),
+    ('/export/excel', 2, 'responsable'),
+    ('/export/pdf', 2, 'responsable'),
+]
+
+PERCENTILES = (50, 90, 95, 99)
+
+SERVER_LOG = os.path.join(tempfile.gettempdir(), 'telefan_load_test_server.log')
+
+
+# ============================================================================
+# Virtual users
+# ============================================================================
+
+def _mix_for(role: str) -> tuple[list[str], list[int]]:
+    """Pages and weights available to ``role``."""
+    level = ROLE_HIERARCHY[role]
+    allowed = [(path, weight) for path, weight, min_role in BROWSING_MIX
+               if level >= ROLE_HIERARCHY[min_role]]
+    return [p for p, _ in allowed], [w for _, w in allowed]
+
+
+def _request(opener, url: str, data: dict = None) -> tuple[int, str]:
+    """Sends a request and reads the whole body. Returns (status, final URL)."""
+    body = urllib.parse.urlencode(data).encode() if data is not None else None
+    try:
+        with opener.open(url, data=body, timeout=REQUEST_TIMEOUT_SEC) as resp:
+            resp.read()
+            return resp.status, resp.geturl()
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        return exc.code, url
+
+
+def virtual_user(base_url: str, username: str, deadline: float, think_time: float,
+                 results: list, lock: threading.Lock, seed: int) -> None:
+    """Logs in then browses until ``deadline``, appending (path, status, seconds, ok)."""
+    rng = random.Random(seed)
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+    )
+    account = USERS[username]
+    paths, weights = _mix_for(account['role'])
+
+    def timed(path: str, data: dict = None) -> None:
+        start = time.perf_counter()
+        try:
+            status, final_url = _request(opener, base_url + path, data)
+            ok = status < 400 and (path == '/login' or '/login' not in final_url)
+        except Exception:
+            status, ok = 0, False
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((path, status, elapsed, ok))
+
+    timed('/login', {'identifiant': username, 'mot_de_passe': account['password']})
+    while time.time() < deadline:
+        timed(rng.choices(paths, weights)[0])
+        if think_time > 0:
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+# ============================================================================
+# Report
+# ============================================================================
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """Aggregates raw results overall and per path."""
+    def stats(rows: list) -> dict:
+        latencies = sorted(r[2] * 1000 for r in rows)
+        errors = sum(1 for r in rows if not r[3])
+        summary = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate_pct': round(100 * errors / len(rows), 2) if rows else 0.0,
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'mean_ms': round(statistics.fmean(latencies), 1) if latencies else 0.0,
+            'max_ms': round(latencies[-1], 1) if latencies else 0.0,
+        }
+        for pct in PERCENTILES:
+            summary[f'p{pct}_ms'] = round(_percentile(latencies, pct), 1) if latencies else 0.0
+        return summary
+
+    by_path: dict[str, list] = {}
+    for row in results:
+        by_path.setdefault(row[0], []).append(row)
+    return {
+        'duration_sec': round(elapsed, 1),
+        'overall': stats(results),
+        'by_path': {path: stats(rows) for path, rows in sorted(by_path.items())},
+    }
+
+
+def print_report(report: dict) -> None:
+    header = f"  {'Page':<16}{'Req':>8}{'Err %':>8}{'Req/s':>8}" + ''.join(
+        f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}"
+    print(header)
+    print('  ' + '-' * (len(header) - 2))
+    rows = list(report['by_path'].items()) + [('TOTAL', report['overall'])]
+    for path, s in rows:
+        print(f"  {path:<16}{s['requests']:>8}{s['error_rate_pct']:>8.1f}{s['throughput_rps']:>8.1f}"
+              + ''.join(f"{s[f'p{p}_ms']:>9.0f}" for p in PERCENTILES) + f"{s['max_ms']:>9.0f}")
+    print("  (latences en ms)")
+
+
+# ============================================================================
+# Local server
+# ============================================================================
+
+def serve(port: int, threads: int) -> None:
+    """Runs the application as ``standalone.py`` does (waitress, else werkzeug)."""
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(PROJECT_ROOT, 'data', 'mes4.db')}")
+    from app import create_app
+    app = create_app()
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("  waitress absent : serveur de developpement werkzeug (threaded)")
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        app.run(host='127.0.0.1', port=port, threaded=True)
+        return
+    waitress_serve(app, host='127.0.0.1', port=port, threads=threads, _quiet=True)
+
+
+def _start_server(port: int, threads: int) -> subprocess.Popen:
+    """Starts ``serve`` in a child process and waits until it answers.
+
+    Server output goes to ``SERVER_LOG`` to keep the report readable.
+    """
+    log = open(SERVER_LOG, 'w', encoding='utf-8')
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', str(port),
+         '--server-threads', str(threads)],
+        cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    print(f"  Serveur local demarre (journal : {SERVER_LOG})")
+    url = f'http://127.0.0.1:{port}/login'
+    for _ in range(120):
+        if proc.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrete au demarrage")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("Le serveur ne repond pas")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=DEFAULT_URL, help="server base URL")
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS, help="concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SEC, help="run length (s)")
+    parser.add_argument('--ramp-up', type=float, default=5.0, help="time to start all users (s)")
+    parser.add_argument('--think-time', type=float, default=DEFAULT_THINK_TIME_SEC,
+                        help="mean pause between two requests of a user (s, 0 = none)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the report to this JSON file")
+    parser.add_argument('--start-server', action='store_true',
+                        help="start the application locally (port taken from --url)")
+    parser.add_argument('--server-threads', type=int, default=4,
+                        help="waitress worker threads (waitress default: 4)")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.server_threads)
+        return 0
+
+    base_url = args.url.rstrip('/')
+    server = None
+    if args.start_server:
+        port = urllib.parse.urlparse(base_url).port or 5000
+        server = _start_server(port, args.server_threads)
+
+    usernames = sorted(USERS)
+    results: list = []
+    lock = threading.Lock()
+    print(f"\n  Test de charge : {args.users} utilisateurs, {args.duration:.0f} s, {base_url}\n")
+
+    try:
+        start = time.time()
+        deadline = start + args.ramp_up + args.duration
+        threads = []
+        for i in range(args.users):
+            thread = threading.Thread(
+                target=virtual_user,
+                args=(base_url, usernames[i % len(usernames)], deadline, args.think_time,
+                      results, lock, args.seed + i),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+            if args.users > 1:
+                time.sleep(args.ramp_up / args.users)
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = summarize(results, elapsed)
+    report.update(users=args.users, think_time_sec=args.think_time, url=base_url)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    return 1 if report['overall']['requests'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,34 @@
 """Fixtures de test pour T'ELEFAN MES 4.0."""
 
+import os
+from contextlib import contextmanager
+
 import pytest
-from app import create_app, db as _db
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Pas de prechauffage des KPIs en arriere-plan : la BDD de test en memoire
+# (connexion unique) est remplie par les fixtures
+os.environ['STARTUP_WARMUP'] = '0'
+
+from app import create_app, db as _db  # noqa: E402
+
+# Echelles du jeu de donnees pour les budgets de requetes SQL
+SEED_SCALES = (1, 10)
 
 
 @pytest.fixture(scope='session')
-def app():
+def app(tmp_path_factory):
     """Cree une app Flask de test avec SQLite en memoire."""
-    import os
     os.environ['DATABASE_URL'] = 'sqlite://'
     os.environ['SECRET_KEY'] = 'test-secret-key'
 
     app = create_app()
+
+    # Fichiers generes (exports, cache) dans un dossier temporaire de test
+    from app import jobs, report_cache
+    jobs.EXPORT_DIR = str(tmp_path_factory.mktemp('exports'))
+    report_cache.REPORT_CACHE_DIR = str(tmp_path_factory.mktemp('report_cache'))
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
     app.config['WTF_CSRF_ENABLED'] = False
@@ -26,6 +43,56 @@ def app():
         _db.drop_all()
 
 
+@pytest.fixture(scope='session')
+def scaled_apps(app):  # noqa: ARG001 - garantit la configuration de test
+    """Apps de test independantes, seedees a chaque echelle de ``SEED_SCALES``.
+
+    Returns:
+        Dictionnaire ``{echelle: app}``.
+    """
+    apps = {}
+    for scale in SEED_SCALES:
+        scaled = create_app()
+        # Pas de TESTING : une erreur de rendu donne un 500 sans masquer
+        # les requetes SQL deja executees par la route
+        with scaled.app_context():
+            _db.create_all()
+            _seed_test_data(_db)
+            _seed_scaled_data(_db, scale)
+        apps[scale] = scaled
+
+    yield apps
+
+    for scaled in apps.values():
+        with scaled.app_context():
+            _db.drop_all()
+
+
+@pytest.fixture
+def count_queries():
+    """Compte les requetes SQL envoyees au driver dans un bloc ``with``.
+
+    Usage::
+
+        with count_queries() as statements:
+            services.calculate_oee()
+        assert len(statements) <= 3
+    """
+    @contextmanager
+    def _count():
+        statements = []
+
+        def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', _before)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, 'before_cursor_execute', _before)
+    return _count
+
+
 @pytest.fixture
 def client(app):
     """Client HTTP de test."""
@@ -161,3 +228,28 @@ def _seed_test_data(db):
         ))
 
     db.session.commit()
+
+
+def _seed_scaled_data(db, scale):
+    """Duplique les series temporelles du seed ``scale - 1`` fois.
+
+    Chaque copie est decalee d'un jour ; les numeros d'ordre sont decales
+    de 100 par copie. Les tables de reference (machines, operations,
+    buffers) ne sont pas dupliquees.
+    """
+    from datetime import datetime, timedelta
+    from app.models import MachineReport, Order, OrderPosition, PartsReport, Step
+
+    for model in (Order, OrderPosition, Step, MachineReport, PartsReport):
+        columns = [c.name for c in model.__table__.columns]
+        rows = [{name: getattr(obj, name) for name in columns} for obj in model.query.all()]
+        for copy in range(1, scale):
+            for row in rows:
+                clone = dict(row)
+                for name, value in clone.items():
+                    if isinstance(value, datetime):
+                        clone[name] = value + timedelta(days=copy)
+                if 'ONo' in clone:
+                    clone['ONo'] += 100 * copy
+                db.session.add(model(**clone))
+    db.session.commit()
@@ -0,0 +1,100 @@
+"""Tests de la jointure temporelle telemetrie AGV x evenements MES."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import agv_correlation, robotino
+
+
+@pytest.fixture
+def telemetry(tmp_path, monkeypatch):
+    """Telemetrie toutes les 2 s (secondes impaires) de 10:00 a 12:40 le 15/03/2025.
+
+    Les evenements du jeu de test MES tombent sur des secondes paires : chacun
+    est a 1 s de l'echantillon le plus proche.
+
+    L'AGV roule (0,5 m/s) pendant les minutes paires et est immobile pendant
+    les minutes impaires ; la batterie est faible apres 11:30.
+    """
+    monkeypatch.setattr(robotino, 'ROBOTINO_STORE_DIR', str(tmp_path / 'store'))
+    robotino._load_segment.cache_clear()
+    start = datetime(2025, 3, 15, 10, 0)
+    rows = ['timestamp,odometry_x,odometry_y,odometry_vx,odometry_vy,power_voltage,power_batteryLow\n']
+    for i in range(1, 160 * 60, 2):
+        ts = start + timedelta(seconds=i)
+        vx = 0.5 if (i // 60) % 2 == 0 else 0.0
+        rows.append(f'{ts.isoformat()},{i / 100},1.0,{vx},0,{24 - i / 10000},{ts.hour * 60 + ts.minute >= 690}\n')
+    path = tmp_path / 'agv.csv'
+    path.write_text(''.join(rows), encoding='utf-8')
+    robotino.ingest_csv(str(path))
+    return path
+
+
+class TestAlign:
+    """Verifie la jointure as-of."""
+
+    def test_nearest_within_tolerance(self):
+        import pandas as pd
+        events = pd.DataFrame({'ts': [10_000_000, 20_000_000, 100_000_000],
+                               'station': [1, 1, 1], 'event': ['idle_start'] * 3, 'op': [-1] * 3})
+        samples = pd.DataFrame({'ts': [9_000_000, 12_000_000, 21_500_000], 'x': [1.0, 2.0, 3.0]})
+        merged = agv_correlation.align(events, samples, tolerance_sec=2)
+        assert merged['x'].tolist()[:2] == [1.0, 3.0]
+        assert merged['lag_sec'].tolist()[:2] == [-1.0, 1.5]
+        assert pd.isna(merged['x'].iloc[2])
+
+
+class TestCorrelate:
+    """Verifie la vue par station sur le jeu de test."""
+
+    def test_station_view(self, app, telemetry):
+        with app.app_context():
+            result = agv_correlation.correlate()
+        assert result['status'] == 'normal'
+        (station,) = result['stations']
+        assert station['station'] == 1 and station['name'] == 'Machine_1'
+        # Transitions Busy (motif idle, busy, busy) + 5 etapes buffer x 2
+        assert station['events'] == result['events'] == 14 + 10
+        assert station['matched'] == station['events']
+        assert station['idle_starts'] == 7
+        assert station['idle_while_agv_moving'] + station['idle_while_agv_stopped'] == 7
+        assert station['buffer_ops'] == 10
+        assert station['battery_low_events'] > 0
+
+    def test_moving_classification(self, app, telemetry):
+        with app.app_context():
+            rows = agv_correlation.correlate(station=1)['event_rows']
+        # 10:00 (minute paire) : l'AGV roule
+        first = rows[0]
+        assert first['event'] == 'idle_start' and first['agv_speed'] == 0.5
+        assert all(r['lag_sec'] is not None and abs(r['lag_sec']) == 1 for r in rows)
+
+    def test_unmatched_outside_tolerance(self, app, telemetry):
+        with app.app_context():
+            result = agv_correlation.correlate(tolerance_sec=0.5)
+        assert result['events'] > 0 and result['matched'] == 0
+        assert result['stations'][0]['mean_voltage'] is None
+
+    def test_unavailable_without_telemetry(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(robotino, 'ROBOTINO_STORE_DIR', str(tmp_path / 'empty'))
+        with app.app_context():
+            assert agv_correlation.correlate()['status'] == 'unavailable'
+
+    def test_api(self, auth_client, telemetry):
+        body = auth_client.get('/api/agv/correlation?station=1&tolerance=3').get_json()
+        assert body['stations'][0]['station'] == 1
+        assert body['event_rows']
+        assert auth_client.get('/api/agv/correlation?tolerance=-1').status_code == 400
+
+    def test_api_timezone_aware_bounds(self, auth_client, telemetry):
+        from datetime import timezone
+        naive = auth_client.get('/api/agv/correlation?start=2025-03-15T10:00:00&end=2025-03-15T12:00:00').get_json()
+        start, end = (datetime(2025, 3, 15, h).astimezone().astimezone(timezone.utc).isoformat() for h in (10, 12))
+        resp = auth_client.get('/api/agv/correlation', query_string={'start': start, 'end': end})
+        assert resp.status_code == 200
+        assert resp.get_json()['window'] == naive['window']
+        assert resp.get_json()['events'] == naive['events'] > 0
+
+    def test_api_requires_login(self, client):
+        assert client.get('/api/agv/correlation').status_code == 302
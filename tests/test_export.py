@@ -0,0 +1,243 @@
+"""Tests des exports Excel et PDF."""
+
+import io
+import os
+
+import pytest
+
+
+class TestExcelExport:
+    """Verifie le classeur Excel ecrit en flux."""
+
+    def test_excel_has_five_sheets(self, auth_client):
+        from openpyxl import load_workbook
+        resp = auth_client.get('/export/excel')
+        assert resp.status_code == 200
+        wb = load_workbook(io.BytesIO(resp.data))
+        assert wb.sheetnames == ['Performance', 'Qualite', 'Delai', 'Energie', 'Stock']
+
+    def test_excel_content_and_layout(self, auth_client):
+        """Les valeurs gardent leur position et les largeurs sont calculees."""
+        from openpyxl import load_workbook
+        resp = auth_client.get('/export/excel')
+        ws = load_workbook(io.BytesIO(resp.data))['Performance']
+        assert ws.cell(row=4, column=1).value == 'OEE Global'
+        assert ws.cell(row=12, column=1).value == 'Machine'
+        assert ws.cell(row=12, column=1).font.bold
+        assert ws.cell(row=13, column=1).value == 'Machine_1'
+        # Le titre depasse la largeur max -> colonne A plafonnee
+        assert ws.column_dimensions['A'].width == 40
+
+    def test_sheet_widths_from_rows(self):
+        from app.export import _ExcelSheet
+
+        def rows():
+            yield 'data', ('abc', 12345, None)
+            yield 'data', ('a', 1, '')
+            yield 'plain', ()
+        sheet = _ExcelSheet('Test', 'perf', rows)
+        assert sheet.widths() == {1: 3, 2: 5}
+
+    def test_rows_are_streamed(self, monkeypatch):
+        """Les lignes sont ecrites une par une, sans etre accumulees."""
+        from openpyxl import load_workbook
+        from app import export
+        produced = []
+
+        def rows():
+            for i in range(1000):
+                produced.append(i)
+                yield 'data', (f'ligne {i}', i)
+        monkeypatch.setattr(export, '_build_excel_sheets',
+                            lambda *args: [export._ExcelSheet('Test', 'perf', rows)])
+        buf = io.BytesIO()
+        export._write_excel({}, '', '', buf)
+        # Un parcours pour les largeurs, un pour l'ecriture
+        assert len(produced) == 2000
+        ws = load_workbook(io.BytesIO(buf.getvalue()))['Test']
+        assert ws.max_row == 1000
+        assert ws.column_dimensions['A'].width == len('ligne 999') + 4
+
+def _wait_for_job(client, status_url, timeout=10):
+    """Interroge le statut d'un job jusqu'a sa fin."""
+    import time
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('job non termine')
+
+
+class TestExportJobs:
+    """Verifie la file d'attente des exports asynchrones."""
+
+    def test_job_excel_roundtrip(self, auth_client, tmp_path, monkeypatch):
+        from openpyxl import load_workbook
+        from app import jobs
+        monkeypatch.setattr(jobs, 'EXPORT_DIR', str(tmp_path))
+        resp = auth_client.post('/export/jobs', data={'format': 'excel', 'year': '2025'})
+        assert resp.status_code == 202
+        job = _wait_for_job(auth_client, resp.get_json()['status_url'])
+        assert job['status'] == 'done'
+        download = auth_client.get(job['download_url'])
+        assert download.status_code == 200
+        assert download.headers['Content-Disposition'].endswith('.xlsx')
+        ws = load_workbook(io.BytesIO(download.data))['Performance']
+        assert ws.cell(row=2, column=1).value == 'Filtre: Annee: 2025'
+
+    def test_job_pdf_done(self, auth_client, tmp_path, monkeypatch):
+        from app import jobs
+        monkeypatch.setattr(jobs, 'EXPORT_DIR', str(tmp_path))
+        resp = auth_client.post('/export/jobs', data={'format': 'pdf'})
+        job = _wait_for_job(auth_client, resp.get_json()['status_url'])
+        assert job['status'] == 'done'
+        assert auth_client.get(job['download_url']).status_code == 200
+
+    def test_job_unknown_format(self, auth_client):
+        resp = auth_client.post('/export/jobs', data={'format': 'docx'})
+        assert resp.status_code == 400
+
+    def test_job_unknown_id(self, auth_client):
+        assert auth_client.get('/export/jobs/inconnu').status_code == 404
+        assert auth_client.get('/export/jobs/inconnu/download').status_code == 404
+
+    def test_job_forbidden_employe(self, employe_client):
+        resp = employe_client.post('/export/jobs', data={'format': 'excel'})
+        assert resp.status_code == 302
+
+    def test_queue_full(self, auth_client, monkeypatch):
+        from app import jobs
+        monkeypatch.setattr(jobs, 'EXPORT_JOB_MAX_PENDING', 0)
+        resp = auth_client.post('/export/jobs', data={'format': 'excel'})
+        assert resp.status_code == 503
+
+    def test_purge_expired(self, tmp_path, monkeypatch):
+        import time
+        from app import jobs
+        monkeypatch.setattr(jobs, 'EXPORT_DIR', str(tmp_path))
+        path = tmp_path / 'ancien'
+        path.write_bytes(b'x')
+        job = {'id': 'ancien', 'owner': 'admin', 'status': 'done',
+               'created': 0, 'finished': time.time() - jobs.EXPORT_JOB_TTL_SEC - 1,
+               'path': str(path), 'download_name': 'a.xlsx', 'mimetype': None, 'error': None}
+        monkeypatch.setitem(jobs._jobs, 'ancien', job)
+        jobs.purge_expired()
+        assert jobs.get_job('ancien') is None
+        assert not path.exists()
+
+
+class TestReportCache:
+    """Verifie le cache disque des rapports adresse par le contenu."""
+
+    def test_key_depends_on_content(self):
+        from app.report_cache import cache_key
+        kpis = {'oee': {'value': 70.0}}
+        assert cache_key(kpis, 'Toutes', 'pdf') == cache_key({'oee': {'value': 70.0}}, 'Toutes', 'pdf')
+        assert cache_key(kpis, 'Toutes', 'pdf') != cache_key(kpis, 'Toutes', 'excel')
+        assert cache_key(kpis, 'Toutes', 'pdf') != cache_key(kpis, 'Annee: 2025', 'pdf')
+        assert cache_key(kpis, 'Toutes', 'pdf') != cache_key({'oee': {'value': 71.0}}, 'Toutes', 'pdf')
+
+    def test_repeat_export_served_from_cache(self, auth_client, monkeypatch):
+        from app import export
+        calls = []
+        original = export._render_pdf
+        monkeypatch.setattr(export, '_render_pdf', lambda *a: calls.append(1) or original(*a))
+        first = auth_client.get('/export/pdf?year=2031')
+        second = auth_client.get('/export/pdf?year=2031')
+        assert first.status_code == second.status_code == 200
+        assert first.data == second.data
+        assert len(calls) == 1
+
+    def test_eviction_bounded_size(self, tmp_path, monkeypatch):
+        import os
+        import time
+        from app import report_cache
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path))
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_MAX_BYTES', 250)
+        for key in ('a', 'b', 'c'):
+            with report_cache.put(key * 64, 'pdf', lambda fh: fh.write(b'x' * 100)) as written:
+                if key == 'a':
+                    os.utime(written.name, (time.time() - 60, time.time() - 60))
+        assert report_cache.open_report('a' * 64) is None
+        for key in ('b', 'c'):
+            fh, _ = report_cache.open_report(key * 64)
+            fh.close()
+
+    def test_eviction_skips_reports_in_use(self, tmp_path, monkeypatch):
+        import os
+        import time
+        from app import report_cache
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path))
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_MAX_BYTES', 250)
+        for key, age in (('a', 120), ('b', 60)):
+            with report_cache.put(key * 64, 'pdf', lambda fh: fh.write(b'x' * 100)) as written:
+                os.utime(written.name, (time.time() - age, time.time() - age))
+        in_use = report_cache._path('a' * 64, 'pdf')
+        remove = os.remove
+
+        def locked_remove(path):
+            # Sous Windows, un fichier en cours d'envoi ne peut pas etre supprime
+            if path == in_use:
+                raise PermissionError(path)
+            remove(path)
+        monkeypatch.setattr(os, 'remove', locked_remove)
+        report_cache.put('c' * 64, 'pdf', lambda fh: fh.write(b'x' * 100)).close()
+        # 'a' n'a pas pu etre supprime : 'b' est evince pour tenir la limite
+        assert os.path.exists(in_use)
+        assert report_cache.open_report('b' * 64) is None
+
+    def test_put_serves_cached_report_when_replace_denied(self, tmp_path, monkeypatch):
+        import os
+        from app import report_cache
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path))
+        first = report_cache.put('g' * 64, 'pdf', lambda fh: fh.write(b'contenu'))
+
+        def denied(src, dst):
+            raise PermissionError(dst)
+        # Sous Windows, le rapport ouvert par le premier envoi ne peut pas etre remplace
+        monkeypatch.setattr(os, 'replace', denied)
+        with first, report_cache.put('g' * 64, 'pdf', lambda fh: fh.write(b'contenu')) as second:
+            assert second.read() == b'contenu'
+        assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+    def test_open_report_checks_candidate_paths_only(self, tmp_path, monkeypatch):
+        import os
+        from app import report_cache
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path))
+        report_cache.put('d' * 64, 'html', lambda fh: fh.write(b'<html>')).close()
+
+        def no_listdir(path):
+            raise AssertionError('listdir appele')
+        monkeypatch.setattr(os, 'listdir', no_listdir)
+        assert report_cache.open_report('e' * 64) is None
+        fh, extension = report_cache.open_report('d' * 64)
+        with fh:
+            assert extension == 'html'
+
+    @pytest.mark.skipif(os.name == 'nt', reason="un fichier ouvert ne peut pas etre supprime sous Windows")
+    def test_open_report_survives_eviction(self, tmp_path, monkeypatch):
+        import os
+        from app import report_cache
+        monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path))
+        report_cache.put('f' * 64, 'pdf', lambda fh: fh.write(b'contenu')).close()
+        fh, _ = report_cache.open_report('f' * 64)
+        # Eviction concurrente entre l'ouverture et la lecture
+        report_cache._remove_file(fh.name)
+        with fh:
+            assert fh.read() == b'contenu'
+        assert not os.path.exists(fh.name)
+        assert report_cache.open_report('f' * 64) is None
+
+    def test_evicted_report_is_rendered_again(self, auth_client, monkeypatch):
+        import os
+        from app import export, report_cache
+        calls = []
+        original = export._render_pdf
+        monkeypatch.setattr(export, '_render_pdf', lambda *a: calls.append(1) or original(*a))
+        assert auth_client.get('/export/pdf?year=2032').status_code == 200
+        for name in os.listdir(report_cache.REPORT_CACHE_DIR):
+            report_cache._remove_file(os.path.join(report_cache.REPORT_CACHE_DIR, name))
+        assert auth_client.get('/export/pdf?year=2032').status_code == 200
+        assert len(calls) == 2
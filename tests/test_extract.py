@@ -0,0 +1,41 @@
+"""Tests de l'extraction brute en flux (CSV / NDJSON gzip)."""
+
+import gzip
+import json
+
+
+class TestExtract:
+    """Verifie l'endpoint /extract/<table>."""
+
+    def test_extract_csv_window(self, auth_client):
+        resp = auth_client.get(
+            '/extract/tblmachinereport?start=2025-03-15T10:00&end=2025-03-15T10:30'
+        )
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/gzip'
+        lines = gzip.decompress(resp.data).decode('utf-8').splitlines()
+        assert lines[0].startswith('ResourceID,TimeStamp,ID')
+        # Seed : un evenement toutes les 5 min a partir de 10:00 -> 6 lignes
+        assert len(lines) == 1 + 6
+
+    def test_extract_ndjson(self, auth_client):
+        resp = auth_client.get('/extract/tblfinstep?format=ndjson')
+        assert resp.status_code == 200
+        rows = [json.loads(line) for line in gzip.decompress(resp.data).splitlines()]
+        assert len(rows) == 15
+        assert rows[0]['Start'] == '2025-03-15T10:10:00'
+
+    def test_extract_chunks_bounded(self, app):
+        with app.app_context():
+            from app import extract
+            chunks = list(extract.iter_rows('tblmachinereport', chunk_rows=7))
+            assert [len(rows) for _, rows in chunks] == [7, 7, 6]
+
+    def test_extract_unknown_table(self, auth_client):
+        assert auth_client.get('/extract/tblresource').status_code == 404
+
+    def test_extract_invalid_date(self, auth_client):
+        assert auth_client.get('/extract/tblfinstep?start=hier').status_code == 400
+
+    def test_extract_forbidden_employe(self, employe_client):
+        assert employe_client.get('/extract/tblfinstep').status_code == 302
@@ -0,0 +1,246 @@
+"""Tests du suivi en direct (lecture incrementale des tables MES)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import live
+
+
+@pytest.fixture
+def tailer(app):
+    """Cumuls de l'application de test, remis a zero avant et apres chaque test."""
+    from app import machine_timeline
+
+    with app.app_context():
+        live.reset()
+        yield live
+        live.reset()
+        # Les lignes ajoutees puis supprimees par les tests ne doivent pas rester indexees
+        machine_timeline.reset()
+
+
+class TestLive:
+    """Verifie les cumuls, les watermarks et /api/live."""
+
+    def test_snapshot_matches_services(self, app, tailer):
+        with app.app_context():
+            from app import services
+            tailer.poll()
+            oee = services.calculate_oee()
+            utilization = services.calculate_utilization()
+            throughput = services.calculate_throughput()
+            non_conformity = services.calculate_non_conformity()
+        snap = tailer.snapshot()
+        for key in ('value', 'availability', 'performance', 'quality'):
+            assert snap['oee'][key] == oee[key]
+        assert snap['utilization']['overall'] == utilization['overall']
+        assert snap['throughput']['value'] == throughput['value']
+        assert snap['non_conformity']['value'] == non_conformity['value']
+        assert snap['non_conformity']['total_errors'] == non_conformity['total_errors']
+
+    def test_second_poll_reads_nothing(self, app, tailer):
+        with app.app_context():
+            assert tailer.poll() > 0
+            before = tailer.snapshot()
+            assert tailer.poll() == 0
+        after = tailer.snapshot()
+        assert after['oee'] == before['oee']
+        assert after['throughput'] == before['throughput']
+
+    def test_new_rows_are_folded(self, app, tailer):
+        from app import db
+        from app.models import MachineReport, PartsReport
+
+        with app.app_context():
+            tailer.poll()
+            busy, total = tailer._state()['machines'][1]
+            last_ts, last_busy = tailer._state()['open'][1]
+            parts = tailer._state()['parts']
+
+            # Deux evenements a la meme seconde, lus en deux fois
+            at = datetime(2025, 3, 15, 13, 0, 0)
+            added = [
+                MachineReport(ResourceID=1, TimeStamp=at, ID=9001, Busy=True),
+                PartsReport(ResourceID=1, ID=9001, TimeStamp=at, ErrorID=7),
+            ]
+            db.session.add_all(added)
+            db.session.commit()
+            try:
+                assert tailer.poll() == 2
+                same_second = MachineReport(ResourceID=1, TimeStamp=at, ID=9002, Busy=False)
+                db.session.add(same_second)
+                db.session.commit()
+                added.append(same_second)
+                assert tailer.poll() == 1
+                assert tailer.poll() == 0
+
+                gap = int((at - datetime(1970, 1, 1)).total_seconds()) - last_ts
+                assert tailer._state()['machines'][1] == [busy + (gap if last_busy else 0), total + gap]
+                assert tailer._state()['open'][1][1] is False
+                assert tailer._state()['parts'] == parts + 1
+            finally:
+                for row in added:
+                    db.session.delete(row)
+                db.session.commit()
+
+    def test_long_gap_is_ignored(self, app, tailer):
+        from app import db
+        from app.models import MachineReport
+
+        with app.app_context():
+            tailer.poll()
+            before = list(tailer._state()['machines'][1])
+            row = MachineReport(ResourceID=1, TimeStamp=datetime(2025, 3, 15) + timedelta(days=3),
+                                ID=9003, Busy=True)
+            db.session.add(row)
+            db.session.commit()
+            try:
+                assert tailer.poll() == 1
+                assert tailer._state()['machines'][1] == before
+            finally:
+                db.session.delete(row)
+                db.session.commit()
+
+    def test_snapshot_runs_no_query(self, app, tailer, count_queries):
+        with app.app_context():
+            tailer.poll()
+            with count_queries() as statements:
+                tailer.snapshot()
+        assert statements == []
+
+    def test_api_live(self, auth_client, tailer):
+        resp = auth_client.get('/api/live?refresh=1')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert {'oee', 'utilization', 'throughput', 'non_conformity', 'energy'} <= set(body)
+        assert body['rows'] > 0
+
+    def test_state_is_per_app(self, app, tailer):
+        from app import create_app
+
+        tailer.poll()
+        other = create_app()
+        with other.app_context():
+            assert live._state()['rows'] == 0
+        assert app.extensions['live']['rows'] > 0
+
+    def test_api_live_requires_login(self, client):
+        assert client.get('/api/live').status_code == 302
+
+
+class TestRollingWindows:
+    """Verifie l'anneau de seaux par minute et /api/kpis?window=."""
+
+    def test_24h_matches_services(self, app, tailer):
+        with app.app_context():
+            from app import services
+            tailer.poll()
+            oee = services.calculate_oee()
+            cycle_time = services.calculate_cycle_time()
+            non_conformity = services.calculate_non_conformity()
+            machines = services._stream_machine_time()['by_machine'].values()
+        day = tailer.rolling_kpis('24h')
+        # Etats clos : memes durees que services ; l'etat ouvert s'y ajoute
+        sums = tailer._state()['window_sums']['24h']
+        busy, total = sum(m[0] for m in machines), sum(m[1] for m in machines)
+        assert sums[tailer._FIELD['busy_sec']] == busy
+        assert sums[tailer._FIELD['total_sec']] == total
+        open_busy, open_total = tailer._open_seconds(tailer._state(), 0)
+        assert open_total > 0
+        assert day['oee']['availability'] == round((busy + open_busy) / (total + open_total) * 100, 1)
+        for key in ('performance', 'quality'):
+            assert day['oee'][key] == oee[key]
+        assert day['cycle_time']['value'] == cycle_time['value']
+        assert day['cycle_time']['count'] == cycle_time['count']
+        assert day['non_conformity']['value'] == non_conformity['value']
+
+    def test_window_slides(self, tailer):
+        import numpy as np
+
+        base = 1_000_000 * 60
+        tailer._add_to_ring(np.array([base]), pieces=np.array([1]))
+        tailer._add_to_ring(np.array([base + 61 * 60]), pieces=np.array([1]), piece_errors=np.array([1]))
+        assert tailer.rolling_kpis('1h')['oee']['quality'] == 0
+        assert tailer.rolling_kpis('8h')['throughput']['pieces'] == 2
+        assert tailer.rolling_kpis('8h')['oee']['quality'] == 50
+
+        # Contribution tardive mais encore dans l'anneau
+        tailer._add_to_ring(np.array([base + 30 * 60]), pieces=np.array([1]))
+        assert tailer.rolling_kpis('1h')['throughput']['pieces'] == 2
+
+        tailer._advance_ring(base // 60 + 8 * 60 + 30)
+        assert tailer.rolling_kpis('8h')['throughput']['pieces'] == 1
+        assert tailer.rolling_kpis('24h')['throughput']['pieces'] == 3
+
+        # Saut plus long que l'anneau : toutes les fenetres sont videes
+        tailer._advance_ring(base // 60 + 3 * tailer.RING_MINUTES)
+        assert tailer.rolling_kpis('24h')['throughput']['pieces'] == 0
+        assert not tailer._state()['ring'].any()
+
+    def test_states_spread_over_minutes(self, tailer):
+        import numpy as np
+
+        base = 1_000_000 * 60
+        # Busy de base+30 s a base+150 s : 30 s, 60 s puis 30 s sur trois minutes
+        tailer._add_spans_to_ring(np.array([base + 30]), np.array([base + 150]),
+                                  busy_sec=np.array([True]), total_sec=np.array([True]))
+        ring = tailer._state()['ring']
+        slots = [m % tailer.RING_MINUTES for m in range(base // 60, base // 60 + 3)]
+        assert ring[slots, tailer._FIELD['busy_sec']].tolist() == [30, 60, 30]
+        assert tailer.rolling_kpis('1h')['oee']['availability'] == 100
+
+        # Etat plus long que l'anneau : seule la partie dans l'anneau est comptee
+        start = base + 200
+        end = start + (tailer.RING_MINUTES + 30) * 60
+        tailer._add_spans_to_ring(np.array([start]), np.array([end]),
+                                  busy_sec=np.array([False]), total_sec=np.array([True]))
+        sums = tailer._state()['window_sums']
+        head = tailer._state()['ring_head']
+        assert sums['24h'][tailer._FIELD['total_sec']] == end - (head - tailer.RING_MINUTES + 1) * 60
+        assert sums['1h'][tailer._FIELD['total_sec']] == end - (head - 59) * 60
+
+    def test_open_state_counted_once(self, app, tailer):
+        from app import db
+        from app.models import MachineReport
+
+        with app.app_context():
+            tailer.poll()
+            opened, busy = tailer._state()['open'][1]
+            last = tailer._state()['ring_last']
+            before = tailer.rolling_kpis('24h')['oee']['availability']
+            sums = tailer._state()['window_sums']['24h'].copy()
+            # L'etat ouvert se ferme au dernier horodatage lu : meme disponibilite
+            row = MachineReport(ResourceID=1, TimeStamp=datetime(1970, 1, 1) + timedelta(seconds=last),
+                                ID=9004, Busy=not busy)
+            db.session.add(row)
+            db.session.commit()
+            try:
+                assert tailer.poll() == 1
+                after = tailer._state()['window_sums']['24h']
+                assert after[tailer._FIELD['total_sec']] - sums[tailer._FIELD['total_sec']] == last - opened
+                assert tailer._open_seconds(tailer._state(), 0) == (0, 0)
+                assert tailer.rolling_kpis('24h')['oee']['availability'] == before
+            finally:
+                db.session.delete(row)
+                db.session.commit()
+
+    def test_sums_match_ring(self, app, tailer):
+        with app.app_context():
+            tailer.poll()
+        ring, head = tailer._state()['ring'], tailer._state()['ring_head']
+        for name, width in tailer.ROLLING_WINDOWS.items():
+            slots = [m % tailer.RING_MINUTES for m in range(head - width + 1, head + 1)]
+            assert (ring[slots].sum(axis=0) == tailer._state()['window_sums'][name]).all()
+
+    def test_unknown_window(self, tailer):
+        with pytest.raises(ValueError):
+            tailer.rolling_kpis('2h')
+
+    def test_api_kpis_window(self, auth_client, tailer):
+        resp = auth_client.get('/api/kpis?window=1h')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body['window'] == '1h'
+        assert {'oee', 'throughput', 'cycle_time', 'non_conformity'} <= set(body)
+        assert auth_client.get('/api/kpis?window=2h').status_code == 400
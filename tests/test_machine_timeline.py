@@ -0,0 +1,116 @@
+"""Tests de l'index des timelines d'etat machine."""
+
+from datetime import datetime
+
+import pytest
+
+from app import machine_timeline
+
+
+def _brute_force(app, t0, t1):
+    """Temps Busy / total de la machine 1 sur [t0, t1[ par parcours des durees."""
+    from app import services
+
+    with app.app_context():
+        frame = services._get_machine_durations()
+    frame = frame[frame['ResourceID'] == 1]
+    start = frame['TimeStamp'].to_numpy()
+    end = start + frame['Duration'].to_numpy()
+    overlap = (end.clip(None, t1) - start.clip(t0, None)).clip(0, None)
+    return int((overlap * frame['Busy'].to_numpy()).sum()), int(overlap.sum())
+
+
+class TestMachineTimeline:
+    """Verifie les requetes par fenetre, les seaux et l'ajout incremental."""
+
+    def test_all_time_matches_durations(self, app):
+        with app.app_context():
+            totals = machine_timeline.window_totals()
+        busy, total = _brute_force(app, 0, 2**62)
+        assert totals[1]['busy'] == busy
+        assert totals[1]['total'] == total
+
+    @pytest.mark.parametrize('offsets', [(0, 600), (150, 1_234), (-3_600, 2_000), (3_000, 99_999)])
+    def test_window_clips_intervals(self, app, offsets):
+        with app.app_context():
+            first, _ = machine_timeline.span(machine_timeline.refresh())
+            t0, t1 = first + offsets[0], first + offsets[1]
+            totals = machine_timeline.window_totals(t0, t1).get(1, {'busy': 0, 'total': 0})
+        assert (totals['busy'], totals['total']) == _brute_force(app, t0, t1)
+
+    def test_buckets_partition_the_window(self, app):
+        with app.app_context():
+            result = machine_timeline.timeline(machine=1, buckets=7)
+            (totals,) = machine_timeline.window_totals().values()
+        assert len(result['buckets']) == 7
+        assert sum(b['busy_sec'] for b in result['buckets']) == totals['busy']
+        assert sum(b['total_sec'] for b in result['buckets']) == totals['total']
+
+    def test_append_grows_amortized(self):
+        import numpy as np
+
+        machine = machine_timeline._empty_machine()
+        buffers_seen = set()
+        for k in range(1_000):
+            machine_timeline._append(machine, np.array([2 * k]), np.array([2 * k + 1]),
+                                     np.array([k % 2 == 0]), np.array([False]))
+            buffers_seen.add(id(machine['buffers']['start']))
+        # Capacite doublee : ~log2(1000) reallocations, pas une copie par ajout
+        assert len(buffers_seen) <= 8
+        assert len(machine['buffers']['start']) == 1_024
+        assert machine['start'].tolist() == list(range(0, 2_000, 2))
+        assert machine['cum_total'][-1] == 1_000
+        assert machine['cum_busy'][-1] == 500
+        assert len(machine['cum_total']) == 1_001
+
+    def test_events_are_appended(self, app):
+        from app import db
+        from app.models import MachineReport
+
+        with app.app_context():
+            before = machine_timeline.window_totals()[1]
+            last_ts, last_busy, _ = machine_timeline.refresh()['open'][1]
+            row = MachineReport(ResourceID=1, TimeStamp=datetime(2025, 3, 15, 12, 0), ID=9101,
+                                Busy=False, ErrorL0=True, ErrorL2=False)
+            db.session.add(row)
+            db.session.commit()
+            try:
+                after = machine_timeline.window_totals()[1]
+                gap = int((row.TimeStamp - datetime(1970, 1, 1)).total_seconds()) - last_ts
+                assert after['total'] == before['total'] + gap
+                assert after['busy'] == before['busy'] + (gap if last_busy else 0)
+                assert machine_timeline.refresh()['open'][1][2] is True
+            finally:
+                db.session.delete(row)
+                db.session.commit()
+                machine_timeline.reset()
+
+    def test_invalid_arguments(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError):
+                machine_timeline.timeline(buckets=0)
+            with pytest.raises(ValueError):
+                machine_timeline.timeline(start=datetime(2025, 3, 15, 12), end=datetime(2025, 3, 15, 11))
+
+    def test_api_timeline(self, auth_client):
+        resp = auth_client.get('/api/machines/timeline?machine=1&buckets=4'
+                               '&start=2025-03-15T10:00:00&end=2025-03-15T12:00:00')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert len(body['buckets']) == 4
+        assert body['buckets'][0]['total_sec'] == 1_800
+        assert auth_client.get('/api/machines/timeline?buckets=0').status_code == 400
+
+    def test_api_timezone_aware_bounds(self, auth_client):
+        from datetime import timezone
+        naive = auth_client.get('/api/machines/timeline?machine=1&buckets=4'
+                                '&start=2025-03-15T10:00:00&end=2025-03-15T12:00:00').get_json()
+        start, end = (datetime(2025, 3, 15, h).astimezone().astimezone(timezone.utc).isoformat() for h in (10, 12))
+        resp = auth_client.get('/api/machines/timeline',
+                               query_string={'machine': 1, 'buckets': 4, 'start': start, 'end': end})
+        assert resp.status_code == 200
+        assert resp.get_json() == naive
+        assert auth_client.get('/api/machines/timeline?start=hier').status_code == 400
+
+    def test_api_requires_login(self, client):
+        assert client.get('/api/machines/timeline').status_code == 302
@@ -0,0 +1,61 @@
+"""Tests des metriques Prometheus (/metrics)."""
+
+from app import metrics
+
+
+class TestMetrics:
+    """Verifie l'instrumentation des KPIs et l'endpoint /metrics."""
+
+    def test_kpi_scope_counts_statements_and_rows(self, app):
+        metrics.reset()
+        with app.app_context():
+            from app import services
+            services.calculate_buffer_occupancy()
+        text = metrics.render()
+        assert 'telefan_kpi_duration_seconds_count{kpi="calculate_buffer_occupancy"} 1' in text
+        statements = [line for line in text.splitlines()
+                      if line.startswith('telefan_kpi_sql_statements_total{kpi="calculate_buffer_occupancy"}')]
+        assert statements and int(statements[0].rsplit(' ', 1)[1]) >= 1
+        assert 'telefan_kpi_rows_fetched_total{kpi="calculate_buffer_occupancy"}' in text
+
+    def test_machine_durations_timed(self, app):
+        metrics.reset()
+        with app.app_context():
+            from app import services
+            services.calculate_utilization()
+        assert 'telefan_section_duration_seconds_count{section="_stream_machine_time"} 1' in metrics.render()
+
+    def test_errors_counted(self):
+        metrics.reset()
+        from app.services import _safe_kpi
+
+        @_safe_kpi({'value': 0})
+        def calculate_broken():
+            raise RuntimeError('boom')
+
+        assert calculate_broken()['status'] == 'error'
+        assert 'telefan_kpi_errors_total{kpi="calculate_broken"} 1' in metrics.render()
+
+    def test_histogram_buckets_cumulative(self):
+        metrics.reset()
+        metrics._observe('telefan_kpi_duration_seconds', 'k', 0.03)
+        metrics._observe('telefan_kpi_duration_seconds', 'k', 3.0)
+        text = metrics.render()
+        assert 'telefan_kpi_duration_seconds_bucket{kpi="k",le="0.025"} 0' in text
+        assert 'telefan_kpi_duration_seconds_bucket{kpi="k",le="0.05"} 1' in text
+        assert 'telefan_kpi_duration_seconds_bucket{kpi="k",le="+Inf"} 2' in text
+
+    def test_endpoint_admin(self, auth_client):
+        resp = auth_client.get('/metrics')
+        assert resp.status_code == 200
+        assert resp.mimetype == 'text/plain'
+        assert b'# TYPE telefan_kpi_duration_seconds histogram' in resp.data
+
+    def test_endpoint_forbidden_employe(self, employe_client):
+        assert employe_client.get('/metrics').status_code == 403
+
+    def test_endpoint_token(self, client, monkeypatch):
+        monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'secret')
+        assert client.get('/metrics').status_code == 403
+        resp = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        assert resp.status_code == 200
@@ -0,0 +1,64 @@
+"""Tests du cube OEE machine x equipe x jour."""
+
+from datetime import date
+
+import pytest
+
+from app import oee_cube
+
+
+class TestOeeCube:
+    """Verifie la construction du cube, les agregations et /api/oee/cube."""
+
+    def test_total_matches_calculate_oee(self, app):
+        with app.app_context():
+            from app import services
+            oee = services.calculate_oee()
+            (total,) = oee_cube.rollup(oee_cube.build_cube(), by=())
+        assert total['oee'] == oee['value']
+        assert total['availability'] == oee['availability']
+        assert total['performance'] == oee['performance']
+        assert total['quality'] == oee['quality']
+
+    def test_rollup_is_additive(self, app):
+        with app.app_context():
+            cube = oee_cube.build_cube()
+        (total,) = oee_cube.rollup(cube, by=())
+        by_machine = oee_cube.rollup(cube, by=('machine',))
+        assert sum(c['total_sec'] for c in by_machine) == total['total_sec']
+        assert sum(c['busy_sec'] for c in by_machine) == total['busy_sec']
+
+    def test_drilldown_filters(self, app):
+        with app.app_context():
+            cube = oee_cube.build_cube()
+        # Seed : evenements du 15/03/2025 a partir de 10:00 (equipe du matin)
+        cells = oee_cube.rollup(cube, by=('machine', 'shift'), day=date(2025, 3, 15), shift='matin')
+        assert cells
+        assert all(c['shift'] == 'matin' for c in cells)
+        assert oee_cube.rollup(cube, by=(), day=date(2024, 1, 1)) == []
+
+    def test_night_shift_belongs_to_previous_day(self):
+        import numpy as np
+        # 2025-03-16 02:00 -> equipe de nuit du 15/03
+        epoch = np.array([int((date(2025, 3, 16) - date(1970, 1, 1)).days) * 86_400 + 2 * 3_600])
+        days, shifts = oee_cube._slice_keys(epoch)
+        assert int(days[0]) == (date(2025, 3, 15) - date(1970, 1, 1)).days
+        assert oee_cube.SHIFTS[int(shifts[0])][0] == 'nuit'
+
+    def test_unknown_dimension(self):
+        with pytest.raises(ValueError):
+            oee_cube.rollup({'machine_cells': {}, 'line_cells': {}}, by=('operator',))
+
+    def test_api_cube(self, auth_client):
+        resp = auth_client.get('/api/oee/cube?by=machine,shift&day=2025-03-15')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body['dimensions'] == ['machine', 'shift']
+        assert body['cells'] and {'machine', 'shift', 'oee'} <= set(body['cells'][0])
+
+    def test_api_cube_bad_request(self, auth_client):
+        assert auth_client.get('/api/oee/cube?shift=weekend').status_code == 400
+
+    def test_api_cube_requires_login(self, client):
+        resp = client.get('/api/oee/cube')
+        assert resp.status_code == 302
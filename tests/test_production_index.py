@@ -0,0 +1,94 @@
+"""Tests de l'index des etapes et des pieces finies."""
+
+from datetime import datetime
+
+import pytest
+
+from app import production_index
+
+
+class TestProductionIndex:
+    """Verifie les comptes par fenetre, les seaux et l'ajout incremental."""
+
+    def test_counts_match_queries(self, app):
+        from app.models import OrderPosition, Step
+
+        with app.app_context():
+            series = production_index.steps()
+            assert sum(len(ends) for ends in series.values()) == Step.query.filter(Step.End.isnot(None)).count()
+            assert len(series[(1, 100)]) == 10
+            ends = production_index.positions()
+            assert len(ends) == OrderPosition.query.filter(OrderPosition.End.isnot(None)).count()
+            assert (ends[1:] >= ends[:-1]).all()
+
+    def test_window_matches_time_window(self, app):
+        from app import services
+
+        start, end = datetime(2025, 3, 15, 10, 30), datetime(2025, 3, 15, 11, 50)
+        with app.app_context():
+            t0, t1 = production_index.window_bounds(start, end)
+            with services.time_window(start, end):
+                from app.models import Step
+                expected = services._in_window(Step.query.filter(Step.ResourceID == 1, Step.OpNo == 100),
+                                               Step.End).count()
+            assert int(production_index.count(production_index.steps()[(1, 100)], [t0, t1])[0]) == expected
+
+    def test_buckets_sum_to_totals(self, app):
+        with app.app_context():
+            result = production_index.buckets(datetime(2025, 3, 15), datetime(2025, 3, 16), 900)
+        assert len(result['buckets']) == 96
+        assert sum(b['steps'] for b in result['buckets']) == 15
+        # 10 etapes OpNo 100 a 500 mWs chacune
+        assert sum(b['wh'] for b in result['buckets']) == pytest.approx(5_000 / 3_600_000, abs=1e-5)
+
+    def test_rows_are_appended(self, app):
+        from app import db
+        from app.models import Step
+
+        with app.app_context():
+            before = len(production_index.steps()[(1, 100)])
+            row = Step(StepNo=99, ONo=1, OPos=1, WPNo=1, OpNo=100, ResourceID=1,
+                       Start=datetime(2025, 3, 15, 13, 0), End=datetime(2025, 3, 15, 13, 1))
+            db.session.add(row)
+            db.session.commit()
+            try:
+                ends = production_index.steps()[(1, 100)]
+                assert len(ends) == before + 1
+                assert len(production_index.steps()[(1, 100)]) == before + 1
+                # Ajout dans la reserve du tampon : l'historique n'est pas recopie
+                buffer = production_index._index()['buffers']['steps'][(1, 100)]
+                assert len(buffer) >= len(ends)
+                assert ends.base is buffer
+            finally:
+                db.session.delete(row)
+                db.session.commit()
+                production_index.reset()
+
+    def test_invalid_buckets(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError):
+                production_index.buckets(datetime(2025, 3, 15), datetime(2025, 3, 14))
+            with pytest.raises(ValueError):
+                production_index.buckets(datetime(2020, 1, 1), datetime(2025, 1, 1), 60)
+
+    def test_api_buckets(self, auth_client):
+        resp = auth_client.get('/api/production/buckets?start=2025-03-15T10:00:00&end=2025-03-15T18:00:00')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert len(body['buckets']) == 8
+        assert sum(b['pieces'] for b in body['buckets']) == 5
+        assert auth_client.get('/api/production/buckets?start=2025-03-15').status_code == 400
+
+    def test_api_timezone_aware_bounds(self, auth_client):
+        from datetime import timezone
+        naive = auth_client.get('/api/production/buckets?start=2025-03-15T10:00:00&end=2025-03-15T18:00:00')
+        start, end = (datetime(2025, 3, 15, h).astimezone().astimezone(timezone.utc) for h in (10, 18))
+        resp = auth_client.get('/api/production/buckets',
+                               query_string={'start': start.isoformat(), 'end': end.isoformat()})
+        assert resp.status_code == 200
+        assert resp.get_json()['buckets'] == naive.get_json()['buckets']
+        assert auth_client.get('/api/production/buckets?start=hier&end=demain').status_code == 400
+        assert auth_client.get('/api/production/buckets?end=2025-03-15T18:00:00').status_code == 400
+
+    def test_api_requires_login(self, client):
+        assert client.get('/api/production/buckets').status_code == 302
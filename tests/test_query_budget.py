@@ -0,0 +1,98 @@
+"""Budgets de requetes SQL par KPI et par route (detection des N+1).
+
+Chaque KPI et chaque route est execute sur le jeu de donnees de test a
+plusieurs echelles (``conftest.SEED_SCALES``). Le nombre de requetes doit :
+- rester sous le budget declare ci-dessous ;
+- ne pas dependre du volume de donnees (meme compte a chaque echelle).
+
+Un KPI qui emet une requete par ligne lue echoue donc des que le volume
+augmente. Les tables de reference etant chargees au demarrage
+(``reference``), leur cache est rempli avant le comptage. Les budgets sont
+a ajuster volontairement, jamais a la hausse pour faire passer un N+1.
+"""
+
+import pytest
+
+from app import reference, services
+
+# Nombre maximal de requetes SQL par KPI
+KPI_BUDGETS = {
+    'calculate_oee': 4,
+    'calculate_utilization': 1,
+    'calculate_throughput': 1,
+    'calculate_cycle_time': 1,
+    'calculate_non_conformity': 6,
+    'calculate_detection_time': 1,
+    'calculate_lead_time': 1,
+    'calculate_buffer_wait_time': 1,
+    'calculate_energy_summary': 1,
+    'calculate_buffer_occupancy': 1,
+    'calculate_stock_variation': 1,
+}
+
+# Nombre maximal de requetes SQL par route (session admin)
+ROUTE_BUDGETS = {
+    '/dashboard': 13,
+    '/performance': 7,
+    '/qualite': 7,
+    '/delai': 2,
+    '/energie': 1,
+    '/stock': 2,
+    '/api/kpis': 13,
+}
+
+# N+1 connus, a corriger : le test echoue (strict) des qu'ils disparaissent
+KNOWN_N_PLUS_ONE: dict[str, str] = {}
+
+
+def _params(budgets: dict) -> list:
+    """Parametres pytest ``(nom, budget)``, N+1 connus marques xfail."""
+    return [
+        pytest.param(name, budget, marks=pytest.mark.xfail(strict=True, reason=f"N+1 connu : {KNOWN_N_PLUS_ONE[name]}"))
+        if name in KNOWN_N_PLUS_ONE else (name, budget)
+        for name, budget in budgets.items()
+    ]
+
+
+def _login(client):
+    client.post('/login', data={'identifiant': 'admin', 'mot_de_passe': 'admin123'})
+    return client
+
+
+class TestKpiQueryBudget:
+    """Verifie le nombre de requetes de chaque fonction ``calculate_*``."""
+
+    def test_all_kpis_have_budget(self):
+        kpis = {name for name in dir(services) if name.startswith('calculate_')}
+        assert set(KPI_BUDGETS) == kpis
+
+    @pytest.mark.parametrize('kpi, budget', _params(KPI_BUDGETS))
+    def test_kpi_within_budget(self, scaled_apps, count_queries, kpi, budget):
+        counts = {}
+        for scale, scaled in scaled_apps.items():
+            with scaled.app_context():
+                reference.refresh(force=True)
+                with count_queries() as statements:
+                    getattr(services, kpi)()
+            counts[scale] = len(statements)
+
+        assert max(counts.values()) <= budget, f"{kpi} : {counts} requetes (budget {budget})"
+        assert len(set(counts.values())) == 1, f"{kpi} : requetes proportionnelles au volume {counts}"
+
+
+class TestRouteQueryBudget:
+    """Verifie le nombre de requetes de chaque page KPI."""
+
+    @pytest.mark.parametrize('url, budget', _params(ROUTE_BUDGETS))
+    def test_route_within_budget(self, scaled_apps, count_queries, url, budget):
+        counts = {}
+        for scale, scaled in scaled_apps.items():
+            client = _login(scaled.test_client())
+            with scaled.app_context():
+                reference.refresh(force=True)
+            with count_queries() as statements:
+                client.get(url)
+            counts[scale] = len(statements)
+
+        assert max(counts.values()) <= budget, f"{url} : {counts} requetes (budget {budget})"
+        assert len(set(counts.values())) == 1, f"{url} : requetes proportionnelles au volume {counts}"
@@ -0,0 +1,71 @@
+"""Tests du cache des tables de reference."""
+
+from app import reference
+
+
+class TestReference:
+    """Verifie le chargement, l'empreinte et les acces du cache."""
+
+    def test_lookups(self, app):
+        with app.app_context():
+            reference.refresh(force=True)
+            assert reference.operations()[(1, 100)] == (25, 500, 200)
+            assert (1, 999) not in reference.operations()
+            capacities = {b.name: b.capacity for b in reference.buffers()}
+            assert capacities['Buffer Entree'] == 8
+
+    def test_no_query_within_interval(self, app, count_queries):
+        with app.app_context():
+            reference.refresh(force=True)
+            with count_queries() as statements:
+                reference.resource_names()
+                reference.operations()
+                reference.buffers()
+        assert statements == []
+
+    def test_reload_on_fingerprint_change(self, app, count_queries):
+        from app import db
+        from app.models import ResourceOperation
+
+        with app.app_context():
+            reference.refresh(force=True)
+            # Empreinte inchangee : une seule requete, pas de rechargement
+            reference.invalidate()
+            with count_queries() as statements:
+                reference.operations()
+            assert len(statements) == 1
+
+            op = db.session.get(ResourceOperation, (1, 100))
+            op.WorkingTime = 40
+            db.session.commit()
+            try:
+                assert reference.operations()[(1, 100)].working_time == 25
+                reference.invalidate()
+                assert reference.operations()[(1, 100)].working_time == 40
+            finally:
+                op.WorkingTime = 25
+                db.session.commit()
+                reference.invalidate()
+            assert reference.operations()[(1, 100)].working_time == 25
+
+    def test_reload_on_same_length_rename(self, app):
+        from app import db
+        from app.models import Resource
+
+        with app.app_context():
+            resource = db.session.get(Resource, 3)
+            name = resource.ResourceName
+            resource.ResourceName = 'CP-AM-CAM'
+            db.session.commit()
+            try:
+                reference.refresh(force=True)
+                # Meme longueur, meme nombre de lignes : seul le contenu change
+                resource.ResourceName = 'CP-AM-CAN'
+                db.session.commit()
+                reference.invalidate()
+                assert reference.resource_names()[3] == 'CP-AM-CAN'
+            finally:
+                resource.ResourceName = name
+                db.session.commit()
+                reference.invalidate()
+            assert reference.resource_names()[3] == name
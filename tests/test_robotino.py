@@ -0,0 +1,309 @@
+"""Tests de l'ingestion et du stockage columnaire de la telemetrie Robotino."""
+
+import pytest
+
+from app import robotino
+
+HEADER = 'timestamp,odometry_x,odometry_seq,power_batteryLow,festool_charger_message_0\n'
+
+
+def _write_csv(path, rows):
+    path.write_text(HEADER + ''.join(rows), encoding='utf-8')
+    return str(path)
+
+
+def _row(second, x, low='False'):
+    return f'2025-04-16T15:10:{second:02d}.500000,{x},{100 + second},{low},"ligne 1\r\nligne 2"\n'
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(robotino, 'ROBOTINO_STORE_DIR', str(tmp_path / 'store'))
+    robotino._load_segment.cache_clear()
+    robotino._energy['store'] = None
+    return tmp_path
+
+
+class TestIngestion:
+    """Verifie le typage, la segmentation et l'ingestion incrementale."""
+
+    def test_column_kinds(self):
+        assert robotino.column_kind('timestamp') == 'time'
+        assert robotino.column_kind('digitalinputarray_3') == 'bool'
+        assert robotino.column_kind('festool_charger_accuConnected_0') == 'bool'
+        assert robotino.column_kind('odometry_seq') == 'int'
+        assert robotino.column_kind('odometry_x') == 'float'
+        assert robotino.column_kind('controller_software') == 'text'
+        assert robotino.column_kind('festool_charger_message_0') is None
+
+    def test_typed_segments(self, store):
+        csv_path = _write_csv(store / 'a.csv', [_row(s, s / 10, 'True' if s % 2 else 'False') for s in range(10)])
+        assert robotino.ingest_csv(csv_path, segment_rows=4) == 10
+        manifest = robotino.load_manifest()
+        assert [s['rows'] for s in manifest['segments']] == [4, 4, 2]
+        assert 'festool_charger_message_0' not in manifest['columns']
+
+        (_, data), *_ = robotino.iter_segments()
+        assert data['odometry_x'].dtype.name == 'float32'
+        assert data['odometry_seq'].dtype.name == 'int32'
+        assert data['power_batteryLow'].dtype.name == 'uint8' and len(data['power_batteryLow']) == 1
+
+    def test_incremental_ingest(self, store):
+        csv_path = _write_csv(store / 'a.csv', [_row(s, 1.0) for s in range(5)])
+        assert robotino.ingest_csv(csv_path) == 5
+        assert robotino.ingest_csv(csv_path) == 0
+        _write_csv(store / 'a.csv', [_row(s, 1.0) for s in range(8)])
+        assert robotino.ingest_csv(csv_path) == 3
+        assert robotino.query_series(['odometry_x'])['samples'] == 8
+
+    def test_missing_timestamp_column(self, store):
+        path = store / 'bad.csv'
+        path.write_text('odometry_x\n1.0\n', encoding='utf-8')
+        with pytest.raises(ValueError):
+            robotino.ingest_csv(str(path))
+
+
+class TestDeltaEncoding:
+    """Verifie l'encodage delta et la reconstruction de l'etat a l'instant t."""
+
+    @pytest.fixture
+    def status(self, store):
+        rows = ['timestamp,relaystatus_0,charger_0_state_number,power_voltage,controller_software\n']
+        for s in range(40):
+            version = '2.1.4' if s < 30 else '2.2.0'
+            rows.append(f'2025-04-16T10:00:{s:02d},{s >= 20},{s // 10},{20 + s / 100},{version}\n')
+        path = store / 'status.csv'
+        path.write_text(''.join(rows), encoding='utf-8')
+        robotino.ingest_csv(str(path), segment_rows=40)
+        return path
+
+    def test_only_changes_stored(self, status):
+        (_, data), = robotino.iter_segments()
+        # 2 valeurs pour le relais, 4 pour l'etat du chargeur, 2 versions
+        assert len(data['relaystatus_0@t']) == 2
+        assert list(data['charger_0_state_number@v']) == [0, 1, 2, 3]
+        assert [v.decode() for v in data['controller_software@v']] == ['2.1.4', '2.2.0']
+        # La tension change a chaque echantillon : stockage dense
+        assert 'power_voltage' in data and 'power_voltage@t' not in data
+
+    def test_dense_mode(self, store, monkeypatch):
+        monkeypatch.setattr(robotino, 'ROBOTINO_ENCODING', 'dense')
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(s, 1.0) for s in range(10)]))
+        (_, data), = robotino.iter_segments()
+        assert 'odometry_x' in data and 'odometry_x@t' not in data
+
+    def test_decoded_columns_match_source(self, status):
+        ts, values = robotino.load_columns(['relaystatus_0', 'charger_0_state_number', 'controller_software'])
+        assert values['relaystatus_0'].tolist() == [s >= 20 for s in range(40)]
+        assert values['charger_0_state_number'].tolist() == [s // 10 for s in range(40)]
+        assert values['controller_software'][-1] == '2.2.0'
+
+    def test_state_at(self, status):
+        from datetime import datetime
+        state = robotino.state_at(datetime(2025, 4, 16, 10, 0, 25, 500000))
+        assert state['sample'] == '2025-04-16T10:00:25'
+        assert state['state']['relaystatus_0'] is True
+        assert state['state']['charger_0_state_number'] == 2
+        assert state['state']['power_voltage'] == pytest.approx(20.25)
+        assert state['state']['controller_software'] == '2.1.4'
+        before = robotino.state_at(datetime(2025, 4, 16, 9, 0))
+        assert before['sample'] is None and before['state']['relaystatus_0'] is None
+
+    def test_text_columns_not_aggregated(self, status):
+        with pytest.raises(ValueError):
+            robotino.query_series(['controller_software'])
+
+    def test_api_state(self, status, auth_client):
+        body = auth_client.get('/api/robotino/state?columns=controller_software').get_json()
+        assert body['state'] == {'controller_software': '2.2.0'}
+        assert auth_client.get('/api/robotino/state?columns=nope').status_code == 400
+
+
+class TestQuery:
+    """Verifie le filtrage temporel et le sous-echantillonnage."""
+
+    def test_range_and_downsampling(self, store):
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(s, s, 'True' if s == 3 else 'False') for s in range(10)]))
+        result = robotino.query_series(['odometry_x', 'power_batteryLow', 'odometry_seq'], points=2)
+        assert result['samples'] == 10
+        assert result['series']['odometry_x'] == [2.0, 7.0]
+        assert result['series']['power_batteryLow'] == [True, False]
+        assert result['series']['odometry_seq'] == [102.0, 107.0]
+
+        from datetime import datetime
+        ranged = robotino.query_series(
+            ['odometry_x'], start=datetime(2025, 4, 16, 15, 10, 2), end=datetime(2025, 4, 16, 15, 10, 5))
+        assert ranged['samples'] == 3
+        assert ranged['series']['odometry_x'] == [2.0, 3.0, 4.0]
+
+    def test_missing_values(self, store):
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [
+            '2025-04-16T15:10:00.000000,,,,\n', _row(1, 1.5)]))
+        result = robotino.query_series(['odometry_x', 'odometry_seq'], points=10)
+        assert result['series']['odometry_x'] == [None, 1.5]
+        assert result['series']['odometry_seq'] == [None, 101.0]
+
+    def test_unknown_column(self, store):
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(0, 1.0)]))
+        with pytest.raises(ValueError):
+            robotino.query_series(['nope'])
+
+
+class TestApi:
+    """Verifie /api/robotino."""
+
+    def test_api_series(self, store, auth_client):
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(s, s) for s in range(10)]))
+        resp = auth_client.get('/api/robotino?columns=odometry_x&points=5')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert len(body['timestamps']) == len(body['series']['odometry_x']) == 5
+
+    def test_api_errors(self, store, auth_client):
+        assert auth_client.get('/api/robotino').status_code == 404
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(0, 1.0)]))
+        assert auth_client.get('/api/robotino?columns=nope').status_code == 400
+        assert auth_client.get('/api/robotino?start=hier').status_code == 400
+
+    def test_api_timezone_aware_bounds(self, store, auth_client):
+        from datetime import datetime, timezone
+        robotino.ingest_csv(_write_csv(store / 'a.csv', [_row(s, s) for s in range(10)]))
+        # 15:10:05 en heure locale, exprime en UTC avec fuseau
+        start = datetime(2025, 4, 16, 15, 10, 5).astimezone().astimezone(timezone.utc).isoformat()
+        resp = auth_client.get('/api/robotino', query_string={'columns': 'odometry_x', 'start': start})
+        assert resp.status_code == 200
+        assert resp.get_json()['series']['odometry_x'] == [5.0, 6.0, 7.0, 8.0, 9.0]
+
+    def test_api_requires_login(self, client):
+        assert client.get('/api/robotino').status_code == 302
+
+
+class TestEnergy:
+    """Verifie l'integration de la puissance mesuree (tension x courant)."""
+
+    @pytest.fixture
+    def powered(self, store, monkeypatch):
+        monkeypatch.setattr(robotino, 'ENERGY_MAX_GAP_SEC', 5)
+        path = store / 'power.csv'
+        rows = ['timestamp,power_voltage,power_output_current\n']
+        # 20 V x 0,5 A = 10 W pendant 3 600 s (un echantillon par seconde)
+        rows += [f'2025-04-16T{10 + s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d},20,0.5\n' for s in range(3601)]
+        path.write_text(''.join(rows), encoding='utf-8')
+        robotino.ingest_csv(str(path), segment_rows=1000)
+        return path
+
+    def test_total_energy(self, powered):
+        assert robotino.energy_between() == pytest.approx(10.0)
+
+    def test_window_query(self, powered):
+        from datetime import datetime
+        wh = robotino.energy_between(datetime(2025, 4, 16, 10, 15), datetime(2025, 4, 16, 10, 45))
+        assert wh == pytest.approx(5.0)
+
+    def test_incremental_index_matches_rebuild(self, powered, store):
+        robotino.energy_index()
+        with open(powered, 'a', encoding='utf-8') as fh:
+            fh.write('2025-04-16T11:00:01,20,0.5\n2025-04-16T11:00:02,,0.5\n')
+        robotino.ingest_csv(str(powered))
+        times, cumulative = robotino.energy_index()
+        extended = cumulative[-1]
+        robotino._energy['store'] = None
+        assert robotino.energy_index()[1][-1] == pytest.approx(extended)
+        assert extended == pytest.approx(10.0 + 10 / 3600)
+
+    def test_segment_without_power(self, powered, store):
+        robotino.energy_index()
+        # Un fichier sans colonnes de puissance, puis la reprise des mesures
+        (store / 'odometry.csv').write_text('timestamp,odometry_x\n2025-04-16T11:00:01,1.0\n', encoding='utf-8')
+        robotino.ingest_csv(str(store / 'odometry.csv'))
+        assert robotino.energy_between() == pytest.approx(10.0)
+        (store / 'resume.csv').write_text('timestamp,power_voltage,power_output_current\n'
+                                          '2025-04-16T11:00:02,20,0.5\n', encoding='utf-8')
+        robotino.ingest_csv(str(store / 'resume.csv'))
+        assert robotino.energy_between() == pytest.approx(10.0 + 2 * 10 / 3600)
+        robotino._energy['store'] = None
+        assert robotino.energy_between() == pytest.approx(10.0 + 2 * 10 / 3600)
+
+    def test_gap_not_integrated(self, store):
+        path = store / 'gap.csv'
+        path.write_text('timestamp,power_voltage,power_output_current\n'
+                        '2025-04-16T10:00:00,10,1\n2025-04-16T10:00:01,10,1\n2025-04-16T11:00:00,10,1\n',
+                        encoding='utf-8')
+        robotino.ingest_csv(str(path))
+        assert robotino.energy_between() == pytest.approx(10 / 3600)
+
+    def test_agv_energy_kpi(self, powered):
+        result = robotino.calculate_agv_energy(points=4)
+        assert result['status'] == 'normal'
+        assert result['value'] == pytest.approx(10.0)
+        assert result['avg_power_w'] == pytest.approx(10.0)
+        assert [t['wh'] for t in result['timeline']] == [2.5] * 4
+
+    def test_agv_energy_unavailable(self, store):
+        assert robotino.calculate_agv_energy()['status'] == 'unavailable'
+
+    def test_api_and_page(self, powered, auth_client):
+        body = auth_client.get('/api/robotino/energy?start=2025-04-16T10:00:00&end=2025-04-16T10:30:00').get_json()
+        assert body['value'] == pytest.approx(5.0)
+        assert b'Energie AGV mesuree' in auth_client.get('/energie').data
+
+    def test_timezone_aware_window(self, powered, auth_client):
+        from datetime import datetime, timezone
+        start, end = (datetime(2025, 4, 16, 10, m).astimezone().astimezone(timezone.utc) for m in (0, 30))
+        assert robotino.energy_between(start, end) == pytest.approx(5.0)
+        body = auth_client.get('/api/robotino/energy',
+                               query_string={'start': start.isoformat(), 'end': end.isoformat()}).get_json()
+        assert body['status'] == 'normal'
+        assert body['value'] == pytest.approx(5.0)
+
+
+class TestTrajectory:
+    """Verifie la distance, les arrets et la simplification du trace."""
+
+    @pytest.fixture
+    def path(self, store):
+        # Aller-retour en L : 10 m vers l'est, 10 m vers le nord, puis 20 s a l'arret
+        rows = ['timestamp,odometry_x,odometry_y\n']
+        for s in range(41):
+            x, y = (s / 2, 0.0) if s <= 20 else (10.0, (s - 20) / 2)
+            rows.append(f'2025-04-16T10:00:{s:02d},{x},{y}\n')
+        rows += [f'2025-04-16T10:01:{s:02d},10.0,10.0\n' for s in range(0, 21)]
+        path = store / 'odo.csv'
+        path.write_text(''.join(rows), encoding='utf-8')
+        robotino.ingest_csv(str(path))
+        robotino._trajectory.cache_clear()
+        return path
+
+    def test_rank_matches_douglas_peucker(self):
+        import numpy as np
+        x = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+        y = np.array([0.0, 0.1, 2.0, 0.1, 0.0])
+        rank = robotino.douglas_peucker_rank(x, y)
+        # Le sommet (ecart 2) survit jusqu'a 2 m ; ses voisins ~1 m
+        assert rank[2] == pytest.approx(2.0)
+        assert 0 < rank[1] < rank[2] and 0 < rank[3] < rank[2]
+        assert np.isinf(rank[0]) and np.isinf(rank[-1])
+
+    def test_distance_and_dwell(self, path):
+        result = robotino.calculate_trajectory()
+        assert result['status'] == 'normal'
+        assert result['distance_m'] == pytest.approx(20.0)
+        (zone,) = result['dwell_zones']
+        assert (zone['x'], zone['y']) == (10.0, 10.0)
+        assert zone['duration_sec'] >= 20
+
+    def test_simplification(self, path):
+        result = robotino.calculate_trajectory(tolerance=0.01)
+        # Depart, coin et arrivee suffisent
+        assert list(zip(result['path']['x'], result['path']['y'])) == [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0)]
+        assert robotino.calculate_trajectory(points=2)['path']['x'] == [0.0, 10.0]
+
+    def test_cached_per_window(self, path):
+        robotino.calculate_trajectory(points=10)
+        robotino.calculate_trajectory(tolerance=0.5)
+        assert robotino._trajectory.cache_info().hits == 1
+
+    def test_api_trajectory(self, path, auth_client):
+        body = auth_client.get('/api/robotino/trajectory?tolerance=0.01').get_json()
+        assert len(body['path']['x']) == 3
+        assert auth_client.get('/api/robotino/trajectory?tolerance=-1').status_code == 400
@@ -0,0 +1,96 @@
+"""Tests de la generation planifiee des rapports."""
+
+from datetime import date, datetime
+
+
+class TestPeriods:
+    """Verifie le decoupage en equipes, jours et semaines."""
+
+    def test_periods_for_monday(self):
+        from app.scheduler import periods_for_day
+        periods = periods_for_day(date(2025, 3, 24))  # lundi
+        slugs = [p['slug'] for p in periods]
+        assert slugs == [
+            '2025-03-24_matin', '2025-03-24_apres-midi', '2025-03-24_nuit',
+            '2025-03-24', '2025-W13',
+        ]
+        night = periods[2]
+        assert night['start'] == datetime(2025, 3, 24, 22)
+        assert night['end'] == datetime(2025, 3, 25, 6)
+
+    def test_closed_periods_respect_delay(self, monkeypatch):
+        from app import scheduler
+        monkeypatch.setattr(scheduler, 'REPORT_GENERATION_DELAY_SEC', 1800)
+        periods = scheduler.closed_periods(datetime(2025, 3, 27, 14, 20), lookback_days=1)
+        slugs = [p['slug'] for p in periods]
+        assert '2025-03-26_nuit' in slugs
+        assert '2025-03-26' in slugs
+        # Equipe du matin terminee a 14h00 : delai de 30 min non ecoule
+        assert '2025-03-27_matin' not in slugs
+
+
+    def test_offpeak_window(self, monkeypatch):
+        from app import scheduler
+        monkeypatch.setattr(scheduler, 'REPORT_OFFPEAK_START_HOUR', 23)
+        monkeypatch.setattr(scheduler, 'REPORT_OFFPEAK_END_HOUR', 5)
+        assert scheduler.in_offpeak(datetime(2025, 3, 27, 23, 30))
+        assert scheduler.in_offpeak(datetime(2025, 3, 27, 4, 59))
+        assert not scheduler.in_offpeak(datetime(2025, 3, 27, 5, 0))
+        assert not scheduler.in_offpeak(datetime(2025, 3, 27, 14, 0))
+        monkeypatch.setattr(scheduler, 'REPORT_OFFPEAK_START_HOUR', 5)
+        assert scheduler.in_offpeak(datetime(2025, 3, 27, 14, 0))
+
+
+class TestTimeWindow:
+    """Verifie le filtrage temporel des KPIs."""
+
+    def test_window_restricts_lead_time(self, app):
+        with app.app_context():
+            from app import services
+            assert services.calculate_lead_time()['count'] == 5
+            with services.time_window(datetime(2025, 3, 15, 12), datetime(2025, 3, 15, 14)):
+                # Ordres 2 (12h) et 3 (13h) uniquement
+                assert services.calculate_lead_time()['count'] == 2
+            with services.time_window(datetime(2030, 1, 1)):
+                assert services.calculate_lead_time()['count'] == 0
+
+
+class TestArchive:
+    """Verifie la generation et la consultation de l'archive."""
+
+    def test_run_pending_generates_archive(self, app, auth_client, tmp_path, monkeypatch):
+        from app import scheduler
+        monkeypatch.setattr(scheduler, 'REPORT_ARCHIVE_DIR', str(tmp_path))
+        monkeypatch.setattr(scheduler, 'REPORT_LOOKBACK_DAYS', 1)
+        now = datetime(2025, 3, 16, 2, 0)
+        generated = scheduler.run_pending(app, now=now)
+        assert generated > 0
+        assert len(scheduler._archived_files('jour', '2025-03-15')) == 2
+        # Periodes sans ligne MES : aucun rapport
+        assert scheduler._archived_files('equipe', '2025-03-15_nuit') == []
+        # Deuxieme passage : rien a regenerer
+        assert scheduler.run_pending(app, now=now) == 0
+
+        resp = auth_client.get('/rapports')
+        assert resp.status_code == 200
+        assert b'2025-03-15' in resp.data
+        name = scheduler._archived_files('jour', '2025-03-15')[0]
+        assert auth_client.get(f'/rapports/jour/{name}').status_code == 200
+        assert auth_client.get('/rapports/inconnu/x.pdf').status_code == 404
+
+    def test_nothing_generated_outside_offpeak(self, app, tmp_path, monkeypatch):
+        from app import scheduler
+        monkeypatch.setattr(scheduler, 'REPORT_ARCHIVE_DIR', str(tmp_path))
+        monkeypatch.setattr(scheduler, 'REPORT_LOOKBACK_DAYS', 1)
+        assert scheduler.run_pending(app, now=datetime(2025, 3, 16, 8, 0)) == 0
+        assert scheduler.list_archive()['jour'] == []
+
+    def test_has_activity(self, app):
+        from app import scheduler
+        with app.app_context():
+            day = scheduler.periods_for_day(date(2025, 3, 15))
+            assert scheduler.has_activity(day[3])
+            assert not scheduler.has_activity(day[2])    # nuit du 15 au 16
+
+    def test_archive_forbidden_employe(self, employe_client):
+        assert employe_client.get('/rapports').status_code == 302
@@ -217,3 +217,76 @@ class TestServicesEdgeCases:
             from app import services
             result = services.calculate_lead_time()
             assert result['count'] == len(result['distribution'])
+
+
+class TestCompactFrames:
+    """Tests du chargement des series en DataFrame compact."""
+
+    def test_machine_durations_dtypes(self, app):
+        """Les etats machine sont charges en types compacts, sans colonne derivee."""
+        with app.app_context():
+            from app import services
+            df = services._get_machine_durations()
+            assert list(df.columns) == ['ResourceID', 'TimeStamp', 'Busy', 'ErrorL0', 'ErrorL2', 'Duration']
+            assert str(df['ResourceID'].dtype) == 'int8'
+            assert str(df['TimeStamp'].dtype) == 'int64'
+            assert str(df['Busy'].dtype) == 'bool'
+            assert str(df['Duration'].dtype) == 'int32'
+            assert (df['Duration'] > 0).all()
+
+    def test_load_frame_epoch_and_category(self, app):
+        """Les datetimes deviennent des secondes epoch et OpNo une categorie."""
+        with app.app_context():
+            from app import db, services
+            from app.models import Step
+            query = db.session.query(Step.Start, Step.OpNo).filter(Step.Start.isnot(None))
+            df = services._load_frame(query, {'Start': 'epoch', 'OpNo': 'category'})
+            first = query.first()
+            assert str(df['OpNo'].dtype) == 'category'
+            assert services._from_epoch(df['Start'].iloc[0]) == first.Start
+
+    def test_load_frame_empty(self, app):
+        """Une requete sans resultat donne un DataFrame vide aux bonnes colonnes."""
+        with app.app_context():
+            from app import db, services
+            from app.models import Step
+            query = db.session.query(Step.Start).filter(Step.Start.is_(None), Step.Start.isnot(None))
+            df = services._load_frame(query, {'Start': 'epoch'})
+            assert df.empty
+            assert list(df.columns) == ['Start']
+
+    def test_machine_time_halves_match_hourly_split(self, app):
+        """La coupure en deux moities egale l'ancien parcours des seaux horaires."""
+        import numpy as np
+        from app import machine_timeline, services
+
+        with app.app_context():
+            totals = services._stream_machine_time(trend=True)
+            assert totals['by_month'] == {}
+            index = machine_timeline.refresh()
+            t0, t1 = machine_timeline.span(index)
+            hours = np.arange(t0 // 3600, (t1 - 1) // 3600 + 1)
+            edges = np.concatenate(([t0], hours[1:] * 3600, [t1]))
+            hourly = [machine_timeline.bucket_totals(m, edges) for m in index['machines'].values()]
+        expected, seen = [[0, 0], [0, 0]], 0
+        for h in range(len(hours)):
+            target = expected[0] if seen < totals['count'] // 2 else expected[1]
+            target[0] += sum(int(b['busy'][h]) for b in hourly)
+            target[1] += sum(int(b['total'][h]) for b in hourly)
+            seen += sum(int(b['count'][h]) for b in hourly)
+        assert totals['halves'] == expected
+        assert sum(half[1] for half in expected) == sum(acc[1] for acc in totals['by_machine'].values())
+
+    def test_stream_matches_frame_across_chunks(self, app, monkeypatch):
+        """Les cumuls en flux egalent le DataFrame complet, meme lot par lot."""
+        with app.app_context():
+            from app import services
+            df = services._get_machine_durations()
+            monkeypatch.setattr(services, 'FRAME_CHUNK_ROWS', 3)
+            totals = services._stream_machine_time()
+            assert totals['count'] == len(df)
+            for res_id, (busy, total, count) in totals['by_machine'].items():
+                group = df[df['ResourceID'] == res_id]
+                assert total == group['Duration'].sum()
+                assert busy == group.loc[group['Busy'], 'Duration'].sum()
+                assert count == len(group)
@@ -0,0 +1,90 @@
+"""Tests du demarrage de l'application (imports differes, retry BDD, sondes)."""
+
+import subprocess
+import sys
+
+from app import DB_CONNECT_MAX_DELAY_SEC, _retry_delay, export, health
+
+
+def test_heavy_modules_not_imported_at_startup():
+    # create_app() + import des services ne doit charger ni pandas ni les
+    # bibliotheques d'export (chargees au premier calcul / export)
+    code = (
+        "import os, sys\n"
+        "os.environ['DATABASE_URL'] = 'sqlite://'\n"
+        "from app import create_app, services, export\n"
+        "create_app()\n"
+        "print(','.join(m for m in ('pandas', 'openpyxl', 'weasyprint') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_retry_delay_grows_and_is_capped():
+    delays = [_retry_delay(attempt) for attempt in range(10)]
+    assert delays[0] < 1
+    assert delays[3] > delays[0]
+    assert all(d <= DB_CONNECT_MAX_DELAY_SEC * 1.2 for d in delays)
+
+
+class TestHealthProbes:
+    """Verifie les sondes /healthz et /readyz."""
+
+    def test_healthz_without_login(self, client):
+        response = client.get('/healthz')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok'}
+
+    def test_readyz_not_ready_before_warmup(self, client):
+        health.reset()
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        checks = response.get_json()['checks']
+        assert checks['database'] is False
+        assert checks['cache_warm'] is False
+
+    def test_readyz_ready_after_warmup(self, app, client):
+        health.reset()
+        health._warmup(app)
+        response = client.get('/readyz')
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['status'] == 'ready'
+        assert body['checks']['database'] is True
+
+    def test_readyz_reports_snapshot_age(self, app, client):
+        health.reset()
+        health._warmup(app)
+        with app.app_context():
+            export._collect_kpis()
+        age = client.get('/readyz').get_json()['checks']['snapshot_age_sec']
+        assert age is not None and age < 60
+
+    def test_readyz_stale_snapshot(self, app, client, monkeypatch):
+        health.reset()
+        health._warmup(app)
+        monkeypatch.setattr(health, 'READYZ_MAX_SNAPSHOT_AGE_SEC', 60)
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['checks']['snapshot_fresh'] is False
+
+    def test_warmup_retries_until_database_is_up(self, app, client, monkeypatch):
+        """BDD injoignable pendant deux series de tentatives, puis disponible."""
+        import app as package
+
+        health.reset()
+        real = package._wait_for_database
+        calls = []
+
+        def flaky(flask_app):
+            calls.append(client.get('/readyz').status_code)
+            if len(calls) <= 2:
+                health.mark_database(False)
+                return False
+            return real(flask_app)
+
+        monkeypatch.setattr(package, '_wait_for_database', flaky)
+        monkeypatch.setattr(health, 'WARMUP_RETRY_INTERVAL_SEC', 0)
+        health._warmup(app)
+        assert calls == [503, 503, 503]
+        assert client.get('/readyz').status_code == 200